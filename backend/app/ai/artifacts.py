@@ -0,0 +1,253 @@
+"""
+Matting modeli ağırlıklarının yerel deposu.
+
+rembg ağırlıkları ilk kullanımda ~/.u2net'e indirir; ağ erişimi olmayan
+node'larda ve yeni container'larda bu, ilk isteğin başarısız olması veya
+çok yavaşlaması demektir. Bu modül ağırlıkları imaja gömülmüş MODEL_DIR
+dizininden (<model>.onnx) çözer:
+
+- Dosyanın checksum'ı (rembg'nin sabitlediği md5) bir kere doğrulanır;
+  sonuç dosyanın boyutu ve mtime'ıyla birlikte MODEL_CACHE_DIR'e yazılır,
+  sonraki worker'lar ve yeniden başlatmalar dosyayı tekrar hash'lemez.
+- Doğrulanan model bir kere ORT formatına çevrilir. ORT formatındaki model
+  dosyadan memory-map edilerek açılır ve ağırlıklar doğrudan bu eşlemeden
+  kullanılır; aynı node'daki worker process'leri kendi kopyalarını tutmak
+  yerine page cache'i paylaşır. Çevirme yapılamazsa .onnx doğrudan açılır.
+- MATTING_QUANTIZED listesindeki modeller için doğrulanan ağırlıklardan
+  dinamik INT8 kuantize edilmiş bir kopya (<model>.int8.onnx) bir kere
+  üretilip MODEL_CACHE_DIR'de saklanır ve oturum bu kopyadan açılır.
+  Kalitenin korunduğu modeller benchmarks.quantization ile seçilir.
+
+Ağırlık MODEL_DIR'de yoksa MODEL_DOWNLOAD açıkken rembg ile indirilir;
+kapalıyken ağa çıkmadan ModelArtifactError fırlatılır. İmaj hazırlanırken
+ağırlıklar şöyle indirilir (backend klasöründen):
+
+    python -m app.ai.artifacts fetch u2net u2netp
+    python -m app.ai.artifacts quantize u2netp  # INT8 kopyasını önceden üretir
+"""
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+from app.ai.exceptions import ModelArtifactError
+from app.ai.loader import lazy_import
+from app.core.config import settings, thread_budget
+
+logger = logging.getLogger(__name__)
+
+ort = lazy_import("onnxruntime")
+rembg_sessions = lazy_import("rembg.sessions")
+
+# rembg'nin indirirken doğruladığı checksum'lar (rembg 2.0.x session sınıfları)
+MODEL_CHECKSUMS = {
+    "u2net": "md5:60024c5c889badc19c04ad937298a77b",
+    "u2netp": "md5:8e83ca70e441ab06c318d82300c84806",
+    "isnet-general-use": "md5:fc16ebd8b0c10d971d3513d564d01e29",
+    "silueta": "md5:55e59e0d8062d2f5d013f4725ee84782",
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_checksum(path: str, algorithm: str = "md5") -> str:
+    """Dosyanın '<algoritma>:<hex>' biçiminde checksum'ı."""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f"{algorithm}:{digest.hexdigest()}"
+
+
+def _file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class ModelArtifactStore:
+    """Model ağırlıklarını yerel dizinden çözer, doğrular ve rembg oturumlarını bunlardan oluşturur."""
+
+    def __init__(self, directory: str, cache_dir: str, allow_download: bool = True, memory_map: bool = True,
+                 checksums: Optional[Dict[str, str]] = None):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.allow_download = allow_download
+        self.memory_map = memory_map
+        self.checksums = MODEL_CHECKSUMS if checksums is None else checksums
+        self._verified: Dict[str, str] = {}  # model -> doğrulanmış .onnx yolu
+        self._lock = threading.Lock()
+
+    def _session_class(self, model_name: str):
+        for session_class in rembg_sessions.sessions_class:
+            if session_class.name() == model_name:
+                return session_class
+        raise ModelArtifactError(f"rembg has no session for model '{model_name}'")
+
+    def _stamp_path(self, model_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{model_name}.onnx.verified")
+
+    def _locate(self, model_name: str) -> str:
+        path = os.path.join(self.directory, f"{model_name}.onnx")
+        if os.path.isfile(path):
+            return path
+        if not self.allow_download:
+            raise ModelArtifactError(
+                f"Weights for model '{model_name}' not found at {path} and MODEL_DOWNLOAD is disabled"
+            )
+        logger.warning(f"Weights for model '{model_name}' not found at {path}, downloading with rembg...")
+        return str(self._session_class(model_name).download_models())
+
+    def _verify(self, model_name: str, path: str):
+        """Checksum'ı doğrular; aynı dosya (boyut + mtime) daha önce doğrulandıysa hash'lemez."""
+        expected = self.checksums.get(model_name)
+        if expected is None:
+            raise ModelArtifactError(f"No known checksum for model '{model_name}'")
+        stamp = dict(_file_signature(path), path=os.path.abspath(path), checksum=expected)
+        try:
+            with open(self._stamp_path(model_name)) as f:
+                if json.load(f) == stamp:
+                    return
+        except (OSError, ValueError):
+            pass
+
+        actual = file_checksum(path, expected.split(":", 1)[0])
+        if actual != expected:
+            raise ModelArtifactError(
+                f"Checksum mismatch for model '{model_name}' at {path}: expected {expected}, got {actual}"
+            )
+        logger.info(f"Verified weights for model '{model_name}' ({actual})")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._stamp_path(model_name), "w") as f:
+                json.dump(stamp, f)
+        except OSError as e:
+            logger.warning(f"Could not record verification of '{model_name}', it will be re-verified: {e}")
+
+    def resolve(self, model_name: str) -> str:
+        """Modelin doğrulanmış .onnx yolunu döndürür (process başına bir kere doğrulanır)."""
+        path = self._verified.get(model_name)
+        if path is None:
+            with self._lock:
+                path = self._verified.get(model_name)
+                if path is None:
+                    path = self._locate(model_name)
+                    self._verify(model_name, path)
+                    self._verified[model_name] = path
+        return path
+
+    def _quantized_path(self, model_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{model_name}.int8.onnx")
+
+    def quantized_model(self, model_name: str) -> str:
+        """Modelin dinamik INT8 kuantize edilmiş kopyasını (gerekirse oluşturup) döndürür."""
+        source = self.resolve(model_name)
+        target = self._quantized_path(model_name)
+        if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return target
+        try:
+            # onnxruntime.quantization, onnx paketine ihtiyaç duyar
+            quantization = importlib.import_module("onnxruntime.quantization")
+        except ImportError as e:
+            raise ModelArtifactError(f"INT8 quantization of '{model_name}' needs the 'onnx' package: {e}") from e
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            # CPU'daki ConvInteger çekirdeği yalnızca uint8 ağırlıkları destekler
+            quantization.quantize_dynamic(source, temp_path, weight_type=quantization.QuantType.QUInt8)
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"Quantized model '{model_name}' to INT8 at {target}")
+        return target
+
+    def _ort_path(self, model_name: str, quantized: bool = False) -> str:
+        # Optimize edilmiş ORT modeli ORT sürümüne ve makineye özgüdür
+        variant = ".int8" if quantized else ""
+        return os.path.join(self.cache_dir, f"{model_name}{variant}.{ort.__version__}.ort")
+
+    def ort_model(self, model_name: str, quantized: bool = False) -> str:
+        """Modelin (veya INT8 kopyasının) ORT formatındaki kopyasını (gerekirse oluşturup) döndürür."""
+        source = self.quantized_model(model_name) if quantized else self.resolve(model_name)
+        target = self._ort_path(model_name, quantized)
+        if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return target
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.optimized_model_filepath = temp_path
+        options.add_session_config_entry("session.save_model_format", "ORT")
+        try:
+            ort.InferenceSession(source, options, providers=["CPUExecutionProvider"])
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"Converted model '{model_name}' to ORT format at {target}")
+        return target
+
+    def session_options(self):
+        """Oturum ayarları; thread sayıları worker'ın CPU bütçesinden (config.thread_budget) gelir."""
+        budget = thread_budget()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = budget.threads
+        options.inter_op_num_threads = budget.inter_op_threads
+        spinning = "1" if settings.ONNX_ALLOW_SPINNING else "0"
+        options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+        options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+        return options
+
+    def create_session(self, model_name: str, quantized: bool = False):
+        """
+        Model için rembg oturumu oluşturur. Ağırlıklar indirilmeden yerel
+        dosyadan okunur; quantized ise INT8 kopyası kullanılır. memory_map
+        açıksa ORT formatındaki kopya memory-map edilerek açılır.
+        """
+        path = self.quantized_model(model_name) if quantized else self.resolve(model_name)
+        options = self.session_options()
+        if self.memory_map:
+            try:
+                path = self.ort_model(model_name, quantized)
+                options.add_session_config_entry("session.load_model_format", "ORT")
+                options.add_session_config_entry("session.use_memory_mapped_ort_model", "1")
+                options.add_session_config_entry("session.use_ort_model_bytes_for_initializers", "1")
+            except Exception as e:
+                logger.warning(f"Could not prepare a memory-mapped copy of '{model_name}', loading the ONNX file: {e}")
+
+        # rembg oturumları ağırlık yolunu download_models()'tan alır; indirme yerine yerel dosyayı döndür
+        session_class = self._session_class(model_name)
+        local_class = type(session_class.__name__, (session_class,), {
+            "download_models": classmethod(lambda cls, *args, **kwargs: path),
+        })
+        return local_class(model_name, options, None)
+
+    def fetch(self, model_name: str) -> str:
+        """Ağırlıkları rembg ile MODEL_DIR'e indirir ve doğrular (imaj hazırlanırken kullanılır)."""
+        os.makedirs(self.directory, exist_ok=True)
+        os.environ["U2NET_HOME"] = os.path.abspath(self.directory)
+        self._session_class(model_name).download_models()
+        return self.resolve(model_name)
+
+
+# Process başına depo; doğrulama kayıtları ve ORT kopyaları worker'lar arasında paylaşılır
+model_store = ModelArtifactStore(
+    directory=settings.MODEL_DIR,
+    cache_dir=settings.MODEL_CACHE_DIR or os.path.join(settings.DATA_DIR, "models"),
+    allow_download=settings.MODEL_DOWNLOAD,
+    memory_map=settings.MODEL_MEMORY_MAP,
+)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    commands = {"fetch": model_store.fetch, "quantize": model_store.quantized_model}
+    if len(sys.argv) < 3 or sys.argv[1] not in commands:
+        sys.exit(f"usage: python -m app.ai.artifacts fetch|quantize <model> [<model> ...]  "
+                 f"(models: {', '.join(MODEL_CHECKSUMS)})")
+    for name in sys.argv[2:]:
+        print(f"{name}: {commands[sys.argv[1]](name)}")
@@ -0,0 +1,70 @@
+"""
+İşlenmiş fotoğrafların bellekte encode edilmesi.
+
+Sonuçlar diske yazılmadan byte olarak üretilir ve doğrudan yanıtta
+gönderilir. PNG kayıpsızdır ama zlib seviyesi gecikmeyi belirgin
+etkiler (Pillow'un varsayılanı 6, seviye 1'den ~4 kat yavaştır); JPEG ve
+WebP kayıplıdır ve çok daha küçüktür.
+"""
+import io
+from typing import NamedTuple, Optional
+
+from PIL import Image
+
+from app.core.config import settings
+
+
+class ImageFormat(NamedTuple):
+    pillow_format: str
+    media_type: str
+    extension: str
+
+
+IMAGE_FORMATS = {
+    "png": ImageFormat("PNG", "image/png", "png"),
+    "jpeg": ImageFormat("JPEG", "image/jpeg", "jpg"),
+    "webp": ImageFormat("WEBP", "image/webp", "webp"),
+}
+
+
+class EncodeOptions(NamedTuple):
+    image_format: str
+    quality: Optional[int] = None  # JPEG/WebP (1-100)
+    compress_level: Optional[int] = None  # PNG (0-9)
+
+    @property
+    def media_type(self) -> str:
+        return IMAGE_FORMATS[self.image_format].media_type
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_FORMATS[self.image_format].extension
+
+
+def resolve_encode_options(image_format: Optional[str] = None, quality: Optional[int] = None,
+                           compress_level: Optional[int] = None) -> EncodeOptions:
+    """
+    Verilmeyen değerleri config'den tamamlar. Formatın kullanmadığı ayar
+    None olur; böylece aynı çıktıyı üreten seçenekler eşit (ve önbellek
+    anahtarında aynı) olur.
+    """
+    image_format = (image_format or settings.OUTPUT_IMAGE_FORMAT).lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format '{image_format}'. Allowed: {', '.join(IMAGE_FORMATS)}")
+    if image_format == "png":
+        level = settings.PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+        return EncodeOptions(image_format, compress_level=level)
+    return EncodeOptions(image_format, quality=settings.OUTPUT_QUALITY if quality is None else quality)
+
+
+def encode_image(image: Image.Image, options: Optional[EncodeOptions] = None) -> bytes:
+    """Görüntüyü seçilen formatta bellekte encode eder."""
+    options = options or resolve_encode_options()
+    buffer = io.BytesIO()
+    if options.image_format == "png":
+        image.save(buffer, "PNG", compress_level=options.compress_level)
+    else:
+        image.save(buffer, IMAGE_FORMATS[options.image_format].pillow_format, quality=options.quality)
+    return buffer.getvalue()
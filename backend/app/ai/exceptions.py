@@ -14,3 +14,7 @@ class MultipleFacesError(PhotoProcessingError):
 class ImageReadError(PhotoProcessingError):
     """Raised when the image file cannot be read or is corrupted."""
     pass
+
+class ModelArtifactError(Exception):
+    """Raised when model weights are missing locally or fail checksum verification."""
+    pass
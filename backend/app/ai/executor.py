@@ -0,0 +1,181 @@
+"""
+CPU-bound fotoğraf işleme için executor katmanı.
+
+process_photo tamamen CPU-bound olduğu için doğrudan event loop üzerinde
+çalıştırıldığında diğer tüm istekleri (health check, yüklemeler) bloklar.
+Bu modül işi bir process (veya thread) havuzuna gönderir; worker'lar
+başlarken modelleri bir kere yükler.
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, List, Optional
+
+from app.core.config import settings, thread_budget
+from app.core.metrics import in_flight, queue_wait
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = {"process", "thread"}
+# start_executor'ın her worker'ın ısınma durumunu bekleyeceği en uzun süre (saniye)
+WORKER_START_TIMEOUT = 600
+
+_executor: Optional[Executor] = None
+# Worker'ların başlangıçta ısınma durumlarını bıraktığı kuyruk (havuz başına bir tane)
+_status_queue: Any = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker(status_queue=None):
+    """Worker başlangıcında ağır modülleri import et, MediaPipe detektörünü ve rembg modelini ısıt."""
+    from app.ai.loader import apply_thread_budget, model_loader
+    # Thread bütçesi ısınmadan bağımsızdır; MODEL_WARM_UP kapalıyken de her worker'da uygulanır
+    try:
+        model_loader.thread_budget = apply_thread_budget()
+    except Exception as e:
+        logger.warning(f"Could not apply the thread budget: {e}")
+    # Model yüklenemezse worker yine de ayağa kalkar (durumu 'failed' olur); ilk istek modeli tekrar dener
+    status = model_loader.load()
+    if status_queue is not None:
+        # Her worker durumunu bir kere bildirir; hangi worker'ın hangi işi aldığından bağımsızdır
+        status_queue.put(status)
+
+
+def _timed_call(submitted: float, func: Callable[..., Any], args, kwargs):
+    """func'ı çalıştırır; işin kuyrukta beklediği süreyi de döndürür (worker'da çalışır)."""
+    waited = time.time() - submitted
+    return waited, func(*args, **kwargs)
+
+
+def _worker_status() -> dict:
+    from app.ai.loader import model_loader
+    return model_loader.status()
+
+
+def _worker_count() -> int:
+    return thread_budget().processing_workers
+
+
+def _create_executor(status_queue=None) -> Executor:
+    kind = settings.PROCESSING_EXECUTOR
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown PROCESSING_EXECUTOR '{kind}'. Allowed: {', '.join(sorted(EXECUTOR_KINDS))}")
+
+    workers = _worker_count()
+    logger.info(f"Starting {kind} executor with {workers} worker(s)")
+    if kind == "thread":
+        return ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="photo-worker",
+            initializer=_init_worker,
+            initargs=(status_queue,),
+        )
+    # fork, MediaPipe/ONNX Runtime iç thread'leriyle güvenli değil
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(status_queue,),
+    )
+
+
+def _create_status_queue():
+    if settings.PROCESSING_EXECUTOR == "thread":
+        return queue.Queue()
+    return multiprocessing.get_context("spawn").Queue()
+
+
+def get_executor() -> Executor:
+    """Paylaşılan executor'ı döndürür, gerekirse oluşturur."""
+    global _executor, _status_queue
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                status_queue = _create_status_queue()
+                _executor = _create_executor(status_queue)
+                _status_queue = status_queue
+    return _executor
+
+
+def start_executor(timeout: Optional[float] = None) -> List[dict]:
+    """
+    Executor'ı oluşturur ve worker sayısı kadar boş iş göndererek tüm
+    worker'ların (ve modellerin) ilk istekten önce başlamasını sağlar.
+    Her worker'ın başlangıçta kendi bildirdiği ısınma durumunu
+    (loader.ModelLoader.status) bekleyip döndürür: işleri hızlı bir
+    worker'ın üstlenmesi diğerlerinin hâlâ soğuk olduğunu gizlemez.
+    Süresinde bildirmeyen worker'lar 'failed' olarak döner.
+    """
+    timeout = WORKER_START_TIMEOUT if timeout is None else timeout
+    executor = get_executor()
+    status_queue = _status_queue
+    workers = _worker_count()
+    # Havuzlar worker'ları iş geldikçe başlatır; worker sayısı kadar iş hepsini başlatır
+    futures = [executor.submit(_worker_status) for _ in range(workers)]
+    for future in futures:
+        future.result()
+
+    # Thread'ler process'in tek yükleyicisini paylaşır; bir bildirim hepsinin durumudur
+    expected = 1 if isinstance(executor, ThreadPoolExecutor) else workers
+    statuses = []
+    deadline = time.monotonic() + timeout
+    while len(statuses) < expected:
+        try:
+            statuses.append(status_queue.get(timeout=max(0.0, deadline - time.monotonic())))
+        except queue.Empty:
+            missing = expected - len(statuses)
+            logger.error(f"{missing} processing worker(s) did not report warm-up within {timeout}s")
+            statuses.extend({"pid": None, "state": "failed", "error": "worker did not report warm-up"}
+                            for _ in range(missing))
+    return statuses
+
+
+def shutdown_executor():
+    """Executor'ı kapatır. Uygulama kapanırken çağrılır."""
+    global _executor, _status_queue
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+            _status_queue = None
+
+
+def _reset_broken_executor(broken: Executor):
+    """Çöken havuzu bırakır; yükleyici ölü worker'ların durumunu unutup yeni havuzu ısıtır (event loop'ta çağrılır)."""
+    from app.ai.loader import model_loader
+    global _executor, _status_queue
+    with _executor_lock:
+        if _executor is not broken:
+            return
+        _executor = None
+        _status_queue = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    model_loader.restart()
+
+
+async def run_in_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    func'ı executor üzerinde çalıştırır ve sonucunu bekler.
+    Process havuzunda func ve argümanları pickle edilebilir olmalıdır.
+    Kuyrukta bekleme süresi ve işlemdeki iş sayısı metriklere yazılır.
+    """
+    executor = get_executor()
+    loop = asyncio.get_running_loop()
+    try:
+        with in_flight.track(kind="processing"):
+            waited, result = await loop.run_in_executor(
+                executor, partial(_timed_call, time.time(), func, args, kwargs)
+            )
+        queue_wait.observe(max(0.0, waited), queue="executor")
+        return result
+    except BrokenProcessPool:
+        # Bir worker çöktüyse (ör. OOM) havuzu bir sonraki istek için yeniden oluştur
+        logger.error("Processing pool is broken, it will be recreated on the next request.")
+        _reset_broken_executor(executor)
+        raise
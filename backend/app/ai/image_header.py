@@ -0,0 +1,121 @@
+"""
+Görüntü başlığından format, boyut ve EXIF yönü okuma.
+
+Piksel verisi çözülmeden yalnızca JPEG marker'ları ve PNG IHDR bloğu
+okunur; böylece sıkıştırılmış hali küçük ama çözülünce devasa olan
+görüntüler (decompression bomb) decode edilmeden reddedilebilir.
+Deprecated olan imghdr'ın yerini alır.
+"""
+import struct
+from typing import NamedTuple, Optional
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+# Boyut bilgisi taşıyan JPEG SOF marker'ları (C4 DHT, C8 JPG, CC DAC hariç)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Uzunluk alanı olmayan JPEG marker'ları
+_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+_EXIF_HEADER = b"Exif\x00\x00"
+_ORIENTATION_TAG = 0x0112
+
+
+class ImageHeader(NamedTuple):
+    format: str
+    width: int  # dosyada saklanan genişlik
+    height: int
+    orientation: int = 1  # EXIF yönü (1-8), 1 = döndürme yok
+
+    @property
+    def display_size(self):
+        """EXIF yönü uygulandıktan sonraki (genişlik, yükseklik); 5-8 arası yönler 90° döndürür."""
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def sniff_format(data) -> Optional[str]:
+    """İlk byte'lardan formatı döndürür ("jpeg", "png") veya tanınmazsa None."""
+    header = bytes(data[:8])
+    if header.startswith(JPEG_SIGNATURE):
+        return "jpeg"
+    if header == PNG_SIGNATURE:
+        return "png"
+    return None
+
+
+def read_image_header(data) -> Optional[ImageHeader]:
+    """Format, boyut ve EXIF yönünü başlıktan okur; başlık eksik veya bozuksa None döndürür."""
+    view = memoryview(data)
+    image_format = sniff_format(view)
+    if image_format == "png":
+        return _read_png_header(view)
+    if image_format == "jpeg":
+        return _read_jpeg_header(view)
+    return None
+
+
+def _read_png_header(view: memoryview) -> Optional[ImageHeader]:
+    # İmza (8) + blok uzunluğu (4) + "IHDR" (4) + genişlik (4) + yükseklik (4)
+    if len(view) < 24 or bytes(view[12:16]) != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", view[16:24])
+    return ImageHeader("png", width, height)
+
+
+def _read_jpeg_header(view: memoryview) -> Optional[ImageHeader]:
+    orientation = 1
+    position = 2
+    while position + 4 <= len(view):
+        if view[position] != 0xFF:
+            return None
+        marker = view[position + 1]
+        if marker == 0xFF:
+            # Dolgu byte'ı
+            position += 1
+            continue
+        if marker in _STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # Görüntü sonu veya tarama başlangıcı: SOF bulunamadı
+            return None
+        (length,) = struct.unpack(">H", view[position + 2:position + 4])
+        segment = view[position + 4:position + 2 + length]
+        if marker in _SOF_MARKERS:
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">HH", segment[1:5])
+            return ImageHeader("jpeg", width, height, orientation)
+        if marker == 0xE1 and bytes(segment[:6]) == _EXIF_HEADER:
+            orientation = _read_exif_orientation(segment[6:])
+        position += 2 + length
+    return None
+
+
+def _read_exif_orientation(tiff: memoryview) -> int:
+    """EXIF (TIFF) bloğunun ilk IFD'sinden Orientation etiketini okur."""
+    try:
+        byte_order = bytes(tiff[:2])
+        if byte_order == b"II":
+            endian = "<"
+        elif byte_order == b"MM":
+            endian = ">"
+        else:
+            return 1
+        (ifd_offset,) = struct.unpack(endian + "I", tiff[4:8])
+        (entry_count,) = struct.unpack(endian + "H", tiff[ifd_offset:ifd_offset + 2])
+        for index in range(entry_count):
+            entry = ifd_offset + 2 + index * 12
+            tag, value_type = struct.unpack(endian + "HH", tiff[entry:entry + 4])
+            if tag == _ORIENTATION_TAG:
+                # SHORT (tip 3): değer, değer alanının ilk iki byte'ında
+                (value,) = struct.unpack(endian + "H", tiff[entry + 8:entry + 10])
+                return value if 1 <= value <= 8 else 1
+    except struct.error:
+        pass
+    return 1
@@ -0,0 +1,251 @@
+"""
+Ağır AI bağımlılıklarının ertelenmiş yüklenmesi ve modellerin ısıtılması.
+
+OpenCV, MediaPipe ve rembg (onnxruntime, pymatting...) birlikte import
+edildiğinde saniyeler sürer. Bu modüller lazy_import() ile yalnızca ilk
+kullanımda yüklenir; böylece app.main'in importu, /health ve test
+toplama bu maliyeti ödemez.
+
+ModelLoader.load() aynı işi bilerek ve ölçerek yapar: modülleri import
+eder, yüz detektörünü kurar ve her modelle birer boş çıkarım yapar.
+Executor worker'ları başlarken çağırır. API process'inde start() bu
+ısınmayı lifespan'da arka planda başlatır; /ready tüm worker'lar
+ısınana kadar 503 döner.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings, thread_budget
+
+logger = logging.getLogger(__name__)
+
+# İlk kullanımda yüklenen modüller; load() bunları bu sırayla import eder
+HEAVY_MODULES = ("cv2", "mediapipe", "rembg")
+
+# Gerçekten import edilen modüllerin import süreleri (saniye)
+import_times: Dict[str, float] = {}
+
+
+class LazyModule:
+    """İlk öznitelik erişiminde gerçek modülü import eden vekil."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Modülü (gerekirse) import eder ve döndürür; import süresi import_times'a yazılır."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    import_times[self._name] = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}' ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+_lazy_modules: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    """name modülünün paylaşılan vekilini döndürür; modül ilk öznitelik erişiminde import edilir."""
+    module = _lazy_modules.get(name)
+    if module is None:
+        module = _lazy_modules.setdefault(name, LazyModule(name))
+    return module
+
+
+def import_heavy_modules() -> Dict[str, float]:
+    """HEAVY_MODULES'u (gerekirse) import eder; import sürelerini döndürür."""
+    for name in HEAVY_MODULES:
+        lazy_import(name).load()
+    return dict(import_times)
+
+
+# MediaPipe yüz algılama modelleri (model_selection)
+SHORT_RANGE = 0  # ~2m içindeki yüzler, 128x128 giriş
+FULL_RANGE = 1  # ~5m içindeki yüzler, 192x192 giriş
+
+
+def apply_thread_budget() -> dict:
+    """
+    OpenCV'nin thread sayısını bu process'in bütçesine ayarlar. ONNX
+    Runtime thread'leri oturum ayarlarında (artifacts), BLAS thread'leri
+    config import edilirken ortam değişkenleriyle ayarlanır.
+    """
+    budget = thread_budget()
+    lazy_import("cv2").setNumThreads(budget.threads)
+    return dict(budget._asdict(), oversubscription=round(budget.oversubscription, 2))
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class ModelLoader:
+    """Process başına ağır modülleri ve modelleri bir kere yükleyip ısıtır."""
+
+    def __init__(self):
+        self.state = "cold"  # cold -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.thread_budget: Optional[dict] = None
+        self._detectors: Dict[int, object] = {}  # model_selection -> detektör
+        # MediaPipe grafiği thread-safe değil; thread havuzunda erişimi sıraya koy
+        self._detection_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # API process'inde: worker'ların bildirdiği ısınma durumları (pid -> durum)
+        self.workers: Dict[int, dict] = {}
+        self.startup_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def face_detector(self, model_selection: int = FULL_RANGE):
+        """MediaPipe yüz detektörünü (0: kısa menzilli, 1: tam menzilli) döndürür, ilk çağrıda oluşturur."""
+        detector = self._detectors.get(model_selection)
+        if detector is None:
+            with self._detection_lock:
+                detector = self._detectors.get(model_selection)
+                if detector is None:
+                    mp = lazy_import("mediapipe")
+                    detector = mp.solutions.face_detection.FaceDetection(
+                        model_selection=model_selection,
+                        min_detection_confidence=0.5
+                    )
+                    self._detectors[model_selection] = detector
+        return detector
+
+    def detect_faces(self, image_rgb: np.ndarray, model_selection: int = FULL_RANGE):
+        """RGB görüntüde yüz algılar; MediaPipe sonucunu döndürür."""
+        detector = self.face_detector(model_selection)
+        with self._detection_lock:
+            return detector.process(image_rgb)
+
+    def load(self) -> dict:
+        """
+        Ağır modülleri import eder, yüz detektörünü ve matting modellerini
+        birer boş çıkarımla ısıtır. Birden çok kez çağrılabilir; hata
+        fırlatmaz, durumu döndürür (modeller ilk kullanımda tekrar denenir).
+        """
+        with self._lock:
+            if self.state in ("ready", "failed"):
+                return self.status()
+            if not settings.MODEL_WARM_UP:
+                # Modeller ilk kullanımda yüklenir
+                self.state, self.error = "ready", None
+                return self.status()
+            self.state = "loading"
+            started = time.perf_counter()
+            try:
+                import_heavy_modules()
+                self.timings["imports"] = time.perf_counter() - started
+
+                start = time.perf_counter()
+                blank = np.zeros((64, 64, 3), dtype=np.uint8)
+                if settings.FACE_CASCADE:
+                    self.detect_faces(blank, SHORT_RANGE)
+                self.detect_faces(blank, FULL_RANGE)
+                self.timings["face_detection"] = time.perf_counter() - start
+
+                from app.ai.models import preload_model_names, session_registry
+                start = time.perf_counter()
+                session_registry.warm_up(preload_model_names())
+                self.timings["matting"] = time.perf_counter() - start
+                self.state, self.error = "ready", None
+            except Exception as e:
+                self.state, self.error = "failed", str(e)
+                logger.warning(f"Model warm-up failed, models will be loaded on first use: {e}")
+            self.timings["total"] = time.perf_counter() - started
+            logger.info(f"Model loader {self.state} in {_ms(self.timings['total'])}ms")
+            return self.status()
+
+    def status(self) -> dict:
+        """Bu process'in ısınma durumu, aşama süreleri ve modül import süreleri (ms)."""
+        return {
+            "pid": os.getpid(),
+            "state": self.state,
+            "error": self.error,
+            "timings_ms": {stage: _ms(seconds) for stage, seconds in self.timings.items()},
+            "import_ms": {name: _ms(seconds) for name, seconds in import_times.items()},
+            "thread_budget": self.thread_budget,
+        }
+
+    async def start(self):
+        """Executor worker'larını arka planda başlatıp ısıtır. Uygulama açılırken çağrılır, beklemez."""
+        if settings.PROCESSING_EXECUTOR == "thread":
+            # pymatting'in numba thread havuzu ana thread dışında başlatılırsa process çıkışta
+            # kilitleniyor; thread havuzunda modüller burada, ana thread'de import edilir
+            import_heavy_modules()
+        if self._task is None:
+            self._task = asyncio.create_task(self._warm_up_workers())
+
+    async def _warm_up_workers(self):
+        from app.ai.executor import start_executor
+        start = time.perf_counter()
+        try:
+            statuses = await run_in_threadpool(start_executor)
+        except Exception as e:
+            logger.error(f"Processing workers could not be started: {e}")
+            statuses = [{"pid": None, "state": "failed", "error": str(e)}]
+        self.workers = {status["pid"]: status for status in statuses}
+        self.startup_seconds = time.perf_counter() - start
+        logger.info(f"Processing workers {self.readiness()['status']} after {_ms(self.startup_seconds)}ms")
+
+    def restart(self):
+        """
+        İşleme havuzu yeniden oluşturulurken çağrılır: ölü worker'ların
+        durumları bırakılır (/ready yeni havuz ısınana kadar 503 döner) ve
+        lifespan ısınmayı başlattıysa yeni havuz arka planda ısıtılır.
+        """
+        started = self._task is not None
+        if started:
+            self._task.cancel()
+            self._task = None
+        self.workers = {}
+        self.startup_seconds = None
+        if started:
+            self._task = asyncio.create_task(self._warm_up_workers())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def readiness(self) -> dict:
+        """API process'inden görülen durum: tüm worker'lar ısındıysa 'ready'."""
+        workers: List[dict] = list(self.workers.values())
+        if not workers:
+            status = "loading" if self._task is not None else "cold"
+        elif all(worker["state"] == "ready" for worker in workers):
+            status = "ready"
+        else:
+            status = "failed"
+        return {
+            "status": status,
+            "startup_ms": None if self.startup_seconds is None else _ms(self.startup_seconds),
+            "workers": workers,
+        }
+
+
+# Process başına yükleyici (her executor worker'ının kendi kopyası vardır)
+model_loader = ModelLoader()
@@ -0,0 +1,189 @@
+"""
+rembg matting modelleri için oturum kayıt defteri.
+
+Her ONNX oturumu process başına bir kere oluşturulur ve tekrar kullanılır;
+model seçimi istek veya config (MATTING_MODEL) üzerinden yapılır.
+Ağırlıklar yerel model deposundan (artifacts.model_store) okunur;
+MATTING_QUANTIZED listesindeki modeller INT8 kopyalarıyla çalışır.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+import numpy as np
+from PIL import Image
+from app.core.config import settings
+from app.ai.artifacts import model_store
+from app.ai.loader import lazy_import
+
+# rembg (onnxruntime, pymatting) ilk oturum oluşturulurken import edilir
+rembg = lazy_import("rembg")
+
+logger = logging.getLogger(__name__)
+
+# Desteklenen matting modelleri ve ONNX giriş boyutları (kare, piksel)
+MATTING_MODELS = {
+    "u2net": 320,               # varsayılan, genel amaçlı (~176MB)
+    "u2netp": 320,              # u2net'in hafif sürümü (~4.7MB), en hızlı
+    "isnet-general-use": 1024,  # en keskin kenarlar, en yavaş
+    "silueta": 320,             # u2net kalitesine yakın, küçültülmüş (~43MB)
+}
+
+# rembg oturumlarının ön işleme parametreleri (mean, std); her oturumun predict() ile aynı
+MATTING_NORMALIZATION = {
+    "u2net": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
+    "u2netp": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
+    "isnet-general-use": ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0)),
+    "silueta": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
+}
+
+# Yüzdelik hesaplaması için model başına tutulan son ölçüm sayısı
+LATENCY_WINDOW = 500
+
+
+class SessionRegistry:
+    """Model adına göre rembg oturumlarını bir kere oluşturup saklar."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, model_name: Optional[str] = None) -> str:
+        """İstenen model adını (yoksa config varsayılanını) doğrular ve döndürür."""
+        name = model_name or settings.MATTING_MODEL
+        if name not in MATTING_MODELS:
+            raise ValueError(f"Unknown matting model '{name}'. Allowed: {', '.join(MATTING_MODELS)}")
+        return name
+
+    def get(self, model_name: Optional[str] = None):
+        """Modelin oturumunu döndürür, ilk çağrıda oluşturur."""
+        name = self.resolve(model_name)
+        session = self._sessions.get(name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(name)
+                if session is None:
+                    quantized = is_quantized(name)
+                    logger.info(f"Loading matting model '{name}'{' (INT8)' if quantized else ''}...")
+                    session = model_store.create_session(name, quantized=quantized)
+                    self._sessions[name] = session
+        return session
+
+    def warm_up(self, model_names: Iterable[str]):
+        """Oturumları oluşturur ve ONNX belleğini ayırmak için birer boş çıkarım yapar."""
+        for name in model_names:
+            session = self.get(name)
+            start = time.perf_counter()
+            rembg.remove(Image.new("RGB", (64, 64)), session=session)
+            logger.info(f"Matting model '{name}' warmed up in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def loaded_models(self) -> List[str]:
+        return list(self._sessions)
+
+
+class LatencyStats:
+    """Model başına arka plan kaldırma sürelerini tutar."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, model_name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.setdefault(model_name, deque(maxlen=self._window))
+            samples.append(seconds)
+            self._counts[model_name] = self._counts.get(model_name, 0) + 1
+
+    def summary(self) -> Dict[str, dict]:
+        """Model başına istek sayısı ve son ölçümlerin ortalama/p50/p95 değerleri (ms)."""
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+
+        result = {}
+        for name, samples in snapshot.items():
+            if not samples:
+                continue
+            result[name] = {
+                "count": counts[name],
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 1),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+            }
+        return result
+
+
+def _percentile(sorted_samples: List[float], percent: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def _normalize(image: Image.Image, model_name: str) -> np.ndarray:
+    """Görüntüyü rembg oturumlarının beklediği (3, S, S) float32 tensöre çevirir."""
+    size = MATTING_MODELS[model_name]
+    mean, std = MATTING_NORMALIZATION[model_name]
+    array = np.asarray(image.convert("RGB").resize((size, size), Image.Resampling.LANCZOS), dtype=np.float32)
+    array = array / max(float(array.max()), 1e-6)
+    array = (array - np.array(mean, dtype=np.float32)) / np.array(std, dtype=np.float32)
+    return array.transpose((2, 0, 1))
+
+
+def _to_mask(prediction: np.ndarray, size) -> Image.Image:
+    low, high = prediction.min(), prediction.max()
+    prediction = (prediction - low) / max(high - low, 1e-6)
+    mask = Image.fromarray((prediction * 255).astype("uint8"), mode="L")
+    return mask.resize(size, Image.Resampling.LANCZOS)
+
+
+def predict_masks(model_name: str, images: List[Image.Image]) -> List[Image.Image]:
+    """
+    Birden çok görüntünün maskesini tek bir batched ONNX çağrısıyla üretir.
+    Ön ve son işleme rembg oturumlarının predict() adımıyla aynıdır.
+    Model sabit batch boyutuyla dışa aktarılmışsa görüntü başına çalışır.
+    """
+    if not images:
+        return []
+    session = session_registry.get(model_name)
+    inner = session.inner_session
+    input_name = inner.get_inputs()[0].name
+    batch = np.stack([_normalize(image, model_name) for image in images])
+    try:
+        predictions = inner.run(None, {input_name: batch})[0][:, 0, :, :]
+    except Exception as e:
+        if len(images) == 1:
+            raise
+        logger.warning(f"Batched inference failed for '{model_name}', falling back to per-image runs: {e}")
+        predictions = np.concatenate([inner.run(None, {input_name: batch[i:i + 1]})[0][:, 0, :, :]
+                                      for i in range(len(images))])
+    return [_to_mask(prediction, image.size) for prediction, image in zip(predictions, images)]
+
+
+def is_quantized(model_name: str) -> bool:
+    """Model MATTING_QUANTIZED listesindeyse INT8 ağırlıklarla çalışır."""
+    return model_name in {name.strip() for name in settings.MATTING_QUANTIZED.split(",")}
+
+
+def model_variant(model_name: str) -> str:
+    """Modelin çalışan sürümü ('u2net' veya 'u2net:int8'); önbellek anahtarlarında kullanılır."""
+    return f"{model_name}:int8" if is_quantized(model_name) else model_name
+
+
+def preload_model_names() -> List[str]:
+    """Başlangıçta yüklenecek modeller: varsayılan model + MATTING_PRELOAD listesi."""
+    names = [session_registry.resolve()]
+    for name in settings.MATTING_PRELOAD.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(session_registry.resolve(name))
+    return names
+
+
+# Process başına oturum kayıt defteri (her executor worker'ının kendi kopyası vardır)
+session_registry = SessionRegistry()
+
+# Gecikme ölçümleri API process'inde, worker'lardan dönen metadata ile toplanır
+model_latency = LatencyStats()
@@ -1,25 +1,27 @@
-import cv2
-import mediapipe as mp
-from rembg import remove
+import numpy as np
 from PIL import Image
+from typing import Dict, List, Optional, Tuple, Union
 import os
 import logging
 import gc
+import json
+import time
 
 # Custom exceptions
 from .exceptions import FaceNotFoundError, MultipleFacesError, ImageReadError
+from .models import MATTING_MODELS, session_registry, predict_masks
+from .image_header import ImageHeader, read_image_header
+from .loader import FULL_RANGE, SHORT_RANGE, lazy_import, model_loader
+from app.core.config import settings
+
+# OpenCV ve rembg ilk kullanımda (veya model_loader.load() ile) import edilir
+cv2 = lazy_import("cv2")
+rembg = lazy_import("rembg")
 
 # Logger'ı ayarla
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MediaPipe Yüz Algılama modelini bir kere yükle
-mp_face_detection = mp.solutions.face_detection
-face_detection = mp_face_detection.FaceDetection(
-    model_selection=1, 
-    min_detection_confidence=0.5
-)
-
 # Önceden tanımlanmış boyutlar (genişlik, yükseklik) piksel cinsinden
 # 300 DPI referans alınmıştır (1 cm = 118 piksel)
 PRESET_SIZES = {
@@ -30,63 +32,461 @@ PRESET_SIZES = {
     "custom": None # Kullanıcı tanımlı boyutlar için
 }
 
-def process_photo(input_image_path: str, output_size=(600, 600)):
+# Baş yüksekliğinin (tepe-çene) fotoğraf yüksekliğine oranı
+HEAD_HEIGHT_RATIOS = {
+    "passport_tr": 0.60,  # 50x60mm biyometrik, baş ~36mm
+    "passport_eu": 0.75,  # ICAO 35x45mm, baş 32-36mm
+    "visa_us": 0.60,      # 2x2 inç, baş 1 - 1 3/8 inç
+    "id_card_tr": 0.60,   # 50x60mm biyometrik, baş ~36mm
+}
+DEFAULT_HEAD_HEIGHT_RATIO = 0.65  # custom boyutlar için
+
+# MediaPipe kutusu kabaca kaş-çene arasını kapsar; tepe dahil baş yüksekliği için ölçek
+FACE_BOX_TO_HEAD = 1.45
+# Baş dışında kalan dikey boşluğun üstte kalan payı (kalanı omuzlar için altta)
+TOP_MARGIN_SHARE = 0.35
+# Matting bölgesine kırpma penceresinin her yanına eklenen pay
+ROI_PADDING = 0.10
+
+CROP_MODES = {"face", "full"}
+
+# Yüz algılama için yeterli çalışma çözünürlüğü (uzun kenar, piksel)
+DETECTION_MAX_SIDE = 640
+# Kısa menzilli modelin kutusu tam menzillininkinden ~%10 küçük ve çeneye hizalı;
+# kırpma oranları (FACE_BOX_TO_HEAD) tam menzilli kutuya göre ayarlı
+SHORT_RANGE_BOX_SCALE = 1.1
+
+def warm_up():
+    """
+    Modelleri belleğe yükler ve ısıtır (bkz. loader.ModelLoader.load).
+    Worker'lar başlarken çağrılır, böylece ilk istek soğuk model yükleme
+    maliyetini ödemez.
+    """
+    return model_loader.load()
+
+ImageInput = Union[str, bytes, bytearray, memoryview, np.ndarray]
+
+# JPEG'ler DCT aşamasında 1/2, 1/4 veya 1/8 ölçekte çözülebilir; tam çözünürlük hiç oluşturulmaz
+# (OpenCV import edilmeden tanımlanabilsin diye bayrak adlarıyla)
+JPEG_REDUCED_FLAGS = {
+    1: "IMREAD_COLOR",
+    2: "IMREAD_REDUCED_COLOR_2",
+    4: "IMREAD_REDUCED_COLOR_4",
+    8: "IMREAD_REDUCED_COLOR_8",
+}
+
+def decode_image(input_image: ImageInput, reduction: int = 1) -> np.ndarray:
+    """
+    Girdiyi tek seferde BGR ndarray'e çözer.
+    Dosya yolu, encode edilmiş görüntü byte'ları veya zaten çözülmüş bir
+    BGR ndarray kabul eder; ndarray kopyalanmadan olduğu gibi döner.
+    reduction (2, 4, 8) JPEG'leri DCT ölçeklemesiyle küçültülmüş çözer.
+    """
+    if isinstance(input_image, np.ndarray):
+        return input_image
+    flags = getattr(cv2, JPEG_REDUCED_FLAGS[reduction])
+    if isinstance(input_image, (bytes, bytearray, memoryview)):
+        image = cv2.imdecode(np.frombuffer(input_image, dtype=np.uint8), flags)
+        if image is None:
+            raise ImageReadError("Image data could not be decoded or is corrupted.")
+        return image
+    image = cv2.imread(input_image, flags)
+    if image is None:
+        raise ImageReadError(f"Image file could not be read or is corrupted: {input_image}")
+    return image
+
+def dct_reduction(scale: float) -> int:
+    """Gereken ölçeği (kaynağa göre) karşılayan en büyük JPEG DCT küçültme çarpanı: 1, 2, 4 veya 8."""
+    for factor in (8, 4, 2):
+        if scale * factor <= 1.0 + 1e-6:
+            return factor
+    return 1
+
+def _jpeg_header(input_image: ImageInput) -> Optional[ImageHeader]:
+    """Girdi küçültülerek çözülebilecek bir JPEG ise başlığını döndürür."""
+    if not settings.JPEG_REDUCED_DECODE or not isinstance(input_image, (bytes, bytearray, memoryview)):
+        return None
+    header = read_image_header(input_image)
+    if header is None or header.format != "jpeg":
+        return None
+    return header
+
+def face_box_pixels(detection, image_size: Tuple[int, int], scale: float = 1.0) -> Tuple[float, float, float, float]:
+    """
+    MediaPipe algılamasının göreli kutusunu (x, y, w, h) piksel koordinatlarına
+    çevirir. scale kutuyu alt kenarının ortası sabit kalacak şekilde büyütür.
+    """
+    width, height = image_size
+    box = detection.location_data.relative_bounding_box
+    x, y, w, h = box.xmin * width, box.ymin * height, box.width * width, box.height * height
+    return x - w * (scale - 1) / 2, y - h * (scale - 1), w * scale, h * scale
+
+def compute_crop_window(face_box, output_size, head_ratio: float) -> Tuple[float, float, float, float]:
+    """
+    Yüz kutusundan nihai vesikalık kırpma penceresini (x, y, w, h) hesaplar.
+    Pencerenin en-boy oranı output_size ile aynıdır ve baş, pencere
+    yüksekliğinin head_ratio kadarını kaplar. Pencere görüntü dışına
+    taşabilir; taşan kısım beyaz arka planla doldurulur.
+    """
+    x, y, w, h = face_box
+    head_height = h * FACE_BOX_TO_HEAD
+    head_top = y + h - head_height
+    frame_height = head_height / head_ratio
+    frame_width = frame_height * output_size[0] / output_size[1]
+    frame_x = x + w / 2 - frame_width / 2
+    frame_y = head_top - (frame_height - head_height) * TOP_MARGIN_SHARE
+    return frame_x, frame_y, frame_width, frame_height
+
+def matting_region(window, image_size: Tuple[int, int], padding: float = ROI_PADDING) -> Tuple[int, int, int, int]:
+    """Pencereyi her yandan padding kadar genişletip görüntü sınırlarına kırpar (x0, y0, x1, y1)."""
+    x, y, w, h = window
+    width, height = image_size
+    x0 = max(0, int(x - w * padding))
+    y0 = max(0, int(y - h * padding))
+    x1 = min(width, int(np.ceil(x + w * (1 + padding))))
+    y1 = min(height, int(np.ceil(y + h * (1 + padding))))
+    return x0, y0, x1, y1
+
+def _to_rgb(image_bgr: np.ndarray, scale: float) -> np.ndarray:
+    """BGR görüntüyü (gerekirse önce küçültüp) RGB'ye çevirir; küçültme yalnızca verilen bölgeyi işler."""
+    if scale < 1.0:
+        height, width = image_bgr.shape[:2]
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image_bgr = cv2.resize(image_bgr, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+
+def detect_face(detection_rgb: np.ndarray, metadata: dict):
+    """
+    Yüzleri kademeli algılar. Vesikalıkta yüz büyük ve ortada olduğundan
+    önce kısa menzilli model FACE_CASCADE_MAX_SIDE'a küçültülmüş kopyada
+    çalışır; tek ve FACE_CASCADE_MIN_CONFIDENCE'tan emin bir yüz bulursa
+    sonucu kullanılır. Aksi halde (yüz yok, birden çok yüz, düşük güven)
+    tam menzilli model algılama çözünürlüğünde çalışır. Kutular göreli
+    olduğu için sonuç çözünürlükten bağımsızdır. Kullanılan yol
+    metadata["face_detection"]'a yazılır ve metadata["face_detection_paths"]'te
+    sayılır (short_range, full_range_fallback; kademe kapalıysa full_range).
+    """
+    path = "full_range"
+    if settings.FACE_CASCADE:
+        start = time.perf_counter()
+        height, width = detection_rgb.shape[:2]
+        scale = settings.FACE_CASCADE_MAX_SIDE / max(height, width)
+        small_rgb = detection_rgb
+        if scale < 1.0:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            # INTER_AREA tam sayı olmayan oranlarda ~10 kat yavaş; 128x128 giriş için doğrusal yeterli
+            small_rgb = cv2.resize(detection_rgb, size, interpolation=cv2.INTER_LINEAR)
+        _add_timing(metadata, "resize", start)
+        start = time.perf_counter()
+        results = model_loader.detect_faces(small_rgb, SHORT_RANGE)
+        _add_timing(metadata, "face_detection", start)
+        detections = results.detections or []
+        if len(detections) == 1 and detections[0].score[0] >= settings.FACE_CASCADE_MIN_CONFIDENCE:
+            path = "short_range"
+        else:
+            path = "full_range_fallback"
+
+    if path != "short_range":
+        start = time.perf_counter()
+        results = model_loader.detect_faces(detection_rgb, FULL_RANGE)
+        _add_timing(metadata, "face_detection", start)
+
+    metadata["face_detection"] = path
+    paths = metadata.setdefault("face_detection_paths", {})
+    paths[path] = paths.get(path, 0) + 1
+    return results
+
+def _region_to_rgb(image_bgr: np.ndarray, region, source_size, scale: float) -> np.ndarray:
+    """
+    Kaynak koordinatlarındaki region'ı kesip scale ile RGB'ye çevirir.
+    image_bgr kaynağın DCT ile küçültülmüş bir decode'u olabilir; çıktı boyutu
+    her durumda tam çözünürlükten üretilecek olanla aynıdır.
+    """
+    height, width = image_bgr.shape[:2]
+    fx, fy = width / source_size[0], height / source_size[1]
+    x0, y0, x1, y1 = region
+    crop = image_bgr[int(y0 * fy):int(np.ceil(y1 * fy)), int(x0 * fx):int(np.ceil(x1 * fx))]
+    size = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+    if (crop.shape[1], crop.shape[0]) != size:
+        crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+
+def _compose_centered(cutout: Image.Image, output_size) -> Image.Image:
+    """Kesilmiş görüntüyü oranını koruyarak küçültür ve beyaz arka planın ortasına yapıştırır."""
+    cutout = cutout.copy()
+    cutout.thumbnail(output_size, Image.Resampling.LANCZOS)
+    background = Image.new("RGBA", output_size, (255, 255, 255, 255))
+    paste_x = (output_size[0] - cutout.width) // 2
+    paste_y = (output_size[1] - cutout.height) // 2
+    background.paste(cutout, (paste_x, paste_y), cutout)
+    return background.convert('RGB')
+
+def _compose_window(cutout: Image.Image, region, window, cutout_scale: float, output_size) -> Image.Image:
+    """
+    Matting bölgesinden çıkan kesiti kırpma penceresine göre beyaz arka plana yerleştirir.
+    region ve window kaynak görüntü koordinatlarındadır; cutout region'ın
+    cutout_scale ile ölçeklenmiş halidir.
+    """
+    frame_x, frame_y, frame_width, _ = window
+    to_output = output_size[0] / frame_width
+    resize = to_output / cutout_scale
+    target_size = (max(1, round(cutout.width * resize)), max(1, round(cutout.height * resize)))
+    if target_size != cutout.size:
+        cutout = cutout.resize(target_size, Image.Resampling.LANCZOS)
+    background = Image.new("RGBA", output_size, (255, 255, 255, 255))
+    offset = (round((region[0] - frame_x) * to_output), round((region[1] - frame_y) * to_output))
+    background.paste(cutout, offset, cutout)
+    return background.convert('RGB')
+
+def _crop_window_for(face_box, output_size, output_format: Optional[str]):
+    head_ratio = HEAD_HEIGHT_RATIOS.get(output_format, DEFAULT_HEAD_HEIGHT_RATIO)
+    return compute_crop_window(face_box, output_size, head_ratio)
+
+def _required_scale(face_box, source_size, output_size, output_format, crop_mode: str) -> float:
+    """Verilen çıktıyı üretmek için kaynağa göre gereken en küçük ölçek."""
+    if crop_mode == "face":
+        return output_size[0] / _crop_window_for(face_box, output_size, output_format)[2]
+    return min(output_size[0] / source_size[0], output_size[1] / source_size[1])
+
+def preset_targets() -> List[Tuple[Tuple[int, int], str]]:
+    """Tüm hazır çıktılar (boyut, format); kesitin hepsini karşılaması için extra_targets olarak verilir."""
+    return [(tuple(size), name) for name, size in PRESET_SIZES.items() if size]
+
+def _render_targets(output_size, output_format, extra_targets=()):
+    """Kesitin karşılaması gereken çıktılar: istenen boyut ve varsa ek hedefler."""
+    targets = [(tuple(output_size), output_format)]
+    for size, name in extra_targets:
+        if (tuple(size), name) not in targets:
+            targets.append((tuple(size), name))
+    return targets
+
+
+class Cutout:
+    """
+    Arka planı kaldırılmış bölge (RGBA) ve yüz geometrisi.
+    Kesit istenen çıktıyı (ve varsa ek hedefleri) karşılayacak bölge ve
+    çözünürlükte üretilir; supports() başka bir çıktıyı da karşılıyorsa o
+    çıktı yalnızca render_cutout ile (matting tekrarlanmadan) üretilebilir.
+    """
+
+    def __init__(self, image: Image.Image, region, scale: float, face_box, source_size, crop_mode: str, model_name: str):
+        self.image = image
+        self.region = tuple(region)
+        self.scale = scale
+        self.face_box = tuple(face_box)
+        self.source_size = tuple(source_size)
+        self.crop_mode = crop_mode
+        self.model_name = model_name
+
+    def supports(self, output_size, output_format: Optional[str] = None) -> bool:
+        """Kesitin bu çıktıyı çözünürlük kaybı ve eksik bölge olmadan karşılayıp karşılamadığı."""
+        needed = _required_scale(self.face_box, self.source_size, output_size, output_format, self.crop_mode)
+        if needed > self.scale + 1e-6 and self.scale < 1.0:
+            return False
+        if self.crop_mode == "face":
+            window = _crop_window_for(self.face_box, output_size, output_format)
+            x0, y0, x1, y1 = matting_region(window, self.source_size)
+            return (x0 >= self.region[0] and y0 >= self.region[1]
+                    and x1 <= self.region[2] and y1 <= self.region[3])
+        return True
+
+    def to_bytes(self) -> bytes:
+        """Önbellek için serileştirir: uzunluk önekli JSON başlık + ham RGBA pikseller."""
+        header = json.dumps({
+            "size": list(self.image.size),
+            "region": list(self.region),
+            "scale": self.scale,
+            "face_box": list(self.face_box),
+            "source_size": list(self.source_size),
+            "crop_mode": self.crop_mode,
+            "model": self.model_name,
+        }).encode()
+        return len(header).to_bytes(4, "big") + header + self.image.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Cutout":
+        header_length = int.from_bytes(data[:4], "big")
+        header = json.loads(data[4:4 + header_length])
+        image = Image.frombytes("RGBA", tuple(header["size"]), data[4 + header_length:])
+        return cls(image, header["region"], header["scale"], header["face_box"],
+                   header["source_size"], header["crop_mode"], header["model"])
+
+
+def _add_timing(metadata: dict, stage: str, start: float):
+    """start'tan (perf_counter) bu yana geçen süreyi metadata'daki aşama süresine ekler."""
+    timings = metadata.setdefault("timings", {})
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def _prepare_matting(input_image: ImageInput, output_size, model_name: str, output_format: Optional[str],
+                     crop_mode: str, metadata: dict, extra_targets=()):
+    """
+    Decode ve yüz algılamayı yapar, matting bölgesini ve ölçeğini belirler.
+    Bölge istenen çıktıyı ve extra_targets'taki (boyut, format) çıktıları kapsar.
+    (matting girdisi, kesit geometrisi) döner; geometri Cutout'un
+    matting dışındaki alanlarıdır.
+    """
+
+    # 1. Görüntüyü Çöz ve Kontrol Et
+    # JPEG'ler önce yüz algılamaya yetecek kadar küçültülmüş çözülür; boyut başlıktan okunur
+    header = _jpeg_header(input_image)
+    if header is not None:
+        image_size = header.display_size
+        detection_reduction = dct_reduction(min(1.0, DETECTION_MAX_SIDE / max(image_size)))
+    else:
+        detection_reduction = 1
+    start = time.perf_counter()
+    image_cv2 = decode_image(input_image, detection_reduction)
+    _add_timing(metadata, "decode", start)
+    if header is None:
+        image_size = (image_cv2.shape[1], image_cv2.shape[0])
+    width, height = image_size
+    # Her aşama yalnızca ihtiyaç duyduğu çözünürlükte çalışır; plan metadata'ya yazılır
+    resize_plan = {"source": [width, height], "output": list(output_size)}
+    metadata["resize_plan"] = resize_plan
+
+    # 2. Yüz Algılama ve Kalite Kontrol (küçük bir kopya üzerinde)
+    logger.info("Step 1 & 2: Face detection and quality check...")
+    start = time.perf_counter()
+    detection_rgb = _to_rgb(image_cv2, min(1.0, DETECTION_MAX_SIDE / max(image_cv2.shape[:2])))
+    _add_timing(metadata, "resize", start)
+    resize_plan["detection"] = [detection_rgb.shape[1], detection_rgb.shape[0]]
+    results = detect_face(detection_rgb, metadata)
+    del detection_rgb
+
+    if not results.detections:
+        raise FaceNotFoundError("No face detected in the photo.")
+    if len(results.detections) > 1:
+        raise MultipleFacesError("Multiple faces detected in the photo.")
+
+    # Kalite kontrol mantığı...
+    logger.info("Quality check successful.")
+
+    # 3. Arka Planı Kaldırma
+    box_scale = SHORT_RANGE_BOX_SCALE if metadata["face_detection"] == "short_range" else 1.0
+    face_box = face_box_pixels(results.detections[0], image_size, box_scale)
+    targets = _render_targets(output_size, output_format, extra_targets)
+    if crop_mode == "face":
+        # Kırpma pencerelerini önce belirle, matting'i yalnızca onları kapsayan bölgede çalıştır
+        regions = [matting_region(_crop_window_for(face_box, size, fmt), image_size) for size, fmt in targets]
+        region = (min(r[0] for r in regions), min(r[1] for r in regions),
+                  max(r[2] for r in regions), max(r[3] for r in regions))
+        metadata["crop_window"] = [round(v) for v in _crop_window_for(face_box, output_size, output_format)]
+    else:
+        region = (0, 0, width, height)
+    # Çıktılar için gerekenden fazla piksel işleme, ama modelin giriş boyutunun altına da inme
+    output_scale = max(_required_scale(face_box, image_size, size, fmt, crop_mode) for size, fmt in targets)
+    region_width, region_height = region[2] - region[0], region[3] - region[1]
+    cutout_scale = min(1.0, max(output_scale, MATTING_MODELS[model_name] / max(region_width, region_height)))
+    # Matting'e yetecek en küçük DCT ölçeğinde çöz; algılama decode'u yetiyorsa onu kullan
+    matting_reduction = dct_reduction(cutout_scale) if header is not None else 1
+    if matting_reduction < detection_reduction:
+        del image_cv2
+        start = time.perf_counter()
+        image_cv2 = decode_image(input_image, matting_reduction)
+        _add_timing(metadata, "decode", start)
+    else:
+        matting_reduction = detection_reduction
+    resize_plan["decode"] = [image_cv2.shape[1], image_cv2.shape[0]]
+    metadata["decode_scale"] = {"detection": 1 / detection_reduction, "matting": 1 / matting_reduction}
+    # Batch'te tüm öğeler için sayılır; record_pipeline_metadata metriklere yazar
+    reductions = metadata.setdefault("decode_reductions", {})
+    for stage, reduction in (("detection", detection_reduction), ("matting", matting_reduction)):
+        counts = reductions.setdefault(stage, {})
+        counts[reduction] = counts.get(reduction, 0) + 1
+    start = time.perf_counter()
+    matting_input = Image.fromarray(_region_to_rgb(image_cv2, region, image_size, cutout_scale))
+    _add_timing(metadata, "resize", start)
+    resize_plan["matting"] = list(matting_input.size)
+    del image_cv2
+
+    return matting_input, (region, cutout_scale, face_box, image_size, crop_mode, model_name)
+
+def _resolve_crop_mode(crop_mode: Optional[str]) -> str:
+    crop_mode = crop_mode or settings.CROP_MODE
+    if crop_mode not in CROP_MODES:
+        raise ValueError(f"Unknown crop mode '{crop_mode}'. Allowed: {', '.join(sorted(CROP_MODES))}")
+    return crop_mode
+
+def extract_cutout(input_image: ImageInput, output_size=(600, 600), model_name=None,
+                   output_format: Optional[str] = None, crop_mode: Optional[str] = None, metadata=None,
+                   extra_targets=()) -> Cutout:
+    """
+    Pipeline'ın pahalı kısmı: decode, yüz algılama ve arka plan kaldırma.
+    Kesit yalnızca istenen çıktıyı karşılayacak bölgede ve çözünürlükte
+    üretilir; extra_targets verilirse (ör. preset_targets()) onları da
+    karşılayacak kadar genişler. Her hazır boyutu kapsayan birleşim bölgesi
+    tek bir çıktıya göre daha büyük bir girdiyle matting yapar, bu yüzden
+    yalnızca gerektiğinde istenir. metadata verilirse boyutlandırma planı ve
+    süreler içine yazılır.
+    """
+    model_name = session_registry.resolve(model_name)
+    crop_mode = _resolve_crop_mode(crop_mode)
+    if metadata is None:
+        metadata = {"timings": {}}
+
+    matting_input, geometry = _prepare_matting(
+        input_image, output_size, model_name, output_format, crop_mode, metadata, extra_targets
+    )
+
+    logger.info(f"Step 3: Removing background ({model_name}, {matting_input.width}x{matting_input.height})...")
+    session = session_registry.get(model_name)
+    start = time.perf_counter()
+    no_bg_image = rembg.remove(matting_input, session=session)
+    metadata["timings"]["background_removal"] = time.perf_counter() - start
+
+    return Cutout(no_bg_image, *geometry)
+
+def render_cutout(cutout: Cutout, output_size, output_format: Optional[str] = None) -> Image.Image:
+    """Pipeline'ın ucuz kısmı: kesiti çıktı boyutuna getirip beyaz arka plana yerleştirir."""
+    logger.info(f"Step 4: Resizing to {output_size[0]}x{output_size[1]}...")
+    if cutout.crop_mode == "face":
+        window = _crop_window_for(cutout.face_box, output_size, output_format)
+        return _compose_window(cutout.image, cutout.region, window, cutout.scale, output_size)
+    return _compose_centered(cutout.image, output_size)
+
+def process_photo(input_image: ImageInput, output_size=(600, 600), model_name=None, return_metadata=False,
+                  output_format: Optional[str] = None, crop_mode: Optional[str] = None, extra_targets=()):
     """
     Bir fotoğrafta yüz algılar, arka planı kaldırır ve yeniden boyutlandırır.
+    input_image dosya yolu, encode edilmiş byte'lar veya BGR ndarray olabilir;
+    görüntü diske yazılmadan bellekte çözülür. JPEG byte'ları tam çözünürlükte
+    değil, yüz algılama ve matting'in gerektirdiği DCT ölçeğinde (1/2, 1/4,
+    1/8) çözülür; diğer girdiler bir kere çözülür ve buffer paylaşılır.
+    model_name verilmezse config'deki varsayılan matting modeli kullanılır.
+    crop_mode="face" (varsayılan) ise kırpma penceresi yüz kutusundan ve
+    output_format'ın baş/çerçeve oranından hesaplanır, arka plan yalnızca
+    bu bölgede kaldırılır; "full" tüm kareyi işler ve ortalar.
+    Her aşama output_size'ın gerektirdiği en küçük çözünürlükte çalışır:
+    yüz algılama ~DETECTION_MAX_SIDE (önce FACE_CASCADE_MAX_SIDE'da
+    kısa menzilli model, bkz. detect_face), matting çıktı/model giriş boyutu,
+    birleştirme çıktı boyutu.
+    return_metadata=True ise (görüntü, metadata) çifti döner; metadata
+    kullanılan modeli, kırpma bilgisini, boyutlandırma planını, aşama
+    sürelerini (saniye) ve başka formatlar için tekrar kullanılabilecek
+    kesiti ("cutout") içerir. Kesit extra_targets'taki çıktıları da
+    karşılayacak şekilde genişletilebilir (bkz. extract_cutout).
     """
-    logger.info(f"Processing started for: {input_image_path}")
+    source = input_image if isinstance(input_image, str) else f"<{type(input_image).__name__}>"
+    logger.info(f"Processing started for: {source}")
+    model_name = session_registry.resolve(model_name)
+    crop_mode = _resolve_crop_mode(crop_mode)
+    metadata = {"model": model_name, "crop_mode": crop_mode, "timings": {}}
 
     try:
-        # 1. Görüntüyü Oku ve Kontrol Et
-        image_cv2 = cv2.imread(input_image_path)
-        if image_cv2 is None:
-            raise ImageReadError(f"Image file could not be read or is corrupted: {input_image_path}")
-        
-        # Memory optimization: Resize if too large
-        height, width = image_cv2.shape[:2]
-        if width > 1920 or height > 1080:
-            scale = min(1920/width, 1080/height)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            image_cv2 = cv2.resize(image_cv2, (new_width, new_height))
-            logger.info(f"Resized image to {new_width}x{new_height} for memory optimization")
-
-        # 2. Yüz Algılama ve Kalite Kontrol
-        logger.info("Step 1 & 2: Face detection and quality check...")
-        image_rgb = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2RGB)
-        results = face_detection.process(image_rgb)
-
-        if not results.detections:
-            raise FaceNotFoundError("No face detected in the photo.")
-        if len(results.detections) > 1:
-            raise MultipleFacesError("Multiple faces detected in the photo.")
-
-        # Kalite kontrol mantığı...
-        logger.info("Quality check successful.")
-
-        # 3. Arka Planı Kaldırma
-        logger.info("Step 3: Removing background...")
-        input_pil_image = Image.open(input_image_path)
-        no_bg_image = remove(input_pil_image)
+        cutout = extract_cutout(input_image, output_size, model_name, output_format, crop_mode, metadata, extra_targets)
         
         # Memory cleanup
-        del image_cv2, image_rgb, input_pil_image
         gc.collect()
 
         # 4. Boyutlandırma ve Arka Plan Ekleme
-        logger.info(f"Step 4: Resizing to {output_size[0]}x{output_size[1]}...")
-        no_bg_image.thumbnail(output_size, Image.Resampling.LANCZOS)
-        new_background = Image.new("RGBA", output_size, (255, 255, 255, 255))
-        paste_x = (output_size[0] - no_bg_image.width) // 2
-        paste_y = (output_size[1] - no_bg_image.height) // 2
-        new_background.paste(no_bg_image, (paste_x, paste_y), no_bg_image)
-        final_image = new_background.convert('RGB')
-        
-        # Memory cleanup
-        del no_bg_image, new_background
-        gc.collect()
+        start = time.perf_counter()
+        final_image = render_cutout(cutout, output_size, output_format)
+        _add_timing(metadata, "compose", start)
 
         logger.info("Processing completed successfully.")
+        if return_metadata:
+            metadata["cutout"] = cutout
+            return final_image, metadata
         return final_image
 
     except Exception as e:
@@ -94,6 +494,81 @@ def process_photo(input_image_path: str, output_size=(600, 600)):
         gc.collect()
         raise e
 
+def process_photo_formats(input_image: ImageInput, targets: Dict[str, Tuple[int, int]], model_name=None,
+                          crop_mode: Optional[str] = None):
+    """
+    Tek bir decode, yüz algılama ve matting ile birden çok formatı üretir.
+    targets format adından çıktı boyutuna eşlemedir; ({format: görüntü}, metadata) döner.
+    """
+    if not targets:
+        raise ValueError("At least one output format is required.")
+    model_name = session_registry.resolve(model_name)
+    crop_mode = _resolve_crop_mode(crop_mode)
+    metadata = {"model": model_name, "crop_mode": crop_mode, "timings": {}}
+
+    # Kesit istenen formatların hepsini karşılamalı; matting bölgesi yalnızca onların birleşimi kadar genişler
+    (primary, size), *others = targets.items()
+    try:
+        cutout = extract_cutout(input_image, size, model_name, primary, crop_mode, metadata,
+                                [(other_size, name) for name, other_size in others])
+        gc.collect()
+        start = time.perf_counter()
+        images = {name: render_cutout(cutout, size, name) for name, size in targets.items()}
+        _add_timing(metadata, "compose", start)
+        metadata["cutout"] = cutout
+        return images, metadata
+    except Exception as e:
+        gc.collect()
+        raise e
+
+def process_photo_batch(input_images: List[ImageInput], output_size=(600, 600), model_name=None,
+                        output_format: Optional[str] = None, crop_mode: Optional[str] = None,
+                        batch_size: Optional[int] = None):
+    """
+    Birden çok fotoğrafı işler; matting, batch_size'lık gruplar halinde tek
+    bir batched ONNX çağrısıyla yapılır. Yüz algılama (MediaPipe) görüntü
+    başına çalışır. Bir fotoğraftaki hata (ör. FaceNotFoundError) yalnızca
+    o fotoğrafı etkiler: girdi sırasıyla, her eleman için işlenmiş görüntü
+    ya da yakalanan hata döner. İkinci değer metadata'dır.
+    """
+    model_name = session_registry.resolve(model_name)
+    crop_mode = _resolve_crop_mode(crop_mode)
+    batch_size = batch_size or settings.MATTING_BATCH_SIZE
+    # Görüntü başına aşamalar (decode, yüz algılama, compose...) öğe başına ayrı ölçülür;
+    # batched matting çağrısı tek bir öğeye ait olmadığından "batch" aşamasına yazılır
+    item_timings = [{} for _ in input_images]
+    metadata = {"model": model_name, "crop_mode": crop_mode, "timings": {"batch": 0.0},
+                "item_timings": item_timings, "face_detection_paths": {}, "decode_reductions": {}}
+
+    results: List[Union[Image.Image, Exception]] = [None] * len(input_images)
+    prepared = []
+    for index, input_image in enumerate(input_images):
+        try:
+            prepared.append((index, *_prepare_matting(
+                input_image, output_size, model_name, output_format, crop_mode,
+                {"timings": item_timings[index], "face_detection_paths": metadata["face_detection_paths"],
+                 "decode_reductions": metadata["decode_reductions"]}
+            )))
+        except Exception as e:
+            logger.info(f"Batch item {index} failed before matting: {e}")
+            results[index] = e
+
+    for start_index in range(0, len(prepared), batch_size):
+        chunk = prepared[start_index:start_index + batch_size]
+        logger.info(f"Step 3: Removing background for a batch of {len(chunk)} ({model_name})...")
+        start = time.perf_counter()
+        masks = predict_masks(model_name, [matting_input for _, matting_input, _ in chunk])
+        metadata["timings"]["batch"] += time.perf_counter() - start
+        for (index, matting_input, geometry), mask in zip(chunk, masks):
+            start = time.perf_counter()
+            cutout = Cutout(rembg.bg.naive_cutout(matting_input, mask), *geometry)
+            results[index] = render_cutout(cutout, output_size, output_format)
+            item_timings[index]["compose"] = time.perf_counter() - start
+        gc.collect()
+
+    metadata["batches"] = -(-len(prepared) // batch_size)
+    return results, metadata
+
 
 if __name__ == '__main__':
     # Bu bölüm test amaçlıdır ve doğrudan çalıştırıldığında exception'ları yakalar
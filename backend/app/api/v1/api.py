@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, photos
+from app.api.v1.endpoints import auth, photos, jobs
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
-api_router.include_router(photos.router, prefix="/photos", tags=["photos"]) 
\ No newline at end of file
+api_router.include_router(photos.router, prefix="/photos", tags=["photos"]) 
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
\ No newline at end of file
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+import logging
+from typing import Optional
+
+from app.ai.processing import PRESET_SIZES, CROP_MODES
+from app.ai.models import MATTING_MODELS
+from app.ai.encoding import IMAGE_FORMATS
+from app.ai.exceptions import PhotoProcessingError, FaceNotFoundError, MultipleFacesError, ImageReadError
+from app.api.v1.endpoints.photos import validate_image_file, resolve_output_size, processing_http_exception, image_response, encode_options
+from app.services.jobs import job_store, job_worker, job_encoding, SUCCEEDED, FAILED
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Failed jobs store only the exception class name; rebuild it to reuse the /preview error mapping
+PROCESSING_ERRORS = {
+    cls.__name__: cls for cls in (PhotoProcessingError, FaceNotFoundError, MultipleFacesError, ImageReadError)
+}
+
+def job_error(job: dict) -> dict:
+    """Describe a failed job with the same status code and message /preview would return."""
+    error_cls = PROCESSING_ERRORS.get(job["error_type"])
+    if error_cls is not None:
+        error = processing_http_exception(error_cls(job["error_message"]), job["id"])
+    else:
+        logger.error(f"Job {job['id']} failed with an unexpected error: {job['error_type']}: {job['error_message']}")
+        error = HTTPException(status_code=500, detail="An unexpected server error occurred.")
+    return {"status_code": error.status_code, "error": job["error_type"], "detail": error.detail}
+
+@router.post("", status_code=202)
+async def submit_job(
+    request: Request,
+    file: UploadFile = File(...),
+    output_format: Optional[str] = Query("passport_eu", enum=list(PRESET_SIZES.keys())),
+    custom_width: Optional[int] = Query(None, gt=0, le=2000),
+    custom_height: Optional[int] = Query(None, gt=0, le=2000),
+    model: Optional[str] = Query(None, enum=list(MATTING_MODELS.keys())),
+    crop_mode: Optional[str] = Query(None, enum=sorted(CROP_MODES)),
+    image_format: Optional[str] = Query(None, enum=list(IMAGE_FORMATS)),
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    compress_level: Optional[int] = Query(None, ge=0, le=9)
+):
+    """
+    Fotoğrafı kuyruğa ekler ve hemen 202 döner. İşlem /preview ile aynı
+    process_photo çekirdeğini kullanır; durum GET /jobs/{id}, sonuç
+    GET /jobs/{id}/result üzerinden alınır.
+    """
+    client_ip = request.client.host
+    logger.info(f"Job submitted from IP: {client_ip} for file: {file.filename}")
+
+    contents = validate_image_file(file)
+
+    output_size = resolve_output_size(output_format, custom_width, custom_height)
+    if not output_size:
+        raise HTTPException(status_code=400, detail="You must provide a valid output_format or custom dimensions.")
+
+    encoding = encode_options(image_format, quality, compress_level)
+    params = {
+        "output_format": output_format,
+        "output_size": list(output_size),
+        "model": model,
+        "crop_mode": crop_mode,
+        "encoding": encoding._asdict(),
+    }
+    job_id = await run_in_threadpool(job_store.submit, contents, params)
+    job_worker.notify()
+    return await get_job_status(job_id)
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    """İşin durumunu döndürür; kuyruktaki işler için önlerindeki iş sayısı (position) da verilir."""
+    job = await run_in_threadpool(job_store.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or its result has expired.")
+    if job["status"] == FAILED:
+        job.update(job_error(job))
+    del job["error_type"], job["error_message"]
+    return job
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Tamamlanan işin sonucunu (istenen formatta) döndürür. Henüz bitmemiş işler için 409, başarısız işler için işleme hatası döner."""
+    job = await run_in_threadpool(job_store.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or its result has expired.")
+    if job["status"] == FAILED:
+        error = job_error(job)
+        raise HTTPException(status_code=error["status_code"], detail=error["detail"])
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is not finished yet (status: {job['status']}).")
+
+    result = await run_in_threadpool(job_store.result, job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Job not found or its result has expired.")
+    return image_response(result, job_encoding(job["params"]), job["params"]["output_format"])
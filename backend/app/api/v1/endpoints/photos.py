@@ -1,16 +1,28 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from PIL import Image
+import asyncio
+import io
+import json
 import os
-import uuid
-import imghdr
+import zipfile
 import logging
-import time
-import random
-from typing import Optional
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import rejections, stage_latency, record_pipeline_metadata
 
 # AI pipeline, custom exceptions, and preset sizes
-from app.ai.processing import process_photo, PRESET_SIZES
+from app.ai.processing import (
+    process_photo, process_photo_formats, process_photo_batch, render_cutout, preset_targets, Cutout, PRESET_SIZES,
+    CROP_MODES
+)
+from app.ai.executor import run_in_executor
+from app.ai.encoding import IMAGE_FORMATS, EncodeOptions, encode_image, resolve_encode_options
+from app.ai.image_header import sniff_format, read_image_header
+from app.ai.models import MATTING_MODELS, is_quantized, model_latency, model_variant
+from app.services.cache import make_cache_key, result_cache, cutout_cache
 from app.ai.exceptions import PhotoProcessingError, FaceNotFoundError, MultipleFacesError, ImageReadError
 
 # Logger setup
@@ -19,59 +31,236 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # --- Constants ---
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = settings.MAX_FILE_SIZE  # 10MB by default
+UPLOAD_CHUNK_SIZE = 64 * 1024  # magic bytes are sniffed from the first chunk
 ALLOWED_FORMATS = {"jpeg", "jpg", "png"}
 ALLOWED_MIME_TYPES = {
     "image/jpeg": {"jpeg", "jpg"},
     "image/png": {"png"}
 }
-TEMP_DIR = os.path.join("uploads", "temp")
-CLEANUP_MAX_AGE_SECONDS = 3600  # 1 hour
-CLEANUP_PROBABILITY = 0.01  # 1% chance to run on a request
+# --- File Validation ---
 
-os.makedirs(TEMP_DIR, exist_ok=True)
+def reject(reason: str, status_code: int, detail: str) -> HTTPException:
+    """Build a client error and count it under the given rejection reason."""
+    rejections.inc(reason=reason)
+    return HTTPException(status_code=status_code, detail=detail)
 
-# --- File Validation and Cleanup ---
+def file_too_large() -> HTTPException:
+    return reject("too_large", 413, f"File size is too large. Maximum size: {MAX_FILE_SIZE/1024/1024:.1f}MB")
 
-def validate_image_file(file: UploadFile):
-    # (Implementation is the same as before, removed for brevity)
-    contents = file.file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail=f"File size is too large. Maximum size: {MAX_FILE_SIZE/1024/1024:.1f}MB")
-    file.file.seek(0)
+def validate_image_file(file: UploadFile) -> bytearray:
+    """
+    Validate the upload while streaming it in chunks and return its contents in a single buffer.
+    The declared size and content type are checked before reading, the format is sniffed from the
+    first chunk, and reading stops as soon as MAX_FILE_SIZE is exceeded. Image dimensions are read
+    from the header and checked against MAX_IMAGE_PIXELS before anything is decoded.
+    """
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise file_too_large()
     content_type = file.content_type
     if content_type not in ALLOWED_MIME_TYPES:
-        raise HTTPException(status_code=415, detail=f"Unsupported file type. Allowed formats: {', '.join(ALLOWED_FORMATS)}")
-    img_format = imghdr.what(None, h=contents)
+        raise reject("unsupported_type", 415, f"Unsupported file type. Allowed formats: {', '.join(ALLOWED_FORMATS)}")
+
+    # Read straight into a buffer sized from the declared length; the pipeline decodes from it without copying
+    buffer = bytearray(file.size if file.size else UPLOAD_CHUNK_SIZE)
+    view = memoryview(buffer)
+    length = file.file.readinto(view[:UPLOAD_CHUNK_SIZE])
+    img_format = sniff_format(view[:length])
     if img_format not in ALLOWED_FORMATS:
-        raise HTTPException(status_code=400, detail="Invalid image file. Please upload a valid image.")
+        view.release()
+        raise reject("invalid_image", 400, "Invalid image file. Please upload a valid image.")
     if img_format not in ALLOWED_MIME_TYPES[content_type]:
-        raise HTTPException(status_code=400, detail="File format and content type mismatch.")
+        view.release()
+        raise reject("format_mismatch", 400, "File format and content type mismatch.")
+
+    while length < len(buffer):
+        read = file.file.readinto(view[length:length + UPLOAD_CHUNK_SIZE])
+        if not read:
+            break
+        length += read
+    view.release()
+
+    # Size unknown or larger than declared: keep streaming chunks, aborting past the limit
+    while length == len(buffer):
+        chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        length += len(chunk)
+        if length > MAX_FILE_SIZE:
+            raise file_too_large()
+        buffer += chunk
+    if length > MAX_FILE_SIZE:
+        raise file_too_large()
+
+    del buffer[length:]
+    file.file.seek(0)
 
-def cleanup_file(path: str):
-    """Safely remove a file if it exists."""
+    # Decompression-bomb guard: dimensions come from the header, nothing is decoded yet
+    header = read_image_header(buffer)
+    if header is None:
+        raise reject("invalid_image", 400, "Invalid image file. Please upload a valid image.")
+    if header.pixels > settings.MAX_IMAGE_PIXELS:
+        raise reject(
+            "dimensions_too_large", 413,
+            f"Image dimensions are too large ({header.width}x{header.height}). "
+            f"Maximum: {settings.MAX_IMAGE_PIXELS / 1_000_000:.0f} megapixels."
+        )
+    return buffer
+
+def format_resize_plan(plan: dict) -> str:
+    """Render the per-stage working sizes as 'stage=WxH' pairs for a response header."""
+    return ";".join(f"{stage}={size[0]}x{size[1]}" for stage, size in plan.items())
+
+def processing_http_exception(e: Exception, filename: str) -> HTTPException:
+    """Map a processing failure to the HTTP error returned to the client. Call from an except block."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, FaceNotFoundError):
+        return reject("no_face", 400, "Please ensure your face is clearly visible in the photo.")
+    if isinstance(e, MultipleFacesError):
+        return reject("multiple_faces", 400, "Please use a photo with only one person.")
+    if isinstance(e, ImageReadError):
+        return reject("corrupt_image", 400, "The uploaded image file is corrupted or invalid.")
+    if isinstance(e, PhotoProcessingError):
+        logger.error(f"An unexpected processing error occurred for {filename}. Error: {e}")
+        return reject("processing_error", 500, "An unexpected error occurred during photo processing.")
+    logger.exception(f"A critical server error occurred for {filename}. Error: {e}")
+    return reject("server_error", 500, f"An unexpected server error occurred.")
+
+def encode_options(image_format: Optional[str], quality: Optional[int], compress_level: Optional[int]) -> EncodeOptions:
+    """Resolve the requested output encoding, rejecting unknown formats with 400."""
     try:
-        if os.path.exists(path):
-            os.remove(path)
-            logger.info(f"Cleaned up file: {path}")
-    except OSError as e:
-        logger.error(f"Error cleaning up file {path}: {e}")
-
-def cleanup_old_files():
-    """Clean up temporary files older than CLEANUP_MAX_AGE_SECONDS."""
-    logger.info(f"Running periodic cleanup in {TEMP_DIR}...")
-    now = time.time()
-    for filename in os.listdir(TEMP_DIR):
-        file_path = os.path.join(TEMP_DIR, filename)
+        return resolve_encode_options(image_format, quality, compress_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def image_response(content: bytes, encoding: EncodeOptions, output_format: str, headers: Optional[dict] = None) -> Response:
+    """Serve encoded image bytes straight from memory as an attachment."""
+    headers = dict(headers or {})
+    headers["Content-Disposition"] = f'attachment; filename="processed_{output_format}.{encoding.extension}"'
+    return Response(content=content, media_type=encoding.media_type, headers=headers)
+
+def resolve_output_size(output_format: str, custom_width: Optional[int], custom_height: Optional[int]):
+    """Return the pixel size for a preset or custom format, or None if it cannot be resolved."""
+    if output_format == 'custom':
+        if custom_width and custom_height:
+            return (custom_width, custom_height)
+        return None
+    return PRESET_SIZES.get(output_format)
+
+def lookup_cached_result(contents: bytes, output_format: str, output_size, model_name: str, crop_mode: str,
+                         encoding: EncodeOptions):
+    """Hash the upload into result and cutout cache keys and look up the result cache (blocking I/O)."""
+    cache_key = make_cache_key(contents, output_format, output_size, model_name, crop_mode, *encoding)
+    # The cutout is format independent, so its key leaves out the size and format
+    cutout_key = make_cache_key(contents, model_name, crop_mode)
+    return cache_key, cutout_key, result_cache.get(cache_key)
+
+def render_from_cached_cutout(key: str, output_size, output_format: str):
+    """
+    Render from a cached cutout if one covers this output. Returns (image, cutout); the image is
+    None when the cached cutout doesn't cover the output, and both are None when nothing is cached.
+    """
+    data = cutout_cache.get(key)
+    if data is None:
+        return None, None
+    cutout = Cutout.from_bytes(data)
+    if not cutout.supports(output_size, output_format):
+        return None, cutout
+    return render_cutout(cutout, output_size, output_format), cutout
+
+def store_cutout(key: str, cutout: Cutout):
+    cutout_cache.put(key, cutout.to_bytes())
+
+def render_all_from_cached_cutout(key: str, targets: dict):
+    """Render every target from a cached cutout if it covers all of them; otherwise return None."""
+    data = cutout_cache.get(key)
+    if data is None:
+        return None
+    cutout = Cutout.from_bytes(data)
+    if not all(cutout.supports(size, name) for name, size in targets.items()):
+        return None
+    return {name: render_cutout(cutout, size, name) for name, size in targets.items()}, cutout
+
+def build_render_archive(images: dict, metadata: dict, encoding: EncodeOptions) -> bytes:
+    """Encode each rendered format and pack them with a JSON manifest into a zip archive."""
+    buffer = io.BytesIO()
+    manifest = {"model": metadata.get("model"), "image_format": encoding.image_format, "formats": {}}
+    # The images are already compressed; storing avoids paying deflate on top of them
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, image in images.items():
+            filename = f"processed_{name}.{encoding.extension}"
+            archive.writestr(filename, encode_image(image, encoding))
+            manifest["formats"][name] = {"file": filename, "width": image.width, "height": image.height}
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buffer.getvalue()
+
+def batch_item_error(e: Exception, filename: str) -> dict:
+    """Describe a failed batch item for the manifest using the same messages as /preview."""
+    if isinstance(e, (HTTPException, PhotoProcessingError)):
+        error = processing_http_exception(e, filename)
+    else:
+        logger.error(f"Batch item {filename} failed with an unexpected error: {e}", exc_info=e)
+        error = HTTPException(status_code=500, detail="An unexpected server error occurred.")
+    return {"status": "error", "status_code": error.status_code, "error": type(e).__name__, "detail": error.detail}
+
+def validate_batch_files(files: List[UploadFile], results: list) -> list:
+    """
+    Validate every batch upload and return (index, contents) pairs for the valid ones.
+    Rejected uploads get their manifest error in results. Blocking; run it in the threadpool.
+    """
+    valid = []
+    for index, upload in enumerate(files):
         try:
-            if os.path.isfile(file_path):
-                file_age = now - os.path.getmtime(file_path)
-                if file_age > CLEANUP_MAX_AGE_SECONDS:
-                    cleanup_file(file_path)
-        except Exception as e:
-            logger.error(f"Error during periodic cleanup of {file_path}: {e}")
+            valid.append((index, validate_image_file(upload)))
+        except HTTPException as e:
+            results[index] = batch_item_error(e, upload.filename)
+    return valid
+
+def build_batch_archive(items: list, metadata: dict, encoding: EncodeOptions) -> bytes:
+    """Pack successful batch results as encoded images, plus a manifest.json describing every item."""
+    buffer = io.BytesIO()
+    manifest = {
+        "model": metadata.get("model"),
+        "output_format": metadata.get("output_format"),
+        "image_format": encoding.image_format,
+        "items": [],
+    }
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, (filename, result) in enumerate(items):
+            entry = {"index": index, "filename": filename}
+            if isinstance(result, Image.Image):
+                stem = os.path.splitext(os.path.basename(filename or "photo"))[0]
+                entry_name = f"{index:03d}_{stem}.{encoding.extension}"
+                archive.writestr(entry_name, encode_image(result, encoding))
+                entry.update({"status": "ok", "file": entry_name})
+            else:
+                entry.update(result)
+            manifest["items"].append(entry)
+        manifest["succeeded"] = sum(1 for entry in manifest["items"] if entry["status"] == "ok")
+        manifest["failed"] = len(manifest["items"]) - manifest["succeeded"]
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buffer.getvalue()
+
+# --- API Endpoints ---
+
+@router.get("/cache")
+async def cache_stats():
+    """Sonuç önbelleğinin isabet/ıska sayaçlarını ve doluluğunu döndürür."""
+    return {
+        "enabled": settings.RESULT_CACHE_ENABLED,
+        "results": result_cache.stats(),
+        "cutouts": cutout_cache.stats(),
+    }
 
-# --- API Endpoint ---
+@router.get("/models")
+async def list_models():
+    """Kullanılabilir matting modellerini ve ölçülen gecikmelerini listeler."""
+    return {
+        "default": settings.MATTING_MODEL,
+        "models": {name: {"input_size": size, "quantized": is_quantized(name)} for name, size in MATTING_MODELS.items()},
+        "latency": model_latency.summary(),
+    }
 
 @router.post("/preview",
     # (responses and summary are the same as before)
@@ -82,61 +271,247 @@ async def preview_photo(
     file: UploadFile = File(...),
     output_format: Optional[str] = Query("passport_eu", enum=list(PRESET_SIZES.keys())),
     custom_width: Optional[int] = Query(None, gt=0, le=2000),
-    custom_height: Optional[int] = Query(None, gt=0, le=2000)
+    custom_height: Optional[int] = Query(None, gt=0, le=2000),
+    model: Optional[str] = Query(None, enum=list(MATTING_MODELS.keys())),
+    crop_mode: Optional[str] = Query(None, enum=sorted(CROP_MODES)),
+    image_format: Optional[str] = Query(None, enum=list(IMAGE_FORMATS)),
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    compress_level: Optional[int] = Query(None, ge=0, le=9)
 ):
-    # --- Periodic Cleanup Trigger ---
-    if random.random() < CLEANUP_PROBABILITY:
-        background_tasks.add_task(cleanup_old_files)
-
     client_ip = request.client.host
     logger.info(f"Request received from IP: {client_ip} for file: {file.filename}")
 
-    validate_image_file(file)
-    
-    output_size = None
-    if output_format == 'custom' and custom_width and custom_height:
-        output_size = (custom_width, custom_height)
-    elif output_format in PRESET_SIZES:
-        output_size = PRESET_SIZES[output_format]
+    with stage_latency.time(stage="validation"):
+        contents = validate_image_file(file)
     
+    output_size = resolve_output_size(output_format, custom_width, custom_height)
     if not output_size:
         raise HTTPException(status_code=400, detail="You must provide a valid output_format or custom dimensions.")
 
-    temp_id = str(uuid.uuid4())
-    input_path = os.path.join(TEMP_DIR, f"{temp_id}_{file.filename}")
-    processed_output_path = os.path.join(TEMP_DIR, f"{temp_id}_processed.png")
+    encoding = encode_options(image_format, quality, compress_level)
+
+    # Aynı fotoğraf aynı parametrelerle tekrar yüklendiyse sonucu önbellekten dön
+    cache_key = None
+    cutout_key = None
+    if settings.RESULT_CACHE_ENABLED:
+        # Hashing up to MAX_FILE_SIZE bytes and disk hits would block the event loop
+        cache_key, cutout_key, cached = await run_in_threadpool(
+            lookup_cached_result, contents, output_format, output_size,
+            model_variant(model or settings.MATTING_MODEL), crop_mode or settings.CROP_MODE, encoding
+        )
+        if cached is not None:
+            logger.info(f"Result cache hit for {file.filename}")
+            return image_response(cached, encoding, output_format, {"X-Cache": "HIT"})
 
     try:
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        processed_image = cached_cutout = None
+        if cutout_key is not None:
+            # Aynı fotoğrafın başka bir formatı: yalnızca birleştirme adımını tekrarla
+            processed_image, cached_cutout = await run_in_threadpool(
+                render_from_cached_cutout, cutout_key, output_size, output_format
+            )
 
-        logger.info(f"Starting photo processing for {input_path}")
-        processed_image = process_photo(input_image_path=input_path, output_size=output_size)
-        processed_image.save(processed_output_path, 'PNG')
+        if processed_image is not None:
+            logger.info(f"Cutout cache hit for {file.filename}")
+            headers = {"X-Matting-Model": cached_cutout.model_name, "X-Cache": "CUTOUT"}
+        else:
+            # The upload is decoded once in memory; the input never touches disk
+            logger.info(f"Starting photo processing for {file.filename}")
+            # Matte only the requested output. If this photo was already matted for another format,
+            # the user is switching formats: widen to every preset so the next switches only compose.
+            extra_targets = preset_targets() if cached_cutout is not None else ()
+            # CPU-bound işi event loop'u bloklamadan worker havuzunda çalıştır
+            processed_image, metadata = await run_in_executor(
+                process_photo,
+                input_image=contents,
+                output_size=output_size,
+                model_name=model,
+                return_metadata=True,
+                output_format=output_format,
+                crop_mode=crop_mode,
+                extra_targets=extra_targets
+            )
+            cutout = metadata.pop("cutout", None)
+            model_latency.record(metadata["model"], metadata["timings"]["background_removal"])
+            record_pipeline_metadata(metadata)
+            if cutout_key is not None and cutout is not None:
+                background_tasks.add_task(store_cutout, cutout_key, cutout)
+            headers = {
+                "X-Matting-Model": metadata["model"],
+                "X-Resize-Plan": format_resize_plan(metadata["resize_plan"]),
+                "X-Cache": "MISS" if cache_key is not None else "BYPASS"
+            }
+
+        # Encode once in memory, off the event loop; the same bytes are served and cached
+        with stage_latency.time(stage="encode"):
+            image_bytes = await run_in_threadpool(encode_image, processed_image, encoding)
+        if cache_key is not None:
+            background_tasks.add_task(result_cache.put, cache_key, image_bytes)
+        return image_response(image_bytes, encoding, output_format, headers)
 
-        # Add cleanup task for the processed file after the response is sent
-        background_tasks.add_task(cleanup_file, processed_output_path)
+    except Exception as e:
+        raise processing_http_exception(e, file.filename)
 
-        return FileResponse(
-            processed_output_path,
-            media_type="image/png",
-            filename=f"processed_{output_format}.png"
+@router.post("/render")
+async def render_photo_formats(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    formats: List[str] = Query(["all"]),
+    custom_width: Optional[int] = Query(None, gt=0, le=2000),
+    custom_height: Optional[int] = Query(None, gt=0, le=2000),
+    model: Optional[str] = Query(None, enum=list(MATTING_MODELS.keys())),
+    crop_mode: Optional[str] = Query(None, enum=sorted(CROP_MODES)),
+    image_format: Optional[str] = Query(None, enum=list(IMAGE_FORMATS)),
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    compress_level: Optional[int] = Query(None, ge=0, le=9)
+):
+    """
+    Tek yüklemeden birden çok formatı üretir. Yüz algılama ve matting bir kere
+    çalışır; her format image_format ile (varsayılan PNG) encode edilip bir zip
+    arşivinde (manifest.json ile) döner.
+    formats=all tüm hazır formatları seçer; custom için custom_width/custom_height gerekir.
+    """
+    client_ip = request.client.host
+    logger.info(f"Render request received from IP: {client_ip} for file: {file.filename} formats: {formats}")
+
+    with stage_latency.time(stage="validation"):
+        contents = validate_image_file(file)
+
+    names = []
+    for name in formats:
+        expanded = [n for n, size in PRESET_SIZES.items() if size] if name == "all" else [name]
+        names.extend(n for n in expanded if n not in names)
+    targets = {}
+    for name in names:
+        if name not in PRESET_SIZES:
+            raise HTTPException(status_code=400, detail=f"Unknown output format: {name}. Allowed: all, {', '.join(PRESET_SIZES)}")
+        size = resolve_output_size(name, custom_width, custom_height)
+        if not size:
+            raise HTTPException(status_code=400, detail="You must provide custom_width and custom_height for the custom format.")
+        targets[name] = size
+    encoding = encode_options(image_format, quality, compress_level)
+
+    cutout_key = None
+    if settings.RESULT_CACHE_ENABLED:
+        cutout_key = await run_in_threadpool(
+            make_cache_key, contents, model_variant(model or settings.MATTING_MODEL), crop_mode or settings.CROP_MODE
         )
 
-    except (FaceNotFoundError, MultipleFacesError, ImageReadError) as e:
-        # (Error handling is the same as before)
-        if isinstance(e, FaceNotFoundError):
-            raise HTTPException(status_code=400, detail="Please ensure your face is clearly visible in the photo.")
-        elif isinstance(e, MultipleFacesError):
-            raise HTTPException(status_code=400, detail="Please use a photo with only one person.")
+    try:
+        rendered = None
+        if cutout_key is not None:
+            rendered = await run_in_threadpool(render_all_from_cached_cutout, cutout_key, targets)
+
+        if rendered is not None:
+            images, cutout = rendered
+            metadata = {"model": cutout.model_name}
+            cache_status = "CUTOUT"
         else:
-            raise HTTPException(status_code=400, detail="The uploaded image file is corrupted or invalid.")
-    except PhotoProcessingError as e:
-        logger.error(f"An unexpected processing error occurred for {input_path}. Error: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred during photo processing.")
+            images, metadata = await run_in_executor(
+                process_photo_formats,
+                input_image=contents,
+                targets=targets,
+                model_name=model,
+                crop_mode=crop_mode
+            )
+            cutout = metadata.pop("cutout", None)
+            model_latency.record(metadata["model"], metadata["timings"]["background_removal"])
+            record_pipeline_metadata(metadata)
+            if cutout_key is not None and cutout is not None:
+                background_tasks.add_task(store_cutout, cutout_key, cutout)
+            cache_status = "MISS" if cutout_key is not None else "BYPASS"
+
+        with stage_latency.time(stage="encode"):
+            archive = await run_in_threadpool(build_render_archive, images, metadata, encoding)
+        return Response(
+            content=archive,
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": 'attachment; filename="processed_formats.zip"',
+                "X-Matting-Model": metadata["model"],
+                "X-Cache": cache_status
+            }
+        )
+
     except Exception as e:
-        logger.exception(f"A critical server error occurred for {input_path}. Error: {e}")
-        raise HTTPException(status_code=500, detail=f"An unexpected server error occurred.")
-    finally:
-        # Always clean up the original uploaded file
-        cleanup_file(input_path)
+        raise processing_http_exception(e, file.filename)
+
+@router.post("/batch")
+async def batch_process_photos(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    output_format: Optional[str] = Query("passport_eu", enum=list(PRESET_SIZES.keys())),
+    custom_width: Optional[int] = Query(None, gt=0, le=2000),
+    custom_height: Optional[int] = Query(None, gt=0, le=2000),
+    model: Optional[str] = Query(None, enum=list(MATTING_MODELS.keys())),
+    crop_mode: Optional[str] = Query(None, enum=sorted(CROP_MODES)),
+    image_format: Optional[str] = Query(None, enum=list(IMAGE_FORMATS)),
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    compress_level: Optional[int] = Query(None, ge=0, le=9)
+):
+    """
+    Birden çok fotoğrafı tek istekte işler (okullar, İK departmanları vb.).
+    Matting MATTING_BATCH_SIZE'lık gruplar halinde batched çalışır, gruplar
+    worker'lara paralel dağıtılır. Hatalı fotoğraflar (yüz yok, çoklu yüz,
+    geçersiz dosya) yalnızca kendi kayıtlarında raporlanır; sonuçlar
+    manifest.json içeren bir zip arşivi olarak döner.
+    """
+    client_ip = request.client.host
+    logger.info(f"Batch request received from IP: {client_ip} with {len(files)} file(s)")
+
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many files. Maximum per batch: {settings.BATCH_MAX_FILES}")
+
+    output_size = resolve_output_size(output_format, custom_width, custom_height)
+    if not output_size:
+        raise HTTPException(status_code=400, detail="You must provide a valid output_format or custom dimensions.")
+    encoding = encode_options(image_format, quality, compress_level)
+
+    results = [None] * len(files)
+    # Reading and checking up to BATCH_MAX_FILES uploads would block the event loop
+    valid = await run_in_threadpool(validate_batch_files, files, results)
+
+    batch_size = settings.MATTING_BATCH_SIZE
+    chunks = [valid[i:i + batch_size] for i in range(0, len(valid), batch_size)]
+    # Her grup tek bir worker çağrısıdır; gruplar worker'lar arasında paralel çalışır.
+    # Bir grubun çökmesi (ör. worker hatası) yalnızca o grubun öğelerini hatalı sayar.
+    outputs = await asyncio.gather(*(
+        run_in_executor(
+            process_photo_batch,
+            input_images=[contents for _, contents in chunk],
+            output_size=output_size,
+            model_name=model,
+            output_format=output_format,
+            crop_mode=crop_mode,
+            batch_size=batch_size
+        )
+        for chunk in chunks
+    ), return_exceptions=True)
+
+    metadata = {"model": model or settings.MATTING_MODEL, "output_format": output_format}
+    for chunk, output in zip(chunks, outputs):
+        if isinstance(output, BaseException):
+            if not isinstance(output, Exception):
+                raise output
+            for index, _ in chunk:
+                results[index] = batch_item_error(output, files[index].filename)
+            continue
+        chunk_results, chunk_metadata = output
+        metadata["model"] = chunk_metadata["model"]
+        record_pipeline_metadata(chunk_metadata)
+        for (index, _), result in zip(chunk, chunk_results):
+            results[index] = result if isinstance(result, Image.Image) else batch_item_error(result, files[index].filename)
+
+    with stage_latency.time(stage="encode"):
+        archive = await run_in_threadpool(
+            build_batch_archive, [(upload.filename, result) for upload, result in zip(files, results)], metadata, encoding
+        )
+    return Response(
+        content=archive,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": 'attachment; filename="processed_batch.zip"',
+            "X-Matting-Model": metadata["model"]
+        }
+    )
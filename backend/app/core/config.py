@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import NamedTuple, Optional
 import os
 from dotenv import load_dotenv
 
@@ -19,6 +19,74 @@ class Settings(BaseSettings):
     # File Upload
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    DATA_DIR: str = "data"  # Sunucu içi durum (iş kuyruğu, sonuç önbellekleri vb.); /uploads gibi dışarı açılmaz
+    MAX_IMAGE_PIXELS: int = 64000000  # 64MP; başlıktaki boyut bu sınırı aşarsa decode edilmeden reddedilir
+    TEMP_FILE_TTL_SECONDS: int = 3600  # UPLOAD_DIR/temp'teki dosyaların ömrü
+
+    # File janitor (süresi dolan geçici ve önbellek dosyalarını arka planda siler)
+    JANITOR_INTERVAL: float = 30  # temizlik turları arası (saniye)
+    JANITOR_BATCH_SIZE: int = 500  # tek adımda silinen en fazla dosya
+
+    # Processing
+    PROCESSING_EXECUTOR: str = "process"  # "process" veya "thread"
+    MODEL_WARM_UP: bool = True  # False: worker'lar modelleri ısıtmaz, ilk istekte yükler (ör. stub'lı yük testi)
+    PROCESSING_WORKERS: int = 0  # API process'i başına; 0 = thread bütçesinden (aşağıda)
+    JPEG_REDUCED_DECODE: bool = True  # JPEG'leri gereken çözünürlükte (1/2, 1/4, 1/8) DCT ölçeklemesiyle çöz
+
+    # Yüz algılama: önce küçük kopyada kısa menzilli model, emin değilse tam menzilli model
+    FACE_CASCADE: bool = True
+    FACE_CASCADE_MAX_SIDE: int = 256  # kısa menzilli geçişin çalıştığı kopyanın uzun kenarı (piksel)
+    FACE_CASCADE_MIN_CONFIDENCE: float = 0.8  # altındaysa tam menzilli modele düşülür
+
+    # CPU thread budget: node'un çekirdekleri server worker'ları ve işleme worker'ları arasında bölünür
+    # (önerilen bölüşüm: python -m benchmarks.threads)
+    CPU_CORES: int = 0  # 0 = bu process'e atanmış çekirdek sayısı
+    WEB_CONCURRENCY: int = 1  # uvicorn/gunicorn worker process sayısı (uvicorn --workers da bunu okur)
+    WORKER_THREADS: int = 0  # İşleme worker'ı başına ONNX intra-op, OpenCV ve BLAS thread'i; 0 = kalan çekirdekler
+    ONNX_INTER_OP_THREADS: int = 1
+    ONNX_ALLOW_SPINNING: bool = False  # ONNX thread'leri boşta spin-wait yapar; çekirdekler paylaşılınca CPU yakar
+
+    # Output encoding (istek başına image_format/quality/compress_level ile değiştirilebilir)
+    OUTPUT_IMAGE_FORMAT: str = "png"  # png, jpeg, webp
+    PNG_COMPRESS_LEVEL: int = 1  # 0-9; 6 (Pillow varsayılanı) ~4 kat yavaş, yalnızca ~%15 daha küçük
+    OUTPUT_QUALITY: int = 92  # JPEG/WebP kalitesi (1-100)
+
+    # Matting (rembg)
+    MATTING_MODEL: str = "u2net"  # u2net, u2netp, isnet-general-use, silueta
+    MATTING_PRELOAD: str = ""  # Başlangıçta ayrıca yüklenecek modeller (virgülle ayrılmış)
+    MATTING_QUANTIZED: str = ""  # INT8 kuantize ağırlıklarla çalışacak modeller (virgülle ayrılmış)
+    CROP_MODE: str = "face"  # face: yüz bölgesinde matting ve kırpma, full: tüm kare
+    MATTING_BATCH_SIZE: int = 8  # Toplu işlemede tek ONNX çağrısındaki görüntü sayısı
+    BATCH_MAX_FILES: int = 50  # Toplu yüklemede en fazla dosya sayısı
+
+    # Model artifacts (bkz. app/ai/artifacts.py)
+    MODEL_DIR: str = "models"  # İmaja gömülü ağırlıklar (<model>.onnx)
+    MODEL_CACHE_DIR: str = ""  # Boş = DATA_DIR/models; doğrulama kayıtları ve ORT formatındaki kopyalar
+    MODEL_DOWNLOAD: bool = True  # Ağırlık MODEL_DIR'de yoksa rembg ile indir; kapalıysa hata ver
+    MODEL_MEMORY_MAP: bool = True  # Modelleri ORT formatında memory-map ederek aç (worker'lar page cache'i paylaşır)
+
+    # Result cache
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MEMORY_ITEMS: int = 256
+    RESULT_CACHE_MEMORY_BYTES: int = 67108864  # 64MB
+    RESULT_CACHE_DISK_BYTES: int = 536870912  # 512MB
+    RESULT_CACHE_TTL_SECONDS: int = 3600  # 1 saat
+    CUTOUT_CACHE_MEMORY_ITEMS: int = 64
+    CUTOUT_CACHE_MEMORY_BYTES: int = 134217728  # 128MB
+    CUTOUT_CACHE_DISK_BYTES: int = 1073741824  # 1GB
+
+    # Rate limiting
+    RATE_LIMIT_BACKEND: str = "sqlite"  # memory: process başına, sqlite: makinedeki worker'lar ortak, redis: REDIS_URL
+    REDIS_URL: Optional[str] = None
+    RATE_LIMIT_SWEEP_INTERVAL: int = 60  # Boşta kalan IP'lerin silinme aralığı (saniye)
+    RATE_LIMIT_TIMEOUT: float = 0.1  # sqlite kilidi/redis bu sürede yanıt vermezse istek sayılmadan geçer (saniye)
+
+    # Job queue
+    JOB_DB_PATH: str = ""  # Boş = DATA_DIR/jobs.sqlite3
+    JOB_WORKERS: int = 1  # API process'i içindeki işçi sayısı; 0 = yalnızca ayrı worker process'leri
+    JOB_RESULT_TTL_SECONDS: int = 3600  # Tamamlanan sonuçların saklanma süresi
+    JOB_POLL_INTERVAL: float = 1.0  # Kuyruk boşken yoklama aralığı (saniye)
+    JOB_STALE_SECONDS: int = 600  # Bu süreden uzun RUNNING kalan işler tekrar kuyruğa alınır
     
     # Development/Production
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
@@ -27,4 +95,53 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
+
+
+class ThreadBudget(NamedTuple):
+    cores: int
+    server_workers: int  # WEB_CONCURRENCY
+    processing_workers: int  # API process'i başına
+    threads: int  # işleme worker'ı başına ONNX intra-op / OpenCV / BLAS thread'i
+    inter_op_threads: int
+
+    @property
+    def total_threads(self) -> int:
+        return self.server_workers * self.processing_workers * self.threads
+
+    @property
+    def oversubscription(self) -> float:
+        """Hesaplama thread'lerinin çekirdek sayısına oranı; 1'in üstü çekirdeklerin paylaşıldığını gösterir."""
+        return self.total_threads / self.cores
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_budget(config: Optional[Settings] = None) -> ThreadBudget:
+    """
+    Çekirdekleri önce server worker'larına, sonra her birinin işleme
+    worker'larına böler. PROCESSING_WORKERS ve WORKER_THREADS'ten biri
+    verilirse diğeri kalan çekirdeklerden hesaplanır; ikisi de 0 ise
+    her worker tek thread'le çalışır (batch-1 çıkarımda en yüksek throughput).
+    """
+    config = config or settings
+    cores = config.CPU_CORES or available_cores()
+    server_workers = max(1, config.WEB_CONCURRENCY)
+    per_server = max(1, cores // server_workers)
+    workers = config.PROCESSING_WORKERS or max(1, per_server // max(1, config.WORKER_THREADS))
+    threads = config.WORKER_THREADS or max(1, per_server // workers)
+    return ThreadBudget(cores, server_workers, workers, threads, max(1, config.ONNX_INTER_OP_THREADS))
+
+
+# BLAS (OpenBLAS/MKL/OpenMP) thread sayısını yüklendiği anda ortam değişkenlerinden okur; config numpy'dan
+# önce import edildiğinde bu process, her durumda da işleme worker'ları (ortamı miras alır) bütçeye uyar.
+# Açıkça verilmiş değerlere dokunulmaz.
+BLAS_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+_blas_threads = str(thread_budget().threads)
+for _name in BLAS_THREAD_ENV_VARS:
+    os.environ.setdefault(_name, _blas_threads) 
\ No newline at end of file
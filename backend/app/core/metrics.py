@@ -0,0 +1,309 @@
+"""
+Prometheus metin formatında (text exposition 0.0.4) uygulama metrikleri.
+
+Harici bağımlılık yoktur: sayaç, gauge ve histogramlar process içinde
+tutulur ve /metrics isteğinde metne çevrilir. Kayıt maliyeti bir kilit ve
+bir bisect'tir. Executor worker'larında ölçülen aşama süreleri metadata
+ile API process'ine döner ve burada kaydedilir.
+"""
+import bisect
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Aşama süreleri için kovalar (saniye): 1ms - 30s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Blok süresince gauge'u bir artırır (ör. işlemdeki istek sayısı)."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler -> [kova sayaçları..., +Inf], toplam
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrikleri ve scrape anında değer üreten toplayıcıları tutar."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]):
+        """collector, Prometheus metin satırları (HELP/TYPE dahil) üreten bir fonksiyondur."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+def process_rss_bytes() -> int:
+    """Process'in anlık RSS'i (Linux'ta /proc'tan); yoksa tepe RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss Linux'ta KB, macOS'ta byte
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def _process_collector() -> List[str]:
+    return [
+        "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+        "# TYPE process_resident_memory_bytes gauge",
+        f"process_resident_memory_bytes {process_rss_bytes()}",
+    ]
+
+
+def cache_collector(caches: Dict[str, object]) -> Callable[[], List[str]]:
+    """ResultCache'lerin stats() sayaçlarını (isabet, ıska, çıkarma) ve doluluğunu metriklere çevirir."""
+    def collect() -> List[str]:
+        events = ["# HELP photoid_cache_events_total Cache lookups and maintenance events.",
+                  "# TYPE photoid_cache_events_total counter"]
+        usage = ["# HELP photoid_cache_usage Cache entries and bytes per tier.",
+                 "# TYPE photoid_cache_usage gauge"]
+        for name, cache in caches.items():
+            for key, value in sorted(cache.stats().items()):
+                tier, _, unit = key.partition("_")
+                if unit in ("entries", "bytes"):
+                    usage.append(f'photoid_cache_usage{{cache="{name}",tier="{tier}",unit="{unit}"}} {value}')
+                else:
+                    events.append(f'photoid_cache_events_total{{cache="{name}",event="{key}"}} {value}')
+        return events + usage
+    return collect
+
+
+registry = Registry()
+registry.register_collector(_process_collector)
+
+stage_latency = registry.register(Histogram(
+    "photoid_stage_duration_seconds", "Time spent in each request/pipeline stage.", ["stage"]
+))
+request_latency = registry.register(Histogram(
+    "photoid_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+))
+queue_wait = registry.register(Histogram(
+    "photoid_queue_wait_seconds", "Time work waited before a worker picked it up.", ["queue"]
+))
+in_flight = registry.register(Gauge(
+    "photoid_in_flight", "Requests and processing tasks currently in progress.", ["kind"]
+))
+rejections = registry.register(Counter(
+    "photoid_rejections_total", "Rejected requests by reason.", ["reason"]
+))
+face_detection_paths = registry.register(Counter(
+    "photoid_face_detection_total", "Face detections by cascade path.", ["path"]
+))
+decode_scales = registry.register(Counter(
+    "photoid_decode_total", "Image decodes by pipeline stage and JPEG DCT scale.", ["stage", "scale"]
+))
+
+
+def record_stage_timings(timings: Dict[str, float]):
+    """Pipeline metadata'sındaki aşama sürelerini (saniye) histogramlara yazar."""
+    for stage, seconds in timings.items():
+        stage_latency.observe(seconds, stage=stage)
+
+
+def record_pipeline_metadata(metadata: dict):
+    """Worker'dan dönen metadata'nın aşama sürelerini, yüz algılama yollarını ve decode ölçeklerini metriklere yazar."""
+    record_stage_timings(metadata["timings"])
+    # Batch'te her öğenin süreleri ayrı bir örnektir
+    for timings in metadata.get("item_timings", []):
+        record_stage_timings(timings)
+    for path, count in metadata.get("face_detection_paths", {}).items():
+        face_detection_paths.inc(count, path=path)
+    for stage, counts in metadata.get("decode_reductions", {}).items():
+        for reduction, count in counts.items():
+            decode_scales.inc(count, stage=stage, scale=f"1/{reduction}")
+
+
+def _route_label(request: Request) -> str:
+    # Yol şablonu (ör. /api/v1/jobs/{job_id}) kullanılır ki etiket sayısı sınırlı kalsın
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def metrics_middleware(request: Request, call_next):
+    """İstek süresini ve işlemdeki istek sayısını ölçer."""
+    start = time.perf_counter()
+    status = 500
+    with in_flight.track(kind="requests"):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            request_latency.observe(
+                time.perf_counter() - start,
+                method=request.method, route=_route_label(request), status=status
+            )
+
+
+class ResponseTimingMiddleware:
+    """
+    Yanıtın sunucuya gönderilmesini "response" aşaması olarak ölçer: başlıklar
+    gönderilirken başlar, gövdenin son parçası gönderilince biter. Endpoint'in
+    yanıtı oluşturması dahil değildir; BaseHTTPMiddleware içinden gönderim
+    görülemediği için saf ASGI middleware'dir.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = ""):
+        self.app = app
+        # Yalnızca bu önekteki istekler ölçülür (/metrics, /health taramaları aşamayı kalabalıklaştırmasın)
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        started = None
+
+        async def timed_send(message: Message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = time.perf_counter()
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and started is not None:
+                stage_latency.observe(time.perf_counter() - started, stage="response")
+                started = None
+
+        await self.app(scope, receive, timed_send)
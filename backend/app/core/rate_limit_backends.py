@@ -0,0 +1,289 @@
+"""
+Rate limit sayaçlarının saklandığı backend'ler.
+
+Hepsi aynı sayaç tabanlı kayan pencere algoritmasını uygular: her anahtar
+için limit başına (pencere no, bu penceredeki sayı, önceki penceredeki
+sayı) tutulur ve istek sayısı önceki pencerenin kalan oranı ile tahmin
+edilir.
+
+- memory: process içi, en hızlı; her worker'ın kendi sayacı vardır.
+- sqlite: aynı makinedeki tüm worker'ların paylaştığı WAL modunda SQLite dosyası.
+- redis: birden çok makine/container için; REDIS_URL ile (`pip install redis`).
+
+Paylaşılan backend'ler timeout saniye içinde yanıt vermezse (SQLite dosyası
+kilitli, Redis'e ulaşılamıyor) istek sayılmadan geçirilir (fail open): rate
+limit, işleme yolunu durdurmamalı.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BACKEND_KINDS = {"memory", "sqlite", "redis"}
+DEFAULT_TIMEOUT = 0.1  # saniye
+
+
+class RateLimit(NamedTuple):
+    limit: int  # pencere başına maksimum istek
+    period: int  # pencere uzunluğu (saniye)
+    detail: str  # limit aşıldığında dönen mesaj
+
+
+def slide_window(state: Tuple[int, int, int], now: float, period: int) -> Tuple[int, int, int]:
+    """(pencere no, sayı, önceki sayı) durumunu now'ın penceresine ilerletir."""
+    window, count, previous = state
+    current_window = int(now // period)
+    if window == current_window:
+        return state
+    return current_window, 0, count if window == current_window - 1 else 0
+
+
+def estimate(state: Tuple[int, int, int], now: float, period: int) -> float:
+    """Son period saniyedeki istek sayısının tahmini (önceki pencere kalan oranıyla ağırlıklı)."""
+    _, count, previous = state
+    elapsed = (now % period) / period
+    return previous * (1 - elapsed) + count
+
+
+class RateLimitBackend:
+    """Rate limit sayaçları için arayüz."""
+
+    def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[RateLimit]:
+        """İsteği atomik olarak sayar; bir limit aşılıyorsa saymadan o limiti döndürür, aksi halde None."""
+        raise NotImplementedError
+
+    def sweep(self, now: float, idle_seconds: float, max_keys: Optional[int] = None) -> int:
+        """idle_seconds'tır görülmeyen anahtarları siler ve silinen sayısını döndürür."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """Process içi backend; anahtarlar son kullanıma göre sıralı tutulur, temizlik baştan yapılır."""
+
+    def __init__(self):
+        # anahtar -> [son görülme zamanı, (pencere no, sayı, önceki sayı) x limit sayısı]
+        self._state: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[RateLimit]:
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = [now] + [0] * (3 * len(limits))
+                self._state[key] = state
+            else:
+                self._state.move_to_end(key)
+                state[0] = now
+
+            for index, limit in enumerate(limits):
+                offset = 1 + 3 * index
+                window_state = slide_window(tuple(state[offset:offset + 3]), now, limit.period)
+                state[offset:offset + 3] = window_state
+                if estimate(window_state, now, limit.period) >= limit.limit:
+                    return limit
+
+            for index in range(len(limits)):
+                state[2 + 3 * index] += 1
+            return None
+
+    def sweep(self, now: float, idle_seconds: float, max_keys: Optional[int] = None) -> int:
+        evicted = 0
+        with self._lock:
+            while self._state and (max_keys is None or evicted < max_keys):
+                state = next(iter(self._state.values()))
+                if now - state[0] <= idle_seconds:
+                    break
+                self._state.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    window INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    previous INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    UNIQUE (key, period)
+);
+CREATE INDEX IF NOT EXISTS rate_limits_last_seen ON rate_limits (last_seen);
+"""
+
+
+class SQLiteBackend(RateLimitBackend):
+    """
+    Aynı makinedeki worker'ların paylaştığı SQLite (WAL) backend'i.
+    Her thread kalıcı bir bağlantı kullanır; okuma-güncelleme tek bir
+    BEGIN IMMEDIATE işleminde yapıldığı için process'ler arası atomiktir.
+    Yazma kilidi timeout içinde alınamazsa istek sayılmadan geçer.
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            # WAL okuyucuları yazara karşı bloklamaz; mod dosyada kalıcıdır ama bağlantı başına doğrulanır
+            mode = connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                logger.warning(f"Rate limit database {self.path} is in '{mode}' journal mode, not WAL")
+            # WAL'da NORMAL, her commit'te fsync yapmaz; sayaçlar için yeterli dayanıklılık
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SQLITE_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[RateLimit]:
+        connection = None
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            stored = {
+                period: (window, count, previous)
+                for period, window, count, previous in connection.execute(
+                    "SELECT period, window, count, previous FROM rate_limits WHERE key = ?", (key,)
+                )
+            }
+            states = [slide_window(stored.get(limit.period, (0, 0, 0)), now, limit.period) for limit in limits]
+            exceeded = next(
+                (limit for limit, state in zip(limits, states) if estimate(state, now, limit.period) >= limit.limit),
+                None
+            )
+            if exceeded is None:
+                states = [(window, count + 1, previous) for window, count, previous in states]
+            connection.executemany(
+                "INSERT INTO rate_limits (key, period, window, count, previous, last_seen) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key, period) DO UPDATE SET window = excluded.window, count = excluded.count, "
+                "previous = excluded.previous, last_seen = excluded.last_seen",
+                [(key, limit.period, *state, now) for limit, state in zip(limits, states)]
+            )
+            connection.execute("COMMIT")
+            return exceeded
+        except sqlite3.Error as e:
+            # Kilit, disk veya bozulma hatası işlemin herhangi bir adımında olabilir; istek sayılmadan geçer
+            self._rollback(connection)
+            logger.warning(f"Rate limit database unavailable, letting the request through: {e}")
+            return None
+        except Exception:
+            self._rollback(connection)
+            raise
+
+    @staticmethod
+    def _rollback(connection: Optional[sqlite3.Connection]):
+        if connection is not None and connection.in_transaction:
+            try:
+                connection.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def sweep(self, now: float, idle_seconds: float, max_keys: Optional[int] = None) -> int:
+        connection = self._connection()
+        cursor = connection.execute(
+            "DELETE FROM rate_limits WHERE rowid IN "
+            "(SELECT rowid FROM rate_limits WHERE last_seen < ? LIMIT ?)",
+            (now - idle_seconds, -1 if max_keys is None else max_keys)
+        )
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(DISTINCT key) FROM rate_limits").fetchone()[0]
+
+
+# Tüm limitleri tek bir atomik çağrıda kontrol eder ve sayar.
+# KEYS: limit başına (bu pencerenin anahtarı, önceki pencerenin anahtarı)
+# ARGV: now, ardından limit başına (limit, period)
+_REDIS_HIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local limits = #KEYS / 2
+for i = 1, limits do
+    local limit = tonumber(ARGV[2 * i])
+    local period = tonumber(ARGV[2 * i + 1])
+    local count = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local elapsed = (now % period) / period
+    if previous * (1 - elapsed) + count >= limit then
+        return i
+    end
+end
+for i = 1, limits do
+    redis.call('INCR', KEYS[2 * i - 1])
+    redis.call('EXPIRE', KEYS[2 * i - 1], 2 * tonumber(ARGV[2 * i + 1]))
+end
+return 0
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Birden çok makine için Redis backend'i. Pencere sayaçları ayrı anahtarlarda,
+    iki pencere süresi TTL ile tutulur; boşta kalan anahtarları Redis kendisi siler.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit", timeout: float = DEFAULT_TIMEOUT):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        self.prefix = prefix
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._hit = self._client.register_script(_REDIS_HIT_SCRIPT)
+
+    def _keys(self, key: str, limits: Sequence[RateLimit], now: float) -> List[str]:
+        keys = []
+        for limit in limits:
+            window = int(now // limit.period)
+            # {key} hash tag'i bir anahtarın tüm sayaçlarını aynı cluster slot'una koyar
+            keys.append(f"{self.prefix}:{{{key}}}:{limit.period}:{window}")
+            keys.append(f"{self.prefix}:{{{key}}}:{limit.period}:{window - 1}")
+        return keys
+
+    def hit(self, key: str, limits: Sequence[RateLimit], now: float) -> Optional[RateLimit]:
+        args = [now]
+        for limit in limits:
+            args.extend([limit.limit, limit.period])
+        try:
+            exceeded = int(self._hit(keys=self._keys(key, limits, now), args=args))
+        except self._errors as e:
+            logger.warning(f"Rate limit backend unavailable, letting the request through: {e}")
+            return None
+        return limits[exceeded - 1] if exceeded else None
+
+    def sweep(self, now: float, idle_seconds: float, max_keys: Optional[int] = None) -> int:
+        # Sayaçlar TTL ile düşer
+        return 0
+
+    def __len__(self) -> int:
+        return 0
+
+
+def create_backend(kind: str, sqlite_path: str, redis_url: Optional[str],
+                   timeout: float = DEFAULT_TIMEOUT) -> RateLimitBackend:
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path, timeout)
+    if kind == "redis":
+        if not redis_url:
+            raise ValueError("RATE_LIMIT_BACKEND=redis requires REDIS_URL")
+        return RedisBackend(redis_url, timeout=timeout)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{kind}'. Allowed: {', '.join(sorted(BACKEND_KINDS))}")
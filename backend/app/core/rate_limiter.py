@@ -1,73 +1,120 @@
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from collections import defaultdict
-from datetime import datetime, timedelta
+from typing import List, Optional
+import asyncio
+import logging
+import os
 import time
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.metrics import rejections
+from app.core.rate_limit_backends import RateLimit, RateLimitBackend, MemoryBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+# Sıra önemli: ilk aşılan limitin mesajı döner
+DEFAULT_LIMITS = [
+    RateLimit(10, 24 * 3600, "Günlük fotoğraf işleme limitine ulaştınız (10 fotoğraf/gün). 24 saat içinde tekrar deneyiniz."),
+    RateLimit(3, 3600, "Saatlik fotoğraf işleme limitine ulaştınız (3 fotoğraf/saat). 1 saat içinde tekrar deneyiniz."),
+]
+
+# Arka plan temizliğinin bir adımda sildiği en fazla anahtar sayısı (event loop'u bloklamamak için)
+SWEEP_BATCH_SIZE = 10000
 
 class RateLimiter:
-    def __init__(self):
-        # Her IP için istek sayılarını tutan sözlükler
-        self.daily_requests = defaultdict(list)  # günlük limit için
-        self.hourly_requests = defaultdict(list)  # saatlik limit için
-        
+    """
+    Sayaç tabanlı kayan pencere (sliding window counter) rate limiter.
+    Her IP için limit başına yalnızca (pencere no, bu penceredeki sayı, önceki
+    penceredeki sayı) tutulur; istek sayısı önceki pencerenin kalan oranı ile
+    tahmin edilir. Kontroller O(1)'dir; uzun süredir istek atmayan IP'ler
+    arka plan temizliğiyle silinir. Sayaçlar değiştirilebilir bir backend'de
+    (memory, sqlite, redis) tutulur; varsayılan process içi bellektir.
+    """
+
+    def __init__(self, limits: Optional[List[RateLimit]] = None, backend: Optional[RateLimitBackend] = None):
+        self.limits = list(limits or DEFAULT_LIMITS)
+        self.backend = backend if backend is not None else MemoryBackend()
+        # Bir anahtarın tahmini, son isteğinden en fazla iki pencere sonra sıfıra iner
+        self.idle_seconds = 2 * max(limit.period for limit in self.limits)
+        self._sweeper: Optional[asyncio.Task] = None
+
         # Limitleri tanımla
-        self.DAILY_LIMIT = 10  # günlük maksimum istek
-        self.HOURLY_LIMIT = 3  # saatlik maksimum istek
-
-    def _cleanup_old_requests(self, ip: str):
-        """Süresi dolmuş istekleri temizle"""
-        now = datetime.now()
-        
-        # 24 saatten eski istekleri temizle
-        day_ago = now - timedelta(days=1)
-        self.daily_requests[ip] = [ts for ts in self.daily_requests[ip] if ts > day_ago]
-        
-        # 1 saatten eski istekleri temizle
-        hour_ago = now - timedelta(hours=1)
-        self.hourly_requests[ip] = [ts for ts in self.hourly_requests[ip] if ts > hour_ago]
+        self.DAILY_LIMIT = self.limits[0].limit  # günlük maksimum istek
+        self.HOURLY_LIMIT = self.limits[1].limit if len(self.limits) > 1 else None  # saatlik maksimum istek
+
+    def hit(self, key: str, now: Optional[float] = None) -> Optional[RateLimit]:
+        """İsteği sayar; bir limit aşılıyorsa saymadan o limiti döndürür, aksi halde None."""
+        return self.backend.hit(key, self.limits, time.time() if now is None else now)
 
     def check_rate_limit(self, request: Request):
         """Rate limit kontrolü yap"""
         # Test modunda rate limit kontrolü yapma
         if settings.TEST_MODE:
             return True
-        ip = request.client.host
-        now = datetime.now()
-        
-        # Eski istekleri temizle
-        self._cleanup_old_requests(ip)
-        
-        # Mevcut istek sayılarını kontrol et
-        daily_count = len(self.daily_requests[ip])
-        hourly_count = len(self.hourly_requests[ip])
-        
-        # Limit kontrolü
-        if daily_count >= self.DAILY_LIMIT:
-            raise HTTPException(
-                status_code=429,
-                detail="Günlük fotoğraf işleme limitine ulaştınız (10 fotoğraf/gün). 24 saat içinde tekrar deneyiniz."
-            )
-        
-        if hourly_count >= self.HOURLY_LIMIT:
-            raise HTTPException(
-                status_code=429,
-                detail="Saatlik fotoğraf işleme limitine ulaştınız (3 fotoğraf/saat). 1 saat içinde tekrar deneyiniz."
-            )
-        
-        # İsteği kaydet
-        self.daily_requests[ip].append(now)
-        self.hourly_requests[ip].append(now)
-
-# Global rate limiter instance
-rate_limiter = RateLimiter()
+        exceeded = self.hit(request.client.host)
+        if exceeded is not None:
+            rejections.inc(reason="rate_limited")
+            raise HTTPException(status_code=429, detail=exceeded.detail)
+
+    def sweep(self, now: Optional[float] = None, max_keys: Optional[int] = None) -> int:
+        """Son isteği idle_seconds'tan eski anahtarları siler."""
+        return self.backend.sweep(time.time() if now is None else now, self.idle_seconds, max_keys)
+
+    def __len__(self):
+        return len(self.backend)
+
+    async def _sweep_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            evicted = 0
+            try:
+                # Büyük temizlikleri parçalara böl, arada diğer isteklere sıra ver
+                while True:
+                    batch = await run_in_threadpool(self.sweep, None, SWEEP_BATCH_SIZE)
+                    evicted += batch
+                    if batch < SWEEP_BATCH_SIZE:
+                        break
+                    await asyncio.sleep(0)
+            except Exception as e:
+                # Ör. veritabanı kilitli: bu turu bırak, bir sonraki turda tekrar dene
+                logger.warning(f"Rate limiter sweep failed, retrying in {interval}s: {e}")
+            if evicted:
+                logger.info(f"Rate limiter evicted {evicted} idle key(s)")
+
+    def start_sweeper(self, interval: float = 60):
+        """Boşta kalan anahtarları periyodik olarak silen arka plan görevini başlatır."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+# Global rate limiter instance; sqlite backend'i aynı makinedeki tüm worker'lar paylaşır
+rate_limiter = RateLimiter(backend=create_backend(
+    settings.RATE_LIMIT_BACKEND,
+    sqlite_path=os.path.join(settings.DATA_DIR, "rate_limits.sqlite3"),
+    redis_url=settings.REDIS_URL,
+    timeout=settings.RATE_LIMIT_TIMEOUT,
+))
+
+# AI işleme yapan, rate limit uygulanan endpoint'ler
+RATE_LIMITED_PATHS = {
+    f"{settings.API_V1_STR}/photos/preview",
+    f"{settings.API_V1_STR}/photos/render",
+    f"{settings.API_V1_STR}/photos/batch",
+    f"{settings.API_V1_STR}/jobs",
+}
 
 async def rate_limit_middleware(request: Request, call_next):
     """Rate limit middleware"""
-    # Sadece photo preview endpoint'i için rate limit uygula
+    # Sadece AI işleme yapan endpoint'ler için rate limit uygula
     try:
-        if request.url.path == "/api/v1/photos/preview":
-            rate_limiter.check_rate_limit(request)
+        if request.url.path in RATE_LIMITED_PATHS:
+            # sqlite/redis backend'leri bloklayan I/O yapar; event loop'u tutmamak için thread havuzunda
+            await run_in_threadpool(rate_limiter.check_rate_limit, request)
         response = await call_next(request)
         return response
     except HTTPException as exc:
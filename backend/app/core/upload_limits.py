@@ -0,0 +1,99 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.metrics import rejections
+
+# multipart sınırları, part başlıkları ve form alanları için pay
+MULTIPART_OVERHEAD = 64 * 1024
+
+TOO_LARGE_DETAIL = "File size is too large. Maximum size: {:.1f}MB"
+
+# Tek dosya kabul eden yükleme endpoint'leri
+SINGLE_UPLOAD_PATHS = {
+    f"{settings.API_V1_STR}/photos/preview",
+    f"{settings.API_V1_STR}/photos/render",
+    f"{settings.API_V1_STR}/jobs",
+}
+BATCH_UPLOAD_PATHS = {
+    f"{settings.API_V1_STR}/photos/batch",
+}
+
+def max_request_size(path: str):
+    """Endpoint için kabul edilen en büyük istek gövdesi (byte); yükleme endpoint'i değilse None."""
+    if path in SINGLE_UPLOAD_PATHS:
+        return settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD
+    if path in BATCH_UPLOAD_PATHS:
+        return settings.BATCH_MAX_FILES * (settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD)
+    return None
+
+def too_large_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={"detail": TOO_LARGE_DETAIL.format(settings.MAX_FILE_SIZE / 1024 / 1024)},
+        headers={"Connection": "close"}
+    )
+
+class UploadSizeLimitMiddleware:
+    """
+    Yükleme endpoint'lerinde istek gövdesini max_request_size ile sınırlar.
+
+    Content-Length sınırı aşan istekler gövde okunmadan 413 ile reddedilir.
+    Content-Length göndermeyen (chunked) veya küçük bildiren isteklerde
+    ASGI receive sarılır: okunan gövde byte'ları sayılır ve sınır aşıldığı
+    anda okuma durdurulup 413 döndürülür, gövdenin kalanı belleğe alınmaz.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = max_request_size(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            rejections.inc(reason="too_large")
+            await too_large_response()(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    # FastAPI gövde ayrıştırma hatalarını 400'e çevirir; HTTPException olduğu gibi iletilir
+                    raise HTTPException(
+                        status_code=413,
+                        detail=TOO_LARGE_DETAIL.format(settings.MAX_FILE_SIZE / 1024 / 1024),
+                        headers={"Connection": "close"}
+                    )
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException:
+            # Gövde endpoint dışında (ör. başka bir middleware) okunduysa yanıtı burada ver
+            if not exceeded or response_started:
+                raise
+            await too_large_response()(scope, receive, send)
+        finally:
+            if exceeded:
+                rejections.inc(reason="too_large")
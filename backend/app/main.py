@@ -1,20 +1,52 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
 from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, ResponseTimingMiddleware, metrics_middleware, registry
 from app.api.v1.api import api_router
-from app.core.rate_limiter import rate_limit_middleware
+from app.core.rate_limiter import rate_limit_middleware, rate_limiter
+from app.core.upload_limits import UploadSizeLimitMiddleware
+from app.ai.executor import shutdown_executor
+from app.ai.loader import model_loader
+from app.services.jobs import job_worker
+from app.services.janitor import file_janitor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # İşleme worker'ları ve modeller arka planda ısınır; /health hemen, /ready ısınma bitince yanıt verir
+    await model_loader.start()
+    await job_worker.start()
+    rate_limiter.start_sweeper(settings.RATE_LIMIT_SWEEP_INTERVAL)
+    await file_janitor.start()
+    yield
+    await file_janitor.stop()
+    await rate_limiter.stop_sweeper()
+    await job_worker.stop()
+    await model_loader.stop()
+    shutdown_executor()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Rate limit middleware
 app.middleware("http")(rate_limit_middleware)
 
+# Oversized uploads are rejected before rate limiting: from Content-Length before the body is read,
+# otherwise as soon as the streamed body passes the limit
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Request latency and in-flight count; outermost so rejected requests are measured too
+app.middleware("http")(metrics_middleware)
+# Time spent sending the response; measured outside the app, around the server's send
+app.add_middleware(ResponseTimingMiddleware, prefix=settings.API_V1_STR)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -42,4 +74,15 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"} 
+
+@app.get("/ready")
+async def readiness_check():
+    """200 once every processing worker has imported and warmed up its models, 503 until then."""
+    readiness = model_loader.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["status"] == "ready" else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,310 @@
+"""
+İşlenmiş fotoğraflar için içerik adresli sonuç önbelleği.
+
+Anahtar, yüklenen byte'ların SHA-256 özeti ile çıktıyı etkileyen
+parametrelerden (format, boyut, model, kırpma modu) oluşur. Aynı yapı
+format bağımsız kesitleri (cutout_cache) saklamak için de kullanılır. İki katman
+vardır: sınırlı bir bellek içi LRU ve settings.DATA_DIR altında boyutu
+sınırlı bir disk katmanı. Disk katmanı /uploads gibi dışarı açılan
+UPLOAD_DIR'de tutulmaz: içerik özetini bilen başkasının fotoğrafını alabilirdi. İki katmanda da kayıtlar TTL sonunda düşer.
+
+Disk katmanının dizinini aynı makinedeki tüm worker'lar paylaşır; her
+process'in indeksi yalnızca kendi yazdıklarını bilir. Boyut sınırının
+worker sayısıyla katlanmaması için indeks, sınır aşıldığında ve son
+taramadan bu yana sınırın RESCAN_FRACTION'ı kadar yazıldığında dizinden
+yeniden kurulur; tahliye bu paylaşılan görünüm üzerinden yapılır.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import cache_collector, registry
+from app.services.janitor import file_janitor
+
+logger = logging.getLogger(__name__)
+
+# Son taramadan bu yana disk sınırının bu oranı kadar yazıldığında dizin yeniden taranır
+RESCAN_FRACTION = 0.1
+
+
+def make_cache_key(contents: bytes, *params) -> str:
+    """Yükleme byte'ları ve çıktı parametrelerinden önbellek anahtarı üretir."""
+    digest = hashlib.sha256(contents)
+    for param in params:
+        digest.update(b"\0")
+        digest.update(str(param).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Bellek (LRU) ve disk katmanlı, TTL'li bayt önbelleği."""
+
+    def __init__(self, directory: str, memory_items: int, memory_bytes: int, disk_bytes: int, ttl_seconds: int,
+                 on_write: Optional[Callable[[str], None]] = None):
+        self.directory = directory
+        # Disk katmanına yazılan her dosya için çağrılır (ör. janitor'a süresini bildirmek için)
+        self.on_write = on_write
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._memory_size = 0
+        # Disk katmanının indeksi: anahtar -> (yazılma zamanı, boyut); ilk kullanımda diskten kurulur
+        self._disk_index: Optional["OrderedDict[str, Tuple[float, int]]"] = None
+        self._disk_size = 0
+        self._written_since_scan = 0
+        self._scanning = False
+        # Kilit altında indeksten düşürülen, kilit bırakılınca silinecek dosyalar
+        self._removed = []
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    # --- Public API ---
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        self._ensure_disk_index()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, data = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return data
+                self._drop_memory(key)
+                self._counters["expired"] += 1
+
+            entry = self._disk_index.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                self._drop_disk(key)
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+
+        # Dosya kilit dışında okunur; kilit yalnızca indeks ve LRU güncellemeleri için tutulur
+        data = self._read_disk(key) if entry is not None else None
+        if entry is not None:
+            with self._lock:
+                if data is not None:
+                    self._counters["disk_hits"] += 1
+                    # Diskten gelen kaydı bellek katmanına geri al
+                    self._store_memory(key, data, entry[0])
+                else:
+                    if self._disk_index.get(key) == entry:
+                        self._drop_disk(key)
+                    self._counters["misses"] += 1
+        self._remove_dropped()
+        return data
+
+    def put(self, key: str, data: bytes):
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, data, now)
+            self._counters["stores"] += 1
+        if len(data) > self.disk_bytes:
+            return
+        self._ensure_disk_index()
+        if not self._write_disk(key, data):
+            return
+        with self._lock:
+            previous = self._disk_index.pop(key, None)
+            if previous is not None:
+                self._disk_size -= previous[1]
+            self._disk_index[key] = (now, len(data))
+            self._disk_size += len(data)
+            self._written_since_scan += len(data)
+            rescan = not self._scanning and (
+                self._disk_size > self.disk_bytes or self._written_since_scan >= self.disk_bytes * RESCAN_FRACTION
+            )
+            if rescan:
+                self._scanning = True
+        if rescan:
+            # Diğer worker'ların yazdıklarını ve janitor'ın sildiklerini de görmek için
+            self._rescan_disk_index()
+        with self._lock:
+            # İndeks yazılma zamanına göre sıralı: süresi dolanlar hep baştadır
+            while self._disk_index and now - next(iter(self._disk_index.values()))[0] > self.ttl_seconds:
+                self._drop_disk(next(iter(self._disk_index)))
+                self._counters["expired"] += 1
+            while self._disk_size > self.disk_bytes:
+                self._drop_disk(next(iter(self._disk_index)))
+                self._counters["evictions"] += 1
+        self._remove_dropped()
+
+    def forget(self, path: str):
+        """Dışarıda (ör. janitor tarafından) silinen bir disk kaydını indeksten çıkarır."""
+        key = os.path.basename(path)[:-len(".bin")]
+        with self._lock:
+            if self._disk_index is None:
+                return
+            entry = self._disk_index.pop(key, None)
+            if entry is not None:
+                self._disk_size -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+            stats["disk_entries"] = len(self._disk_index) if self._disk_index is not None else 0
+            stats["disk_bytes"] = self._disk_size
+            return stats
+
+    # --- Memory tier ---
+
+    def _store_memory(self, key: str, data: bytes, stored_at: float):
+        if len(data) > self.memory_bytes:
+            return
+        self._drop_memory(key)
+        self._memory[key] = (stored_at, data)
+        self._memory_size += len(data)
+        while len(self._memory) > self.memory_items or self._memory_size > self.memory_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._counters["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[1])
+
+    # --- Disk tier ---
+    # Dosya işlemleri (tarama, okuma, yazma, silme) kilit dışında yapılır; kilit altında
+    # yalnızca indeks güncellenir. Silinecek dosyalar _removed'da toplanıp kilit bırakılınca silinir.
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _scan_disk(self) -> "OrderedDict[str, Tuple[float, int]]":
+        """Dizindeki kayıtları eskiden yeniye sıralı bir indeks olarak döndürür (kilit dışında çağrılır)."""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".bin"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filename[:-len(".bin")], stat.st_size))
+        entries.sort()
+        return OrderedDict((key, (mtime, size)) for mtime, key, size in entries)
+
+    def _ensure_disk_index(self):
+        """İndeksi ilk kullanımda dizinden kurar."""
+        if self._disk_index is not None:
+            return
+        scanned_at = time.time()
+        index = self._scan_disk()
+        with self._lock:
+            if self._disk_index is None:
+                self._install_disk_index(index, scanned_at)
+
+    def _rescan_disk_index(self):
+        scanned_at = time.time()
+        try:
+            index = self._scan_disk()
+        except OSError as e:
+            logger.warning(f"Result cache directory {self.directory} could not be scanned: {e}")
+            index = None
+        with self._lock:
+            self._scanning = False
+            if index is not None:
+                self._install_disk_index(index, scanned_at)
+
+    def _install_disk_index(self, index: "OrderedDict[str, Tuple[float, int]]", scanned_at: float):
+        # Tarama sürerken bu process'in yazdığı kayıtlar taramada görünmeyebilir; kaybolmasınlar
+        if self._disk_index is not None:
+            for key, (stored_at, size) in self._disk_index.items():
+                if stored_at >= scanned_at and key not in index:
+                    index[key] = (stored_at, size)
+        self._disk_index = index
+        self._disk_size = sum(size for _, size in index.values())
+        self._written_since_scan = 0
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Başka bir worker'ın janitor'ı silmiş; çağıran indeksten düşürür
+            return None
+        except OSError as e:
+            logger.warning(f"Result cache entry {key} could not be read: {e}")
+            return None
+
+    def _write_disk(self, key: str, data: bytes) -> bool:
+        """Kaydı geçici dosyaya yazıp yerine taşır; okuyucular yarım dosya görmez."""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            if self.on_write is not None:
+                self.on_write(path)
+        except OSError as e:
+            logger.warning(f"Result cache entry {key} could not be written: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        return True
+
+    def _drop_disk(self, key: str):
+        """Kaydı indeksten çıkarır; dosyası kilit bırakıldıktan sonra silinmek üzere sıraya alınır."""
+        entry = self._disk_index.pop(key, None)
+        if entry is None:
+            return
+        self._disk_size -= entry[1]
+        self._removed.append(self._path(key))
+
+    def _remove_dropped(self):
+        with self._lock:
+            paths, self._removed = self._removed, []
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Global result cache instance
+result_cache = ResultCache(
+    directory=os.path.join(settings.DATA_DIR, "cache"),
+    memory_items=settings.RESULT_CACHE_MEMORY_ITEMS,
+    memory_bytes=settings.RESULT_CACHE_MEMORY_BYTES,
+    disk_bytes=settings.RESULT_CACHE_DISK_BYTES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    on_write=file_janitor.track,
+)
+
+# Format bağımsız kesitler (RGBA + yüz geometrisi); başka bir format yalnızca birleştirme adımını tekrarlar
+cutout_cache = ResultCache(
+    directory=os.path.join(settings.DATA_DIR, "cutouts"),
+    memory_items=settings.CUTOUT_CACHE_MEMORY_ITEMS,
+    memory_bytes=settings.CUTOUT_CACHE_MEMORY_BYTES,
+    disk_bytes=settings.CUTOUT_CACHE_DISK_BYTES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    on_write=file_janitor.track,
+)
+
+# Süresi dolan kayıtlar yeni yazma beklemeden diskten de silinir; indeks silmeden haberdar edilir
+for _cache in (result_cache, cutout_cache):
+    file_janitor.watch(_cache.directory, _cache.ttl_seconds, on_delete=_cache.forget)
+# Eski sürümler önbellekleri UPLOAD_DIR altında tutuyordu; orada kalan kayıtlar hemen silinir
+for _name in ("cache", "cutouts"):
+    _legacy_directory = os.path.join(settings.UPLOAD_DIR, _name)
+    if os.path.isdir(_legacy_directory):
+        file_janitor.watch(_legacy_directory, 0)
+
+# /metrics isabet/ıska sayaçlarını ve doluluğu scrape anında okur
+registry.register_collector(cache_collector({"results": result_cache, "cutouts": cutout_cache}))
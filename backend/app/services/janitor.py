@@ -0,0 +1,184 @@
+"""
+Süresi dolan dosyaları silen arka plan temizleyicisi.
+
+İzlenen her dizinin bir ömrü (TTL) vardır. Uygulamanın yazdığı dosyalar
+track() ile bir min-heap'e (son kullanma zamanı, yol) eklenir; heap
+başlangıçta izlenen dizinlerden bir kere kurulur. Süresi dolan girdiler
+heap'in başından bir kere alınıp silinmeyi bekleyen bir kuyruğa taşınır;
+temizlik döngüsü bu kuyruğu sınırlı parçalar halinde boşaltır ve birikim
+metriği kuyruğun uzunluğudur. Dizinler tekrar taranmaz ve maliyet istek
+yoluna binmez. Bir dizin on_delete ile izlenirse silinen her dosya
+bildirilir (ör. önbellek indeksini güncel tutmak için).
+Silmeden önce dosyanın mtime'ı kontrol edilir: aynı yola (ör. başka bir
+worker tarafından) yeniden yazılmışsa yeni süresiyle tekrar planlanır.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class FileJanitor:
+    """İzlenen dizinlerdeki dosyaları yazılma zamanı + TTL dolunca siler."""
+
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._ttls: Dict[str, float] = {}  # dizin -> TTL (saniye)
+        self._listeners: Dict[str, Callable[[str], None]] = {}  # dizin -> on_delete
+        self._heap: List[Tuple[float, str]] = []  # (son kullanma zamanı, yol)
+        self._due: Deque[str] = deque()  # süresi dolmuş, silinmeyi bekleyen yollar
+        self._scheduled: Dict[str, float] = {}  # yol -> heap'teki ya da kuyruktaki son kullanma zamanı
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.deleted = 0
+
+    def watch(self, directory: str, ttl_seconds: float, on_delete: Optional[Callable[[str], None]] = None):
+        """directory'deki dosyaları ttl_seconds sonra silinecek şekilde izler; on_delete silinen her yolla çağrılır."""
+        os.makedirs(directory, exist_ok=True)
+        directory = os.path.abspath(directory)
+        self._ttls[directory] = ttl_seconds
+        if on_delete is not None:
+            self._listeners[directory] = on_delete
+
+    def _ttl_for(self, path: str) -> Optional[float]:
+        return self._ttls.get(os.path.dirname(os.path.abspath(path)))
+
+    def _schedule(self, path: str, expires_at: float):
+        # Heap'te yol başına tek girdi tutulur; erken planlanmış girdi mtime kontrolüyle ertelenir
+        if path in self._scheduled:
+            return
+        self._scheduled[path] = expires_at
+        heapq.heappush(self._heap, (expires_at, path))
+
+    def _advance(self, now: float):
+        # Süresi dolan girdiler heap'ten bir kere çıkar; birikim kuyruk uzunluğu olarak tutulur
+        while self._heap and self._heap[0][0] <= now:
+            self._due.append(heapq.heappop(self._heap)[1])
+
+    def track(self, path: str, written_at: Optional[float] = None):
+        """Yeni yazılan bir dosyayı planlar; izlenmeyen dizinlerdeki dosyalar yok sayılır."""
+        ttl = self._ttl_for(path)
+        if ttl is None:
+            return
+        with self._lock:
+            self._schedule(os.path.abspath(path), (time.time() if written_at is None else written_at) + ttl)
+
+    def rebuild(self) -> int:
+        """Heap'i izlenen dizinlerdeki dosyalardan kurar (başlangıçta bir kere); planlanan dosya sayısını döndürür."""
+        entries = []
+        for directory, ttl in self._ttls.items():
+            try:
+                with os.scandir(directory) as scanner:
+                    for entry in scanner:
+                        try:
+                            if entry.is_file(follow_symlinks=False):
+                                entries.append((entry.stat().st_mtime + ttl, entry.path))
+                        except OSError:
+                            continue
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            for expires_at, path in entries:
+                self._schedule(path, expires_at)
+            return len(self._heap) + len(self._due)
+
+    def collect(self, now: Optional[float] = None, max_files: Optional[int] = None) -> int:
+        """Süresi dolan en fazla max_files girdiyi işler; işlenen girdi sayısını döndürür."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._advance(now)
+            due = []
+            while self._due and (max_files is None or len(due) < max_files):
+                path = self._due.popleft()
+                del self._scheduled[path]
+                due.append(path)
+
+        rescheduled = []
+        deleted = []
+        for path in due:
+            ttl = self._ttl_for(path)
+            try:
+                expires_at = os.stat(path).st_mtime + ttl
+                if expires_at > now:
+                    # Dosya yeniden yazılmış: yeni süresiyle tekrar planla
+                    rescheduled.append((path, expires_at))
+                    continue
+                os.remove(path)
+                deleted.append(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.error(f"Janitor could not remove {path}: {e}")
+
+        with self._lock:
+            for path, expires_at in rescheduled:
+                self._schedule(path, expires_at)
+            self.deleted += len(deleted)
+        for path in deleted:
+            listener = self._listeners.get(os.path.dirname(path))
+            if listener is not None:
+                listener(path)
+        return len(due)
+
+    def backlog(self, now: Optional[float] = None) -> int:
+        """Süresi dolmuş ama henüz silinmemiş dosya sayısı."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._advance(now)
+            return len(self._due)
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._due)
+
+    async def _run(self):
+        while True:
+            # Büyük birikimleri parçalara böl, arada diğer isteklere sıra ver
+            while await run_in_threadpool(self.collect, None, self.batch_size) == self.batch_size:
+                await asyncio.sleep(0)
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """Heap'i diskten kurar ve temizlik döngüsünü başlatır. Uygulama açılırken çağrılır."""
+        if self._task is not None:
+            return
+        tracked = await run_in_threadpool(self.rebuild)
+        logger.info(f"Janitor tracking {tracked} file(s), {self.backlog()} already expired")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self) -> List[str]:
+        return [
+            "# HELP photoid_janitor_backlog_files Expired files waiting to be deleted.",
+            "# TYPE photoid_janitor_backlog_files gauge",
+            f"photoid_janitor_backlog_files {self.backlog()}",
+            "# HELP photoid_janitor_tracked_files Files scheduled for deletion.",
+            "# TYPE photoid_janitor_tracked_files gauge",
+            f"photoid_janitor_tracked_files {len(self)}",
+            "# HELP photoid_janitor_deleted_files_total Files deleted by the janitor.",
+            "# TYPE photoid_janitor_deleted_files_total counter",
+            f"photoid_janitor_deleted_files_total {self.deleted}",
+        ]
+
+
+# Global janitor; geçici dosyalar ve önbelleklerin disk katmanları onu kullanır
+file_janitor = FileJanitor(batch_size=settings.JANITOR_BATCH_SIZE, interval=settings.JANITOR_INTERVAL)
+# Eski sürümlerin ve yarıda kalan isteklerin bıraktığı geçici dosyalar
+file_janitor.watch(os.path.join(settings.UPLOAD_DIR, "temp"), settings.TEMP_FILE_TTL_SECONDS)
+registry.register_collector(file_janitor.metrics)
@@ -0,0 +1,349 @@
+"""
+Asenkron fotoğraf işleme işleri için yerel, kalıcı iş kuyruğu.
+
+İşler SQLite'ta (WAL modunda) saklanır; geliştirme ve testlerde Redis
+gerekmez. İşçiler API process'i içinde (JobWorker, lifespan'da başlar)
+veya ayrı process'ler olarak (`python -m app.services.jobs`) çalışabilir;
+iki durumda da aynı process_photo çekirdeği kullanılır. Tamamlanan
+sonuçlar JOB_RESULT_TTL_SECONDS boyunca saklanır.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.ai import processing
+from app.ai.executor import run_in_executor
+from app.ai.encoding import EncodeOptions, encode_image, resolve_encode_options
+from app.ai.models import model_latency
+from app.core.config import settings
+from app.core.metrics import queue_wait, record_pipeline_metadata
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# İşçinin veritabanı hatalarından sonra en fazla bekleyeceği süre (saniye)
+MAX_BACKOFF_SECONDS = 30
+# Yarım kalmış işleri yeniden kuyruğa alma ve süresi dolanları silme aralığı (saniye)
+MAINTENANCE_INTERVAL = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    input BLOB,
+    result BLOB,
+    error_type TEXT,
+    error_message TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_seq ON jobs (status, seq);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+"""
+
+
+class JobStore:
+    """SQLite üzerinde iş kuyruğu. Her çağrı kendi bağlantısını açıp kapatır; thread ve process güvenlidir."""
+
+    def __init__(self, path: str, result_ttl_seconds: int):
+        self.path = path
+        self.result_ttl_seconds = result_ttl_seconds
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    connection = sqlite3.connect(self.path, timeout=30)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(_SCHEMA)
+                    connection.close()
+                    self._initialized = True
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def submit(self, contents: bytes, params: dict) -> str:
+        """İşi kuyruğa ekler ve iş kimliğini döndürür."""
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, params, input, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), contents, time.time())
+            )
+        return job_id
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """Sıradaki işi atomik olarak RUNNING yapar ve döndürür; kuyruk boşsa None."""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT seq, id, params, input, created_at FROM jobs WHERE status = ? ORDER BY seq LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, started_at = ? WHERE seq = ?", (RUNNING, time.time(), row["seq"])
+                )
+            connection.execute("COMMIT")
+            return row
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def complete(self, job_id: str, result: bytes):
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, input = NULL, finished_at = ? WHERE id = ?",
+                (SUCCEEDED, result, time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: Exception):
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error_type = ?, error_message = ?, input = NULL, finished_at = ? WHERE id = ?",
+                (FAILED, type(error).__name__, str(error), time.time(), job_id)
+            )
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """İşin durumunu döndürür; kuyruktaysa önündeki iş sayısını (position) da içerir."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT seq, id, status, params, error_type, error_message, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            # Süresi dolmuş ama henüz silinmemiş sonuçlar da yok sayılır
+            if row is None or self._expired(row["finished_at"]):
+                return None
+            job = dict(row)
+            job["params"] = json.loads(job["params"])
+            if job["status"] == QUEUED:
+                job["position"] = connection.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND seq < ?", (QUEUED, job["seq"])
+                ).fetchone()[0]
+            if job["finished_at"] is not None:
+                job["expires_at"] = job["finished_at"] + self.result_ttl_seconds
+            del job["seq"]
+            return job
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT result, finished_at FROM jobs WHERE id = ? AND status = ?", (job_id, SUCCEEDED)
+            ).fetchone()
+            if row is None or self._expired(row["finished_at"]):
+                return None
+            return row["result"]
+
+    def _expired(self, finished_at: Optional[float]) -> bool:
+        return finished_at is not None and time.time() - finished_at > self.result_ttl_seconds
+
+    def purge_expired(self) -> int:
+        """TTL'i dolan tamamlanmış işleri siler."""
+        with closing(self._connect()) as connection:
+            cursor = connection.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.result_ttl_seconds,)
+            )
+            return cursor.rowcount
+
+    def requeue_stale(self, timeout_seconds: int) -> int:
+        """Çöken bir işçide yarım kalmış (uzun süredir RUNNING) işleri tekrar kuyruğa alır."""
+        with closing(self._connect()) as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?",
+                (QUEUED, RUNNING, time.time() - timeout_seconds)
+            )
+            return cursor.rowcount
+
+
+def job_encoding(params: dict) -> EncodeOptions:
+    """İşin çıktı formatı; encoding parametresi olmayan (eski) işler varsayılanla encode edilir."""
+    if "encoding" in params:
+        return EncodeOptions(**params["encoding"])
+    return resolve_encode_options()
+
+
+def run_job(contents: bytes, params: dict) -> Tuple[bytes, dict]:
+    """İşi /preview ile aynı process_photo çekirdeğiyle işler; encode edilmiş byte'ları ve metadata'yı döndürür."""
+    image, metadata = processing.process_photo(
+        input_image=contents,
+        output_size=tuple(params["output_size"]),
+        model_name=params.get("model"),
+        return_metadata=True,
+        output_format=params.get("output_format"),
+        crop_mode=params.get("crop_mode"),
+    )
+    # Kesit pickle/JSON için büyük; kuyruk sonucunda gerekmez
+    metadata.pop("cutout", None)
+    start = time.perf_counter()
+    result = encode_image(image, job_encoding(params))
+    metadata["timings"]["encode"] = time.perf_counter() - start
+    return result, metadata
+
+
+class JobWorker:
+    """API process'i içinde kuyruktan iş çeken asyncio işçileri; işi executor'da çalıştırır."""
+
+    def __init__(self, store: JobStore, concurrency: int, poll_interval: float,
+                 maintenance_interval: float = MAINTENANCE_INTERVAL):
+        self.store = store
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.maintenance_interval = maintenance_interval
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def notify(self):
+        """Yeni iş eklendiğinde bekleyen işçileri uyandırır."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        requeued = await run_in_threadpool(self.store.requeue_stale, settings.JOB_STALE_SECONDS)
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale job(s)")
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._maintenance_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                processed = await self._process_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Ör. veritabanı kilitli: işçi ölmez, giderek artan aralıklarla tekrar dener.
+                # Tamamlanamayan iş RUNNING kalır ve _maintenance_loop onu tekrar kuyruğa alır.
+                failures += 1
+                delay = min(MAX_BACKOFF_SECONDS, self.poll_interval * 2 ** (failures - 1))
+                logger.error(f"Job worker error, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if not processed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _process_next(self) -> bool:
+        """Sıradaki işi executor'da işler; kuyruk boşsa False döndürür."""
+        row = await run_in_threadpool(self.store.claim)
+        if row is None:
+            return False
+
+        job_id = row["id"]
+        logger.info(f"Job {job_id} started")
+        queue_wait.observe(max(0.0, time.time() - row["created_at"]), queue="jobs")
+        try:
+            result, metadata = await run_in_executor(run_job, row["input"], json.loads(row["params"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Job {job_id} failed: {e}")
+            await run_in_threadpool(self.store.fail, job_id, e)
+        else:
+            logger.info(f"Job {job_id} succeeded")
+            model_latency.record(metadata["model"], metadata["timings"]["background_removal"])
+            record_pipeline_metadata(metadata)
+            await run_in_threadpool(self.store.complete, job_id, result)
+        return True
+
+    async def _maintenance_loop(self):
+        """Çalışırken ölen işçilerin işlerini tekrar kuyruğa alır, süresi dolan sonuçları siler."""
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                requeued = await run_in_threadpool(self.store.requeue_stale, settings.JOB_STALE_SECONDS)
+                if requeued:
+                    logger.warning(f"Requeued {requeued} stale job(s)")
+                purged = await run_in_threadpool(self.store.purge_expired)
+                if purged:
+                    logger.info(f"Purged {purged} expired job(s)")
+            except Exception as e:
+                logger.error(f"Error during job queue maintenance: {e}")
+
+
+def process_next_job(store: JobStore) -> bool:
+    """Kuyruktaki sıradaki işi bu process'te işler; kuyruk boşsa False döndürür."""
+    row = store.claim()
+    if row is None:
+        return False
+    try:
+        result, _ = run_job(row["input"], json.loads(row["params"]))
+    except Exception as e:
+        logger.info(f"Job {row['id']} failed: {e}")
+        store.fail(row["id"], e)
+    else:
+        logger.info(f"Job {row['id']} succeeded")
+        store.complete(row["id"], result)
+    return True
+
+
+def run_worker_forever(store: JobStore, poll_interval: float):
+    """Ayrı bir process olarak kuyruktan iş çeker ve process_photo'yu doğrudan çağırır."""
+    processing.warm_up()
+    last_maintenance = 0.0
+    failures = 0
+    logger.info(f"Job worker {os.getpid()} started on {store.path}")
+    while True:
+        try:
+            if time.time() - last_maintenance > MAINTENANCE_INTERVAL:
+                store.requeue_stale(settings.JOB_STALE_SECONDS)
+                store.purge_expired()
+                last_maintenance = time.time()
+            processed = process_next_job(store)
+        except sqlite3.Error as e:
+            failures += 1
+            delay = min(MAX_BACKOFF_SECONDS, poll_interval * 2 ** (failures - 1))
+            logger.error(f"Job worker error, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            continue
+        failures = 0
+        if not processed:
+            time.sleep(poll_interval)
+
+
+# Global job store ve in-process işçi
+job_store = JobStore(
+    path=settings.JOB_DB_PATH or os.path.join(settings.DATA_DIR, "jobs.sqlite3"),
+    result_ttl_seconds=settings.JOB_RESULT_TTL_SECONDS,
+)
+job_worker = JobWorker(job_store, concurrency=settings.JOB_WORKERS, poll_interval=settings.JOB_POLL_INTERVAL)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    run_worker_forever(job_store, settings.JOB_POLL_INTERVAL)
@@ -0,0 +1,275 @@
+"""
+/api/v1/photos/preview için asyncio yük üreteci.
+
+İki mod vardır:
+- kapalı döngü (--concurrency N): N sanal istemci, her biri yanıtı alınca yenisini gönderir.
+- açık döngü (--rate R): istekler saniyede ortalama R olacak şekilde (Poisson) gönderilir;
+  gecikme planlanan gönderim anından ölçülür ki sunucu yavaşladığında gizlenmesin.
+
+Sonuçta throughput, gecikme yüzdelikleri ve durum kodu / hata dağılımı
+yazdırılır. Sunucu /metrics sunuyorsa test öncesi ve sonrası scrape edilir
+ve aşama başına ortalama süreler (doğrulama, encode, kuyruk bekleme...)
+raporlanır.
+
+--serve, uygulamayı bu makinede ayağa kaldırır; --stub sleep|cpu ile
+process_photo yerine --stub-seconds süreli bir stub kullanılır
+(benchmarks/stub_app.py). --stub-seconds verilmezse ve pipeline
+benchmark'ının sonucu varsa, model maliyeti oradaki medyan süreye
+kalibre edilir.
+
+Kullanım (backend klasöründen):
+    python -m benchmarks.load --serve --stub cpu --concurrency 8 --duration 30
+    python -m benchmarks.load --serve --stub sleep --rate 20 --duration 30
+    python -m benchmarks.load --url http://localhost:8000 --concurrency 4 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.pipeline import DEFAULT_IMAGE, DEFAULT_OUTPUT as PIPELINE_RESULTS
+
+PREVIEW_PATH = "/api/v1/photos/preview"
+PERCENTILES = (50, 90, 95, 99)
+DEFAULT_STUB_SECONDS = 0.25
+
+_METRIC_LINE = re.compile(r'^photoid_(\w+?)(?:_seconds)?_(sum|count)\{([^}]*)\}\s+(\S+)$')
+# Yük testinin kendi yaptığı istekler rapora karışmasın
+_IGNORED_ROUTES = ('route="/metrics"', 'route="/health"')
+
+
+class Result:
+    __slots__ = ("latency", "status", "error")
+
+    def __init__(self, latency: float, status: Optional[int] = None, error: Optional[str] = None):
+        self.latency = latency
+        self.status = status
+        self.error = error
+
+
+def unique_payload(image: bytes) -> bytes:
+    """
+    JPEG'in sonuna (EOI'dan sonra) rastgele byte'lar ekler: görüntü aynı kalır,
+    önbellek anahtarı değişir (disk önbelleği çalıştırmalar arasında da kalıcıdır).
+    """
+    return image + os.urandom(16)
+
+
+async def send(client: httpx.AsyncClient, image: bytes, params: dict, scheduled: float) -> Result:
+    try:
+        response = await client.post(PREVIEW_PATH, params=params, files={"file": ("load.jpg", image, "image/jpeg")})
+        await response.aread()
+        return Result(time.perf_counter() - scheduled, status=response.status_code)
+    except httpx.HTTPError as e:
+        return Result(time.perf_counter() - scheduled, error=type(e).__name__)
+
+
+async def closed_loop(client, image: bytes, params: dict, concurrency: int, deadline: float,
+                      max_requests: Optional[int], unique: bool) -> List[Result]:
+    results: List[Result] = []
+    issued = 0
+
+    async def virtual_user():
+        nonlocal issued
+        while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            payload = unique_payload(image) if unique else image
+            results.append(await send(client, payload, params, time.perf_counter()))
+
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    return results
+
+
+async def open_loop(client, image: bytes, params: dict, rate: float, deadline: float,
+                    max_requests: Optional[int], unique: bool) -> List[Result]:
+    tasks = []
+    next_send = time.perf_counter()
+    index = 0
+    while next_send < deadline and (max_requests is None or index < max_requests):
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        index += 1
+        payload = unique_payload(image) if unique else image
+        tasks.append(asyncio.create_task(send(client, payload, params, next_send)))
+        next_send += random.expovariate(rate)
+    return list(await asyncio.gather(*tasks))
+
+
+def scrape_stage_means(base_url: str) -> Dict[str, Tuple[float, float]]:
+    """/metrics'teki histogramlardan seri başına (toplam süre, sayı) okur; uç nokta yoksa boş döner."""
+    try:
+        text = httpx.get(f"{base_url}/metrics", timeout=5).text
+    except httpx.HTTPError:
+        return {}
+    totals: Dict[str, List[float]] = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match is None or any(route in line for route in _IGNORED_ROUTES):
+            continue
+        name, kind, labels, value = match.groups()
+        entry = totals.setdefault(f"{name}{{{labels}}}", [0.0, 0.0])
+        entry[0 if kind == "sum" else 1] += float(value)
+    return {key: (total, count) for key, (total, count) in totals.items()}
+
+
+def print_report(results: List[Result], elapsed: float, before: dict, after: dict, as_json: Optional[str]):
+    statuses = Counter(str(result.status) if result.error is None else result.error for result in results)
+    ok = [result.latency * 1000 for result in results if result.status == 200]
+    report = {
+        "requests": len(results),
+        "duration_s": round(elapsed, 2),
+        "throughput_per_s": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "outcomes": dict(statuses),
+        "latency_ms": {},
+        "server_stage_mean_ms": {},
+    }
+    if ok:
+        values = np.array(ok)
+        report["latency_ms"] = {f"p{p}": round(float(np.percentile(values, p)), 1) for p in PERCENTILES}
+        report["latency_ms"]["mean"] = round(statistics.fmean(ok), 1)
+        report["latency_ms"]["max"] = round(max(ok), 1)
+    for key, (total, count) in sorted(after.items()):
+        old_total, old_count = before.get(key, (0.0, 0.0))
+        if count > old_count:
+            report["server_stage_mean_ms"][key] = round((total - old_total) / (count - old_count) * 1000, 2)
+
+    print(f"\nrequests: {report['requests']} in {report['duration_s']}s, "
+          f"throughput: {report['throughput_per_s']} ok/s")
+    print("outcomes: " + ", ".join(f"{status}={count}" for status, count in statuses.most_common()))
+    if ok:
+        print("latency ms (200s): " + " ".join(f"{name}={value}" for name, value in report["latency_ms"].items()))
+    if report["server_stage_mean_ms"]:
+        print("server-side means during the run (ms):")
+        for name, value in report["server_stage_mean_ms"].items():
+            print(f"  {name:<75} {value:>10.2f}")
+    if as_json:
+        with open(as_json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {as_json}")
+
+
+def calibrated_stub_seconds() -> float:
+    """Pipeline benchmark'ı çalıştırıldıysa model maliyetini onun medyan toplam süresine eşitler."""
+    try:
+        with open(PIPELINE_RESULTS) as f:
+            cases = json.load(f)["cases"]
+        seconds = statistics.median(case["total"]["p50_ms"] for case in cases) / 1000
+        print(f"stub calibrated to {seconds * 1000:.0f}ms from {PIPELINE_RESULTS}")
+        return seconds
+    except (OSError, ValueError, KeyError, statistics.StatisticsError):
+        return DEFAULT_STUB_SECONDS
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(stub: Optional[str], stub_seconds: float, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    # Yük testi rate limit'e takılmamalı
+    env.setdefault("TEST_MODE", "true")
+    env.setdefault("RATE_LIMIT_BACKEND", "memory")
+    target = "app.main:app"
+    if stub:
+        env.update(PHOTOID_STUB=stub, PHOTOID_STUB_SECONDS=str(stub_seconds))
+        target = "benchmarks.stub_app:app"
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 120):
+    """/ready worker'ların ısındığını bildirene kadar bekler; /health ısınmadan önce de 200 döner."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            status = httpx.get(f"{base_url}/ready", timeout=1).json().get("status")
+            if status == "ready":
+                return
+            if status == "failed":
+                print("warning: worker warm-up failed, models will load on the first requests", file=sys.stderr)
+                return
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready in time")
+
+
+async def run(args, base_url: str, image: bytes) -> Tuple[List[Result], float]:
+    params = {"output_format": args.output_format}
+    connections = args.concurrency if args.rate is None else max(args.concurrency, 100)
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        if args.rate is None:
+            results = await closed_loop(client, image, params, args.concurrency, deadline, args.requests, args.unique)
+        else:
+            results = await open_loop(client, image, params, args.rate, deadline, args.requests, args.unique)
+        return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="hedef sunucu (--serve ile yok sayılır)")
+    parser.add_argument("--serve", action="store_true", help="uygulamayı bu makinede başlat")
+    parser.add_argument("--stub", choices=("sleep", "cpu"), default=None, help="process_photo yerine stub (--serve ile)")
+    parser.add_argument("--stub-seconds", type=float, default=None, help="stub süresi; verilmezse kalibre edilir")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=4, help="kapalı döngü: eşzamanlı istemci sayısı")
+    mode.add_argument("--rate", type=float, default=None, help="açık döngü: saniyedeki ortalama istek")
+    parser.add_argument("--duration", type=float, default=30, help="test süresi (saniye)")
+    parser.add_argument("--requests", type=int, default=None, help="en fazla istek sayısı")
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--output-format", default="passport_eu")
+    parser.add_argument("--unique", action=argparse.BooleanOptionalAction, default=True,
+                        help="her isteği farklı byte'larla gönder (sonuç önbelleğini atlar)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", default=None, help="raporu bu dosyaya da yaz")
+    args = parser.parse_args()
+    if args.stub and not args.serve:
+        parser.error("--stub requires --serve")
+
+    with open(args.image, "rb") as f:
+        image = f.read()
+
+    server = None
+    base_url = args.url.rstrip("/")
+    if args.serve:
+        stub_seconds = args.stub_seconds if args.stub_seconds is not None else calibrated_stub_seconds()
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(args.stub, stub_seconds, port)
+    try:
+        if server is not None:
+            wait_until_ready(base_url, server)
+        before = scrape_stage_means(base_url)
+        results, elapsed = asyncio.run(run(args, base_url, image))
+        after = scrape_stage_means(base_url)
+        print_report(results, elapsed, before, after, args.json)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+process_photo aşamalarının mikrobenchmark'ı.
+
+Girdi çözünürlükleri x PRESET_SIZES matrisinin her hücresi için decode,
+resize, face_detection, background_removal, compose ve encode aşamalarının
+p50/p95 gecikmesini, tek worker'ın saniyedeki fotoğraf sayısını ve tepe
+belleği ölçer. Aşama süreleri pipeline'ın metadata["timings"] değerlerinden
+okunur; ölçüm process_photo ile aynı yolu (extract_cutout + render_cutout +
+config'deki çıktı formatıyla encode) izler. Her hücre ayrı bir process'te
+çalışır ki tepe RSS hücreye ait olsun.
+
+Girdiler assets/ altındaki portrenin her çözünürlüğe ölçeklenmiş JPEG'leridir
+(--synthetic ile yüzsüz gürültü görüntüleri; bunlar yüz algılamada durur ve
+reddetme yolunun maliyetini ölçer). Ağ gerekmez: matting modeli yerelde yoksa
+--matting auto, background_removal'ı girdiyi olduğu gibi döndüren bir stub ile
+değiştirir ve bunu sonuç dosyasına yazar.
+
+Kullanım (backend klasöründen):
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --resolutions 800x1000,3276x4096 --formats passport_eu --iterations 20
+    python -m benchmarks.pipeline --save-baseline        # mevcut sonuçları referans olarak sakla
+    python -m benchmarks.pipeline --threshold 0.15       # p50'si referansa göre %15'ten fazla kötüleşen aşamalar hata verir
+    python -m benchmarks.pipeline --compare              # referans dosyası yoksa da hata ver (CI için)
+
+Depodaki pipeline_baseline.json tek çekirdekli bir makinede --matting stub
+ile kaydedilmiştir; başka bir makinede karşılaştırmadan önce orada
+--save-baseline ile yeniden üretin.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", ".."))
+DEFAULT_IMAGE = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results", "pipeline.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "pipeline_baseline.json")
+
+DEFAULT_RESOLUTIONS = "600x750,1200x1500,3276x4096"
+STAGES = ("decode", "resize", "face_detection", "background_removal", "compose", "encode")
+MATTING_MODES = ("auto", "real", "stub")
+
+# Referansla karşılaştırmada bu kadar milisaniyeden küçük farklar gürültü sayılır
+MIN_REGRESSION_MS = 1.0
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def make_input(size: Tuple[int, int], image_path: Optional[str], seed: int = 0) -> bytes:
+    """Verilen çözünürlükte JPEG girdi üretir: portreyi ölçekler veya (image_path yoksa) gürültü üretir."""
+    if image_path:
+        with Image.open(image_path) as source:
+            image = source.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+    else:
+        rng = np.random.default_rng(seed)
+        image = Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def _stub_remove(image: Image.Image, session=None) -> Image.Image:
+    """Matting yerine: girdiyi tamamen opak RGBA olarak döndürür."""
+    return image.convert("RGBA")
+
+
+def _setup_matting(mode: str) -> str:
+    """Matting modelini hazırlar; model yüklenemezse (auto) stub'a geçer. Kullanılan modu döndürür."""
+    from app.ai import processing
+
+    if mode != "stub":
+        status = processing.warm_up()
+        if status["state"] == "ready":
+            return "real"
+        if mode == "real":
+            raise RuntimeError(f"matting model unavailable: {status['error']}")
+        print(f"matting model unavailable ({status['error']}); using stub", file=sys.stderr)
+    processing.rembg.remove = _stub_remove
+    processing.session_registry.get = lambda model_name=None: None
+    return "stub"
+
+
+def _run_once(input_bytes: bytes, output_size, output_format: str, crop_mode: Optional[str]):
+    """process_photo ile aynı yol; (aşama süreleri, başarılı mı) döndürür."""
+    from app.ai import processing
+    from app.ai.encoding import encode_image
+    from app.ai.exceptions import PhotoProcessingError
+
+    metadata = {"timings": {}}
+    try:
+        cutout = processing.extract_cutout(input_bytes, output_size, None, output_format, crop_mode, metadata)
+    except PhotoProcessingError:
+        return metadata["timings"], False
+    start = time.perf_counter()
+    image = processing.render_cutout(cutout, output_size, output_format)
+    metadata["timings"]["compose"] = time.perf_counter() - start
+    start = time.perf_counter()
+    encode_image(image)
+    metadata["timings"]["encode"] = time.perf_counter() - start
+    return metadata["timings"], True
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+
+def run_case(input_bytes: bytes, output_size, output_format: str, crop_mode: Optional[str],
+             iterations: int, warmup: int, matting: str) -> dict:
+    """Bir matris hücresini ölçer; ayrı bir process'te çağrılır."""
+    matting = _setup_matting(matting)
+    for _ in range(warmup):
+        _run_once(input_bytes, output_size, output_format, crop_mode)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    totals = []
+    succeeded = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        timings, ok = _run_once(input_bytes, output_size, output_format, crop_mode)
+        totals.append(time.perf_counter() - start)
+        succeeded += ok
+        for stage, seconds in timings.items():
+            samples.setdefault(stage, []).append(seconds)
+
+    # Python/numpy tahsislerinin tepe değeri; zamanlamayı bozmaması için ayrı bir turda ölçülür
+    tracemalloc.start()
+    _run_once(input_bytes, output_size, output_format, crop_mode)
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss Linux'ta KB, macOS'ta byte
+    rss_unit = 1 if platform.system() == "Darwin" else 1024
+
+    return {
+        "matting": matting,
+        "succeeded": succeeded,
+        "iterations": iterations,
+        "stages": {stage: _summary(values) for stage, values in samples.items() if values},
+        "total": _summary(totals),
+        "throughput_per_s": round(iterations / sum(totals), 3),
+        "peak_rss_mb": round(peak_rss * rss_unit / 1024 / 1024, 1),
+        "measured_rss_growth_mb": round((peak_rss - rss_before) * rss_unit / 1024 / 1024, 1),
+        "peak_alloc_mb": round(peak_alloc / 1024 / 1024, 1),
+    }
+
+
+def run_matrix(resolutions, formats, image_path: Optional[str], crop_mode: Optional[str],
+               iterations: int, warmup: int, matting: str) -> List[dict]:
+    from app.ai.processing import PRESET_SIZES
+
+    cases = []
+    context = multiprocessing.get_context("spawn")
+    for resolution in resolutions:
+        input_bytes = make_input(resolution, image_path)
+        for output_format in formats:
+            output_size = PRESET_SIZES[output_format]
+            # Her hücre taze bir process'te: tepe RSS ve model önbellekleri hücreler arasında karışmaz
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(
+                    run_case, input_bytes, output_size, output_format, crop_mode, iterations, warmup, matting
+                ).result()
+            case = {"resolution": f"{resolution[0]}x{resolution[1]}", "format": output_format,
+                    "input_bytes": len(input_bytes), **result}
+            cases.append(case)
+            print_case(case)
+    return cases
+
+
+def print_case(case: dict):
+    stages = " ".join(
+        f"{stage}={values['p50_ms']:.1f}/{values['p95_ms']:.1f}" for stage, values in case["stages"].items()
+    )
+    print(f"{case['resolution']:>10} {case['format']:<12} total p50={case['total']['p50_ms']:.1f}ms "
+          f"p95={case['total']['p95_ms']:.1f}ms {case['throughput_per_s']:.2f}/s "
+          f"rss={case['peak_rss_mb']:.0f}MB alloc={case['peak_alloc_mb']:.0f}MB  [{stages}]")
+
+
+def compare(cases: List[dict], baseline: dict, threshold: float) -> List[str]:
+    """p50'si referansa göre threshold oranından (ve MIN_REGRESSION_MS'ten) fazla artan aşamaları listeler."""
+    reference = {(case["resolution"], case["format"]): case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in cases:
+        old = reference.get((case["resolution"], case["format"]))
+        if old is None:
+            continue
+        pairs = [(stage, values, old["stages"].get(stage)) for stage, values in case["stages"].items()]
+        pairs.append(("total", case["total"], old["total"]))
+        for stage, values, old_values in pairs:
+            if old_values is None:
+                continue
+            new_ms, old_ms = values["p50_ms"], old_values["p50_ms"]
+            if new_ms - old_ms > MIN_REGRESSION_MS and new_ms > old_ms * (1 + threshold):
+                regressions.append(
+                    f"{case['resolution']} {case['format']} {stage}: p50 {old_ms:.1f}ms -> {new_ms:.1f}ms "
+                    f"(+{(new_ms / old_ms - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def write_json(path: str, data: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    from app.ai.processing import CROP_MODES, PRESET_SIZES
+
+    presets = [name for name, size in PRESET_SIZES.items() if size]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="virgülle ayrılmış WxH listesi")
+    parser.add_argument("--formats", default=",".join(presets), help="virgülle ayrılmış PRESET_SIZES adları")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="ölçeklenecek portre")
+    parser.add_argument("--synthetic", action="store_true", help="portre yerine yüzsüz gürültü görüntüleri kullan")
+    parser.add_argument("--crop-mode", choices=sorted(CROP_MODES), default=None)
+    parser.add_argument("--matting", choices=MATTING_MODES, default="auto")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="sonuçları referans dosyasına da yaz")
+    parser.add_argument("--compare", action="store_true",
+                        help="referans dosyası yoksa karşılaştırmayı atlamak yerine hata ver")
+    parser.add_argument("--threshold", type=float, default=0.10, help="izin verilen göreli p50 artışı")
+    args = parser.parse_args()
+    if args.compare and args.save_baseline:
+        parser.error("--compare and --save-baseline are mutually exclusive")
+    if args.compare and not os.path.exists(args.baseline):
+        parser.error(f"baseline {args.baseline} not found (record one with --save-baseline)")
+
+    formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in presets]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}. Allowed: {', '.join(presets)}")
+    resolutions = [parse_resolution(value) for value in args.resolutions.split(",")]
+    image_path = None if args.synthetic else args.image
+
+    cases = run_matrix(resolutions, formats, image_path, args.crop_mode, args.iterations, args.warmup, args.matting)
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "input": "synthetic" if image_path is None else os.path.relpath(image_path, PROJECT_ROOT),
+        "cases": cases,
+    }
+    write_json(args.output, results)
+    print(f"\nresults written to {args.output}")
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if {case["matting"] for case in cases} != {case.get("matting") for case in baseline.get("cases", [])}:
+        print("warning: baseline was recorded with a different matting mode", file=sys.stderr)
+    regressions = compare(cases, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"no regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+INT8 kuantize matting modellerinin doğruluk/gecikme karşılaştırması.
+
+Her model için float ağırlıklarla ve dinamik INT8 kopyasıyla
+(artifacts.model_store, gerekirse üretip önbelleğe alır) referans
+görüntülerin maskeleri çıkarılır ve karşılaştırılır. Modele tüm görüntü
+değil, pipeline'ın ürettiği girdi verilir: processing._prepare_matting
+ile yüzden türetilen matting bölgesi, seçilen --format/--crop-mode için
+modelin ihtiyaç duyduğu ölçekte. Yüzü bulunamayan görüntüler atlanır.
+
+- iou: alfa maskelerinin (>= 128) kesişim/birleşim oranı,
+- edge_error: float maskenin kenar bandındaki (--edge-width piksel)
+  ortalama mutlak alfa farkı (0-1); saç ve omuz kenarlarındaki bozulmayı
+  tüm görüntünün ortalamasından daha iyi gösterir,
+- latency: oturumun predict() süresi (p50, --runs tekrar).
+
+Bir model tüm görüntülerde --min-iou ve --max-edge-error eşiklerini
+sağlıyor ve INT8 daha hızlıysa MATTING_QUANTIZED için önerilir; INT8'e
+yalnızca kalitenin korunduğu modellerde geçilir.
+
+Kullanım (backend klasöründen):
+    python -m benchmarks.quantization
+    python -m benchmarks.quantization --models u2net,u2netp --images ../assets --json benchmarks/results/quantization.json
+    python -m benchmarks.quantization --format passport_eu --crop-mode full
+"""
+import argparse
+import glob
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks.pipeline import DEFAULT_IMAGE, write_json
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+EDGE_WIDTH = 3
+
+
+def alpha_iou(reference: np.ndarray, candidate: np.ndarray, threshold: int = 128) -> float:
+    """İki alfa maskesinin ikili (>= threshold) kesişim/birleşim oranı."""
+    reference, candidate = reference >= threshold, candidate >= threshold
+    union = np.logical_or(reference, candidate).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(reference, candidate).sum() / union)
+
+
+def edge_error(reference: np.ndarray, candidate: np.ndarray, width: int = EDGE_WIDTH, threshold: int = 128) -> float:
+    """Referans maskenin kenar bandında ortalama mutlak alfa farkı (0-1)."""
+    binary = (reference >= threshold).astype(np.uint8)
+    kernel = np.ones((2 * width + 1, 2 * width + 1), np.uint8)
+    band = cv2.dilate(binary, kernel) > cv2.erode(binary, kernel)
+    if not band.any():
+        return 0.0
+    difference = np.abs(reference.astype(np.float32) - candidate.astype(np.float32)) / 255
+    return float(difference[band].mean())
+
+
+def load_images(paths: List[str]) -> Dict[str, bytes]:
+    """Dosya ve dizinlerdeki referans görüntüleri, API'ye yüklenecekleri gibi byte olarak okur."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(f for pattern in IMAGE_PATTERNS for f in glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    images = {}
+    for path in files:
+        with open(path, "rb") as f:
+            images[os.path.basename(path)] = f.read()
+    return images
+
+
+def matting_inputs(model_name: str, images: Dict[str, bytes], output_format: str,
+                   crop_mode: Optional[str]) -> Tuple[dict, dict]:
+    """
+    Her görüntü için pipeline'ın modele vereceği girdiyi (_prepare_matting)
+    üretir. (girdiler, atlanan görüntüler ve nedenleri) döner.
+    """
+    from app.ai import processing
+    from app.ai.exceptions import PhotoProcessingError
+
+    crop_mode = processing._resolve_crop_mode(crop_mode)
+    output_size = processing.PRESET_SIZES[output_format]
+    inputs, skipped = {}, {}
+    for name, data in images.items():
+        try:
+            inputs[name], _ = processing._prepare_matting(
+                data, output_size, model_name, output_format, crop_mode, {"timings": {}}
+            )
+        except PhotoProcessingError as e:
+            skipped[name] = str(e)
+    return inputs, skipped
+
+
+def _predict(session, image, runs: int):
+    """Maskeyi ve predict() sürelerini (saniye) döndürür; ilk çağrı ısınma içindir."""
+    mask = session.predict(image)[0]
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.predict(image)
+        samples.append(time.perf_counter() - start)
+    return np.asarray(mask), samples
+
+
+def evaluate_model(model_name: str, images: Dict[str, bytes], runs: int, edge_width: int,
+                   output_format: str, crop_mode: Optional[str]) -> dict:
+    from app.ai.artifacts import model_store
+
+    inputs, skipped = matting_inputs(model_name, images, output_format, crop_mode)
+    if not inputs:
+        return {"model": model_name, "error": "no face found in any reference image", "skipped": skipped}
+    try:
+        sessions = {variant: model_store.create_session(model_name, quantized=variant == "int8")
+                    for variant in ("float", "int8")}
+    except Exception as e:
+        return {"model": model_name, "error": str(e)}
+
+    latencies = {variant: [] for variant in sessions}
+    per_image = []
+    for name, image in inputs.items():
+        reference, samples = _predict(sessions["float"], image, runs)
+        latencies["float"].extend(samples)
+        candidate, samples = _predict(sessions["int8"], image, runs)
+        latencies["int8"].extend(samples)
+        per_image.append({
+            "image": name,
+            "input": list(image.size),
+            "iou": round(alpha_iou(reference, candidate), 4),
+            "edge_error": round(edge_error(reference, candidate, edge_width), 4),
+        })
+
+    p50 = {variant: float(np.percentile(samples, 50)) * 1000 for variant, samples in latencies.items()}
+    return {
+        "model": model_name,
+        "images": per_image,
+        "min_iou": min(result["iou"] for result in per_image),
+        "max_edge_error": max(result["edge_error"] for result in per_image),
+        "float_p50_ms": round(p50["float"], 1),
+        "int8_p50_ms": round(p50["int8"], 1),
+        "speedup": round(p50["float"] / p50["int8"], 2),
+        "skipped": skipped,
+    }
+
+
+def verdict(result: dict, min_iou: float, max_edge_error: float) -> Optional[str]:
+    """INT8 kullanılmamalıysa nedenini döndürür."""
+    if "error" in result:
+        return "unavailable"
+    if result["min_iou"] < min_iou:
+        return f"iou {result['min_iou']} < {min_iou}"
+    if result["max_edge_error"] > max_edge_error:
+        return f"edge error {result['max_edge_error']} > {max_edge_error}"
+    if result["speedup"] <= 1:
+        return "not faster"
+    return None
+
+
+def main():
+    from app.ai.models import MATTING_MODELS
+    from app.ai.processing import CROP_MODES, PRESET_SIZES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default=",".join(MATTING_MODELS), help="virgülle ayrılmış matting modelleri")
+    parser.add_argument("--images", nargs="+", default=[DEFAULT_IMAGE], help="referans görüntüler veya dizinler")
+    parser.add_argument("--format", choices=[name for name, size in PRESET_SIZES.items() if size],
+                        default="passport_tr", help="matting bölgesinin hesaplandığı çıktı formatı")
+    parser.add_argument("--crop-mode", choices=sorted(CROP_MODES), default=None)
+    parser.add_argument("--runs", type=int, default=5, help="görüntü başına gecikme ölçümü")
+    parser.add_argument("--edge-width", type=int, default=EDGE_WIDTH)
+    parser.add_argument("--min-iou", type=float, default=0.97)
+    parser.add_argument("--max-edge-error", type=float, default=0.08)
+    parser.add_argument("--json", default=None, help="raporu bu dosyaya da yaz")
+    args = parser.parse_args()
+
+    models = [name.strip() for name in args.models.split(",") if name.strip()]
+    unknown = [name for name in models if name not in MATTING_MODELS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}. Allowed: {', '.join(MATTING_MODELS)}")
+    images = load_images(args.images)
+    if not images:
+        parser.error("no reference images found")
+
+    results, accepted = [], []
+    for model_name in models:
+        result = evaluate_model(model_name, images, args.runs, args.edge_width, args.format, args.crop_mode)
+        result["rejected"] = verdict(result, args.min_iou, args.max_edge_error)
+        results.append(result)
+        for name, reason in result.get("skipped", {}).items():
+            print(f"{model_name:<18} skipped {name}: {reason}")
+        if "error" in result:
+            print(f"{model_name:<18} unavailable: {result['error']}")
+            continue
+        print(f"{model_name:<18} iou>={result['min_iou']:.4f} edge<={result['max_edge_error']:.4f} "
+              f"float={result['float_p50_ms']}ms int8={result['int8_p50_ms']}ms x{result['speedup']} "
+              f"-> {'use INT8' if result['rejected'] is None else 'keep float (' + result['rejected'] + ')'}")
+        if result["rejected"] is None:
+            accepted.append(model_name)
+
+    print(f"\n{len(images)} reference image(s); recommended setting:\n  MATTING_QUANTIZED={','.join(accepted)}")
+    if args.json:
+        write_json(args.json, {"images": list(images), "format": args.format, "crop_mode": args.crop_mode,
+                               "min_iou": args.min_iou,
+                               "max_edge_error": args.max_edge_error, "results": results,
+                               "recommended": accepted})
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
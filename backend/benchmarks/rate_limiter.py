@@ -0,0 +1,92 @@
+"""
+Rate limiter mikrobenchmark'ı: farklı IP sayısının kontrol maliyetini
+değiştirmediğini gösterir.
+
+Kullanım (backend klasöründen):
+    python -m benchmarks.rate_limiter --keys 2000000
+    python -m benchmarks.rate_limiter --backend sqlite --keys 100000
+    python -m benchmarks.rate_limiter --backend redis --redis-url redis://localhost:6379 --keys 100000
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app.core.rate_limiter import RateLimiter
+from app.core.rate_limit_backends import BACKEND_KINDS, create_backend
+
+
+def ip_for(index: int) -> str:
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}.{index >> 24}"
+
+
+def fill(limiter: RateLimiter, start: int, stop: int, now: float):
+    for index in range(start, stop):
+        limiter.hit(ip_for(index), now)
+
+
+def measure(limiter: RateLimiter, start: int, count: int, now: float) -> float:
+    """count farklı yeni IP için hit() çağrısının ortalama süresi (mikrosaniye)."""
+    begin = time.perf_counter()
+    for index in range(start, start + count):
+        limiter.hit(ip_for(index), now)
+    return (time.perf_counter() - begin) / count * 1e6
+
+
+def measure_repeat(limiter: RateLimiter, keys: int, count: int, now: float) -> float:
+    """Zaten izlenen IP'ler üzerinde hit() çağrısının ortalama süresi (mikrosaniye)."""
+    step = max(1, keys // count)
+    addresses = [ip_for(index) for index in range(0, keys, step)][:count]
+    begin = time.perf_counter()
+    for address in addresses:
+        limiter.hit(address, now)
+    return (time.perf_counter() - begin) / len(addresses) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="eklenecek farklı IP sayısı")
+    parser.add_argument("--sample", type=int, default=20_000, help="her ölçüm noktasındaki çağrı sayısı")
+    parser.add_argument("--memory", action="store_true", help="anahtar başına belleği de ölç (yavaşlatır)")
+    parser.add_argument("--backend", choices=sorted(BACKEND_KINDS), default="memory")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"))
+    args = parser.parse_args()
+
+    if args.memory:
+        tracemalloc.start()
+    gc.disable()
+    directory = tempfile.mkdtemp(prefix="ratelimit-bench-")
+    limiter = RateLimiter(backend=create_backend(
+        args.backend, sqlite_path=os.path.join(directory, "rate_limits.sqlite3"), redis_url=args.redis_url
+    ))
+    now = time.time()
+    checkpoints = sorted({min(args.keys, 10 ** exponent) for exponent in range(3, 10)} | {args.keys})
+
+    print(f"backend: {args.backend}")
+    print(f"{'tracked keys':>14} {'new key µs':>11} {'known key µs':>13}")
+    inserted = 0
+    for checkpoint in checkpoints:
+        # Ölçüm noktasına kadar doldur, son sample kadar yeni IP'yi ölçerek ekle
+        measured_from = max(inserted, checkpoint - args.sample)
+        fill(limiter, inserted, measured_from, now)
+        new_cost = measure(limiter, measured_from, checkpoint - measured_from, now)
+        inserted = checkpoint
+        known_cost = measure_repeat(limiter, inserted, args.sample, now)
+        print(f"{inserted:>14,} {new_cost:>11.2f} {known_cost:>13.2f}")
+
+    if args.memory:
+        current, _ = tracemalloc.get_traced_memory()
+        print(f"\nmemory: {current / 1024 / 1024:.1f} MiB ({current / len(limiter):.0f} bytes/key)")
+
+    # Tüm anahtarlar boşta kaldıktan sonra arka plan temizliği
+    begin = time.perf_counter()
+    evicted = limiter.sweep(now + limiter.idle_seconds + 1)
+    elapsed = time.perf_counter() - begin
+    print(f"sweep: evicted {evicted:,} entries in {elapsed:.2f}s ({elapsed / max(evicted, 1) * 1e6:.2f} µs/entry), {len(limiter)} keys left")
+    gc.enable()
+
+
+if __name__ == "__main__":
+    main()
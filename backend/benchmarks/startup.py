@@ -0,0 +1,141 @@
+"""
+Başlangıç maliyetinin ölçümü: import süresi ve ilk isteğe kadar geçen süre.
+
+- import: `import app.main` ayrı bir process'te --runs kez ölçülür; ağır
+  AI modüllerinden (cv2, mediapipe, rembg, onnxruntime) hangilerinin import
+  sırasında yüklendiği de raporlanır (ertelenmiş yüklemede hiçbiri olmamalı).
+- sunucu: uvicorn başlatılır; process başladıktan sonra ilk başarılı /health
+  yanıtına (time-to-first-request) ve /ready'nin 'ready' (veya 'failed')
+  olmasına kadar geçen süreler, ardından ilk ve ikinci /preview isteğinin
+  gecikmesi ölçülür.
+
+Kullanım (backend klasöründen):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --no-server --json benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks.load import PREVIEW_PATH, free_port, start_server, unique_payload
+from benchmarks.pipeline import BENCHMARK_DIR, DEFAULT_IMAGE
+
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+HEAVY_MODULES = ("cv2", "mediapipe", "rembg", "onnxruntime")
+
+_IMPORT_SNIPPET = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(runs: int) -> dict:
+    """`import app.main`'i her seferinde taze bir process'te ölçer."""
+    samples, heavy = [], set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"] * 1000)
+        heavy.update(result["heavy"])
+    return {
+        "runs": runs,
+        "p50_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "heavy_modules_loaded": sorted(heavy),
+    }
+
+
+def _poll(url: str, process: subprocess.Popen, started: float, timeout: float, done) -> Optional[dict]:
+    """done(response) doğru olana kadar url'yi yoklar; geçen süreyi ve son yanıtı döndürür."""
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            response = httpx.get(url, timeout=1)
+            if done(response):
+                return {"ms": round((time.perf_counter() - started) * 1000, 1), "body": response.json()}
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_server(image: bytes, timeout: float) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = start_server(None, 0.0, port)
+    try:
+        health = _poll(f"{base_url}/health", server, started, timeout, lambda r: r.status_code == 200)
+        ready = _poll(f"{base_url}/ready", server, started, timeout,
+                      lambda r: r.json().get("status") in ("ready", "failed"))
+        report = {
+            "time_to_first_request_ms": health and health["ms"],
+            "time_to_ready_ms": ready and ready["ms"],
+            "ready_status": ready and ready["body"]["status"],
+            "workers": ready and ready["body"]["workers"],
+            "preview": [],
+        }
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            for attempt in ("first", "second"):
+                start = time.perf_counter()
+                response = client.post(PREVIEW_PATH, files={"file": ("startup.jpg", unique_payload(image), "image/jpeg")})
+                report["preview"].append({
+                    "request": attempt,
+                    "status": response.status_code,
+                    "ms": round((time.perf_counter() - start) * 1000, 1),
+                })
+        return report
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="import ölçümü tekrar sayısı")
+    parser.add_argument("--server", action=argparse.BooleanOptionalAction, default=True,
+                        help="sunucuyu başlatıp ilk isteğe kadar geçen süreyi de ölç")
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--json", default=None, help="raporu bu dosyaya da yaz")
+    args = parser.parse_args()
+
+    report = {"import": measure_import(args.runs)}
+    imports = report["import"]
+    print(f"import app.main: p50={imports['p50_ms']}ms min={imports['min_ms']}ms max={imports['max_ms']}ms "
+          f"heavy modules loaded: {', '.join(imports['heavy_modules_loaded']) or 'none'}")
+
+    if args.server:
+        with open(args.image, "rb") as f:
+            image = f.read()
+        server = report["server"] = measure_server(image, args.timeout)
+        print(f"time to first request (/health): {server['time_to_first_request_ms']}ms")
+        print(f"time to ready (/ready): {server['time_to_ready_ms']}ms ({server['ready_status']})")
+        for worker in server["workers"] or []:
+            print(f"  worker {worker['pid']}: {worker['state']} timings={worker.get('timings_ms')} "
+                  f"imports={worker.get('import_ms')}")
+        for preview in server["preview"]:
+            print(f"{preview['request']} /preview: {preview['status']} in {preview['ms']}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Yük testi için AI maliyeti stub'lanmış uygulama.
+
+app.main'deki uygulamanın aynısıdır; yalnızca /preview'ın çağırdığı
+process_photo, modelin yerine ayarlanabilir süreli bir stub ile
+değiştirilir. Böylece HTTP, doğrulama, dosya işlemleri ve executor
+zamanlaması model maliyetinden ayrı ölçülür.
+
+    PHOTOID_STUB=sleep  worker'ı CPU harcamadan bekletir (I/O benzeri)
+    PHOTOID_STUB=cpu    worker'ı o süre boyunca meşgul eder (model benzeri)
+    PHOTOID_STUB_SECONDS=0.25
+
+Worker'lar modelleri ısıtmaz (MODEL_WARM_UP=false); stub'lı ölçüme model
+yükleme veya indirme denemesi karışmaz.
+
+Çalıştırma (backend klasöründen):
+    PHOTOID_STUB=cpu uvicorn benchmarks.stub_app:app
+"""
+import os
+import time
+
+# config import edilmeden önce; spawn edilen worker'lar ortamı miras alır
+os.environ["MODEL_WARM_UP"] = "false"
+
+from PIL import Image
+
+from app.api.v1.endpoints import photos
+from app.main import app
+
+STUB_KINDS = ("sleep", "cpu")
+
+
+def _busy(seconds: float):
+    # process_time yalnızca bu thread/process'in CPU süresini sayar; GIL'i modelin yaptığı gibi tutar
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+
+
+def stub_process_photo(input_image, output_size=(600, 600), model_name=None, return_metadata=False,
+                       output_format=None, crop_mode=None):
+    """process_photo ile aynı imza ve dönüş; görüntü işlemek yerine PHOTOID_STUB_SECONDS kadar bekler."""
+    kind = os.getenv("PHOTOID_STUB", "sleep")
+    seconds = float(os.getenv("PHOTOID_STUB_SECONDS", "0.25"))
+    start = time.perf_counter()
+    if kind == "cpu":
+        _busy(seconds)
+    else:
+        time.sleep(seconds)
+    image = Image.new("RGB", tuple(output_size), (255, 255, 255))
+    metadata = {
+        "model": model_name or "stub",
+        "crop_mode": crop_mode or "face",
+        "timings": {"background_removal": time.perf_counter() - start},
+        "resize_plan": {"output": list(output_size)},
+    }
+    return (image, metadata) if return_metadata else image
+
+
+if os.getenv("PHOTOID_STUB", "sleep") not in STUB_KINDS:
+    raise ValueError(f"Unknown PHOTOID_STUB '{os.getenv('PHOTOID_STUB')}'. Allowed: {', '.join(STUB_KINDS)}")
+
+photos.process_photo = stub_process_photo
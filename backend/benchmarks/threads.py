@@ -0,0 +1,186 @@
+"""
+CPU thread bütçesi taraması: çekirdeklerin işleme worker'ları ile worker
+başına thread'ler (ONNX intra-op, OpenCV, BLAS) arasında nasıl bölüneceği.
+
+Her bölüşüm (workers x threads = çekirdek sayısı) için config'in
+okuduğu ortam değişkenleri (PROCESSING_WORKERS, WORKER_THREADS,
+OMP_NUM_THREADS...) ayarlanır ve taze bir process havuzu başlatılır;
+worker'lar bütçeyi uygulayıp modeli ısıttıktan sonra aynı görüntü
+kapalı döngüde (her worker'da bir iş) --jobs kez işlenir. Gecikme işin
+havuza gönderilmesinden tamamlanmasına kadar ölçülür. Karşılaştırma için
+ayarlanmamış durum da ölçülür: her worker tüm çekirdekleri kullanır.
+
+En yüksek throughput'u veren bölüşüm env.example biçiminde önerilir.
+Birden fazla uvicorn worker'ı kullanılacaksa --web-concurrency ile
+çekirdekler önce onlara bölünür; tarama tek bir API process'inin payını
+ölçer.
+
+Kullanım (backend klasöründen):
+    python -m benchmarks.threads
+    python -m benchmarks.threads --cores 8 --jobs 64 --matting stub --json benchmarks/results/threads.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import BLAS_THREAD_ENV_VARS, available_cores
+from benchmarks.pipeline import DEFAULT_IMAGE, MATTING_MODES, _run_once, _setup_matting, make_input, parse_resolution
+
+
+def _init_worker(matting: str):
+    from app.ai.loader import apply_thread_budget
+
+    apply_thread_budget()
+    _setup_matting(matting)
+
+
+def _job(input_bytes: bytes, output_size, output_format: str) -> bool:
+    return _run_once(input_bytes, output_size, output_format, None)[1]
+
+
+def _worker_matting() -> str:
+    from app.ai import processing
+
+    return "stub" if processing.session_registry.get(None) is None else "real"
+
+
+def candidate_splits(cores: int) -> List[Tuple[int, int]]:
+    """Çekirdekleri tam dolduran (workers, threads) bölüşümleri."""
+    return [(cores // threads, threads) for threads in range(1, cores + 1) if cores % threads == 0]
+
+
+@contextmanager
+def _budget_env(cores: int, web_concurrency: int, workers: int, threads: int):
+    """Worker process'lerinin miras aldığı bütçe değişkenlerini geçici olarak ayarlar."""
+    values = {
+        "CPU_CORES": str(cores * web_concurrency),
+        "WEB_CONCURRENCY": str(web_concurrency),
+        "PROCESSING_WORKERS": str(workers),
+        "WORKER_THREADS": str(threads),
+        **{name: str(threads) for name in BLAS_THREAD_ENV_VARS},
+    }
+    original = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_split(input_bytes: bytes, output_size, output_format: str, cores: int, web_concurrency: int,
+              workers: int, threads: int, jobs: int, matting: str) -> dict:
+    latencies = []
+    succeeded = 0
+    context = multiprocessing.get_context("spawn")
+    with _budget_env(cores, web_concurrency, workers, threads):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(matting,)) as pool:
+            # Her worker'ı başlat ve bir kere ısıt
+            for future in [pool.submit(_job, input_bytes, output_size, output_format) for _ in range(workers)]:
+                future.result()
+            used_matting = pool.submit(_worker_matting).result()
+
+            started = time.perf_counter()
+            pending, submitted = {}, 0
+            while submitted < jobs or pending:
+                while submitted < jobs and len(pending) < workers:
+                    pending[pool.submit(_job, input_bytes, output_size, output_format)] = time.perf_counter()
+                    submitted += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    latencies.append(time.perf_counter() - pending.pop(future))
+                    succeeded += future.result()
+            elapsed = time.perf_counter() - started
+
+    values = np.array(latencies) * 1000
+    return {
+        "workers": workers,
+        "threads": threads,
+        "total_threads": workers * threads,
+        "matting": used_matting,
+        "succeeded": succeeded,
+        "jobs": jobs,
+        "throughput_per_s": round(jobs / elapsed, 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+    }
+
+
+def recommend(results: List[dict]) -> Optional[dict]:
+    """Tüm işleri başarılı olan, çekirdekleri aşmayan bölüşümler arasında en yüksek throughput'lu olan."""
+    candidates = [r for r in results if r["succeeded"] == r["jobs"] and not r.get("untuned")]
+    return max(candidates, key=lambda r: (r["throughput_per_s"], -r["p99_ms"]), default=None)
+
+
+def print_result(result: dict):
+    label = "untuned" if result.get("untuned") else f"{result['workers']}x{result['threads']}"
+    print(f"{label:>8}  workers={result['workers']:<3} threads={result['threads']:<3} "
+          f"throughput={result['throughput_per_s']:.2f}/s p50={result['p50_ms']}ms "
+          f"p95={result['p95_ms']}ms p99={result['p99_ms']}ms ok={result['succeeded']}/{result['jobs']} "
+          f"({result['matting']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cores", type=int, default=0, help="API process'inin payı; 0 = atanmış çekirdekler / --web-concurrency")
+    parser.add_argument("--web-concurrency", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=32, help="bölüşüm başına işlenecek görüntü sayısı")
+    parser.add_argument("--resolution", type=parse_resolution, default=(1200, 1500))
+    parser.add_argument("--format", default="passport_tr")
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--matting", choices=MATTING_MODES, default="auto")
+    parser.add_argument("--untuned", action=argparse.BooleanOptionalAction, default=True,
+                        help="her worker'ın tüm çekirdekleri kullandığı durumu da ölç")
+    parser.add_argument("--json", default=None, help="raporu bu dosyaya da yaz")
+    args = parser.parse_args()
+
+    from app.ai.processing import PRESET_SIZES
+
+    web_concurrency = max(1, args.web_concurrency)
+    cores = args.cores or max(1, available_cores() // web_concurrency)
+    input_bytes = make_input(args.resolution, args.image)
+    output_size = PRESET_SIZES[args.format]
+
+    splits = [(workers, threads, False) for workers, threads in candidate_splits(cores)]
+    if args.untuned and cores > 1:
+        splits.append((cores, cores, True))
+
+    print(f"{cores} cores per API process, {web_concurrency} API process(es), {args.jobs} jobs per split")
+    results = []
+    for workers, threads, untuned in splits:
+        result = run_split(input_bytes, output_size, args.format, cores, web_concurrency,
+                           workers, threads, args.jobs, args.matting)
+        if untuned:
+            result["untuned"] = True
+        results.append(result)
+        print_result(result)
+
+    best = recommend(results)
+    if best:
+        print(f"\nrecommended split: {best['workers']} workers x {best['threads']} threads")
+        print(f"  CPU_CORES={cores * web_concurrency}\n  WEB_CONCURRENCY={web_concurrency}")
+        print(f"  PROCESSING_WORKERS={best['workers']}\n  WORKER_THREADS={best['threads']}")
+    else:
+        print("\nno split completed all jobs")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cores": cores, "web_concurrency": web_concurrency, "results": results,
+                       "recommended": best}, f, indent=2)
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import pytest
+
+# Testlerde mock'lanan process_photo pickle edilemez; işleri thread havuzunda çalıştır
+os.environ.setdefault("PROCESSING_EXECUTOR", "thread")
+# Testler birbirinin önbelleğe aldığı sonuçları görmemeli; önbelleği test içinde açıkça etkinleştir
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+# Rate limit sayaçları test çalıştırmaları arasında diskte kalmamalı
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+
+# Thread havuzunda ağır modüller lifespan'da ana thread'de import edilir (bkz. ModelLoader.start);
+# TestClient lifespan'ı çalıştırmadığı için aynısı burada yapılır
+from app.ai.loader import import_heavy_modules
+import_heavy_modules()
+
+from app.core.config import settings
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    """
+    İş kuyruğu, önbellekler ve yüklemeler kaynak ağacına değil geçici
+    dizinlere yazılır. Test modülleri app.main'i toplanırken import ettiği
+    için (yollar import anında okunur) bu, toplamadan önce yapılır;
+    alt process'ler için ortam değişkenleri de ayarlanır.
+    """
+    tmp_path_factory = config._tmp_path_factory
+    for name, directory in (("DATA_DIR", "data"), ("UPLOAD_DIR", "uploads")):
+        path = str(tmp_path_factory.mktemp(directory))
+        os.environ[name] = path
+        setattr(settings, name, path)
@@ -0,0 +1,95 @@
+import os
+import shutil
+import numpy as np
+import onnxruntime
+import pytest
+from onnxruntime import quantization
+from unittest.mock import patch
+
+from app.ai import artifacts
+from app.ai.artifacts import ModelArtifactStore, file_checksum
+from app.ai.exceptions import ModelArtifactError
+
+# Gerçek ağırlıklar yerine onnxruntime ile gelen küçük bir model kullanılır
+SAMPLE_MODEL = os.path.join(os.path.dirname(onnxruntime.__file__), "datasets", "sigmoid.onnx")
+
+@pytest.fixture
+def model_dir(tmp_path):
+    directory = tmp_path / "models"
+    directory.mkdir()
+    shutil.copy(SAMPLE_MODEL, directory / "u2netp.onnx")
+    return directory
+
+def make_store(model_dir, tmp_path, **kwargs):
+    kwargs.setdefault("checksums", {"u2netp": file_checksum(SAMPLE_MODEL)})
+    return ModelArtifactStore(str(model_dir), str(tmp_path / "cache"), **kwargs)
+
+def test_session_is_loaded_from_local_memory_mapped_copy(model_dir, tmp_path):
+    """Oturumun indirme yapılmadan yerel ağırlıklardan, ORT formatındaki kopyadan oluşturulduğunu doğrular."""
+    store = make_store(model_dir, tmp_path)
+    with patch("rembg.sessions.u2netp.pooch.retrieve") as mock_download:
+        session = store.create_session("u2netp")
+
+    assert not mock_download.called
+    assert session.model_name == "u2netp"
+    assert os.path.isfile(store._ort_path("u2netp"))
+    output = session.inner_session.run(None, {"x": np.zeros((3, 4, 5), dtype=np.float32)})[0]
+    assert np.allclose(output, 0.5)
+    if os.path.exists("/proc/self/maps"):
+        with open("/proc/self/maps") as f:
+            assert store._ort_path("u2netp") in f.read()
+
+def test_checksum_is_verified_once(model_dir, tmp_path):
+    """Doğrulanan dosyanın sonraki process'lerde (yeni depo örneği) tekrar hash'lenmediğini doğrular."""
+    make_store(model_dir, tmp_path).resolve("u2netp")
+    with patch.object(artifacts, "file_checksum", wraps=file_checksum) as mock_checksum:
+        make_store(model_dir, tmp_path).resolve("u2netp")
+    assert not mock_checksum.called
+
+    # Dosya değişirse yeniden doğrulanır
+    with open(model_dir / "u2netp.onnx", "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ModelArtifactError, match="Checksum mismatch"):
+        make_store(model_dir, tmp_path).resolve("u2netp")
+
+def test_checksum_mismatch_is_rejected(model_dir, tmp_path):
+    """Checksum'ı tutmayan ağırlıklarla oturum oluşturulmadığını doğrular."""
+    store = make_store(model_dir, tmp_path, checksums={"u2netp": "md5:" + "0" * 32})
+    with pytest.raises(ModelArtifactError, match="Checksum mismatch"):
+        store.create_session("u2netp")
+
+def test_missing_weights_fail_without_download(tmp_path):
+    """MODEL_DOWNLOAD kapalıyken eksik ağırlıkların ağa çıkmadan hata verdiğini doğrular."""
+    store = make_store(tmp_path / "empty", tmp_path, allow_download=False)
+    with patch("rembg.sessions.u2netp.pooch.retrieve") as mock_download:
+        with pytest.raises(ModelArtifactError, match="MODEL_DOWNLOAD is disabled"):
+            store.resolve("u2netp")
+    assert not mock_download.called
+
+def test_quantized_session_uses_cached_int8_copy(model_dir, tmp_path):
+    """INT8 kopyasının bir kere üretilip önbellekten açıldığını doğrular."""
+    store = make_store(model_dir, tmp_path)
+    with patch.object(quantization, "quantize_dynamic", wraps=quantization.quantize_dynamic) as mock_quantize:
+        session = store.create_session("u2netp", quantized=True)
+        store.create_session("u2netp", quantized=True)
+
+    mock_quantize.assert_called_once()
+    assert os.path.isfile(store._quantized_path("u2netp"))
+    assert os.path.isfile(store._ort_path("u2netp", quantized=True))
+    output = session.inner_session.run(None, {"x": np.zeros((3, 4, 5), dtype=np.float32)})[0]
+    assert np.allclose(output, 0.5)
+
+def test_quantization_without_onnx_is_reported(model_dir, tmp_path):
+    """onnx paketi yoksa INT8 kopyasının anlaşılır bir hatayla reddedildiğini doğrular."""
+    store = make_store(model_dir, tmp_path)
+    with patch.dict("sys.modules", {"onnxruntime.quantization": None}):
+        with pytest.raises(ModelArtifactError, match="needs the 'onnx' package"):
+            store.create_session("u2netp", quantized=True)
+
+def test_falls_back_to_onnx_when_memory_map_disabled(model_dir, tmp_path):
+    """memory_map kapalıyken .onnx dosyasının doğrudan açıldığını doğrular."""
+    store = make_store(model_dir, tmp_path, memory_map=False)
+    session = store.create_session("u2netp")
+
+    assert not os.path.exists(store._ort_path("u2netp"))
+    assert session.inner_session.get_inputs()[0].name == "x"
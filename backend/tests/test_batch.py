@@ -0,0 +1,125 @@
+import asyncio
+import io
+import json
+import os
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.api.v1.endpoints import photos
+from app.core.config import settings
+from app.ai.exceptions import MultipleFacesError
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def fake_process_photo_batch(input_images, output_size, model_name=None, output_format=None, crop_mode=None, batch_size=None):
+    # İkinci fotoğrafta birden fazla yüz varmış gibi davran
+    results = [Image.new("RGB", output_size, (255, 255, 255)) for _ in input_images]
+    if len(results) > 1:
+        results[1] = MultipleFacesError("Multiple faces detected in the photo.")
+    return results, {"model": "u2net", "timings": {"background_removal": 0.1}, "batches": 1}
+
+def test_batch_reports_errors_per_item():
+    """Hatalı fotoğrafların tüm batch'i düşürmeden manifest'te raporlandığını doğrular."""
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        valid = f.read()
+    files = [
+        ("files", ("a.jpg", valid, "image/jpeg")),
+        ("files", ("b.jpg", valid, "image/jpeg")),
+        ("files", ("c.txt", b"hello", "text/plain")),
+        ("files", ("d.jpg", valid, "image/jpeg")),
+    ]
+    with patch('app.api.v1.endpoints.photos.process_photo_batch', side_effect=fake_process_photo_batch) as mock_batch:
+        response = client.post("/api/v1/photos/batch", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert mock_batch.call_count == 1
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    manifest = json.loads(archive.read("manifest.json"))
+    statuses = [item["status"] for item in manifest["items"]]
+    assert statuses == ["ok", "error", "error", "ok"]
+    assert manifest["items"][1]["error"] == "MultipleFacesError"
+    assert manifest["items"][2]["status_code"] == 415
+    assert manifest["succeeded"] == 2 and manifest["failed"] == 2
+    assert Image.open(io.BytesIO(archive.read(manifest["items"][3]["file"]))).size == (413, 531)
+
+def test_batch_splits_into_configured_chunks():
+    """Dosyaların MATTING_BATCH_SIZE'lık gruplar halinde worker'lara dağıtıldığını doğrular."""
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        valid = f.read()
+    files = [("files", (f"{i}.jpg", valid, "image/jpeg")) for i in range(5)]
+    with patch.object(settings, "MATTING_BATCH_SIZE", 2), \
+         patch('app.api.v1.endpoints.photos.process_photo_batch', side_effect=fake_process_photo_batch) as mock_batch:
+        response = client.post("/api/v1/photos/batch", files=files)
+
+    assert response.status_code == 200
+    assert [len(call.kwargs["input_images"]) for call in mock_batch.call_args_list] == [2, 2, 1]
+
+def test_batch_reports_failed_chunk_per_item():
+    """Çöken bir grubun diğer grupları düşürmeden öğe başına hata olarak raporlandığını doğrular."""
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        valid = f.read()
+    files = [("files", (f"{i}.jpg", valid, "image/jpeg")) for i in range(3)]
+
+    def crash_second_chunk(input_images, **kwargs):
+        if len(input_images) == 1:
+            raise RuntimeError("worker crashed")
+        return [Image.new("RGB", kwargs["output_size"], (255, 255, 255)) for _ in input_images], \
+            {"model": "u2net", "timings": {"background_removal": 0.1}, "batches": 1}
+
+    with patch.object(settings, "MATTING_BATCH_SIZE", 2), \
+         patch('app.api.v1.endpoints.photos.process_photo_batch', side_effect=crash_second_chunk):
+        response = client.post("/api/v1/photos/batch", files=files)
+
+    assert response.status_code == 200
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(response.content)).read("manifest.json"))
+    assert [item["status"] for item in manifest["items"]] == ["ok", "ok", "error"]
+    assert manifest["items"][2]["status_code"] == 500
+    assert manifest["items"][2]["error"] == "RuntimeError"
+
+def test_batch_validates_uploads_off_the_event_loop():
+    """Yüklemelerin okunup doğrulanmasının event loop'u bloklamadan thread havuzunda yapıldığını doğrular."""
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        valid = f.read()
+    files = [("files", (f"{i}.jpg", valid, "image/jpeg")) for i in range(2)]
+    validate_image_file = photos.validate_image_file
+    on_loop = []
+
+    def validate(upload):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return validate_image_file(upload)
+
+    with patch.object(photos, "validate_image_file", side_effect=validate), \
+         patch('app.api.v1.endpoints.photos.process_photo_batch', side_effect=fake_process_photo_batch):
+        response = client.post("/api/v1/photos/batch", files=files)
+
+    assert response.status_code == 200
+    assert on_loop == [False, False]
+
+def test_batch_rejects_too_many_files():
+    """BATCH_MAX_FILES'dan fazla dosyanın reddedildiğini doğrular."""
+    files = [("files", (f"{i}.jpg", b"x", "image/jpeg")) for i in range(3)]
+    with patch.object(settings, "BATCH_MAX_FILES", 2):
+        response = client.post("/api/v1/photos/batch", files=files)
+
+    assert response.status_code == 413
@@ -0,0 +1,210 @@
+import io
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.services.cache import ResultCache, cutout_cache, make_cache_key, result_cache
+from app.services.janitor import FileJanitor
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def make_cache(tmp_path, **overrides):
+    options = dict(memory_items=2, memory_bytes=1024, disk_bytes=4096, ttl_seconds=60)
+    options.update(overrides)
+    return ResultCache(directory=str(tmp_path / "cache"), **options)
+
+def test_cache_key_depends_on_params():
+    """Aynı byte'lar farklı çıktı parametreleriyle farklı anahtar üretmeli."""
+    assert make_cache_key(b"photo", "passport_eu") == make_cache_key(b"photo", "passport_eu")
+    assert make_cache_key(b"photo", "passport_eu") != make_cache_key(b"photo", "visa_us")
+    assert make_cache_key(b"photo", "custom", (100, 200)) != make_cache_key(b"photo", "custom", (200, 100))
+
+def test_memory_lru_evicts_to_disk_tier(tmp_path):
+    """Bellekten düşen kaydın disk katmanından okunduğunu doğrular."""
+    cache = make_cache(tmp_path)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.put("c", b"3")  # "a" bellekten düşer
+
+    assert cache.get("a") == b"1"
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_entries"] == 2
+
+def test_disk_tier_is_size_capped(tmp_path):
+    """Disk katmanının boyut sınırını aşınca en eski kaydı sildiğini doğrular."""
+    cache = make_cache(tmp_path, memory_items=1, disk_bytes=10)
+    cache.put("old", b"x" * 6)
+    cache.put("new", b"y" * 6)
+
+    assert cache.stats()["disk_bytes"] == 6
+    assert not os.path.exists(tmp_path / "cache" / "old.bin")
+    assert cache.get("old") is None
+
+def test_entries_expire_after_ttl(tmp_path):
+    """TTL dolan kayıtların iki katmanda da ıska sayıldığını doğrular."""
+    cache = make_cache(tmp_path, ttl_seconds=10)
+    with patch("app.services.cache.time.time", return_value=1000.0):
+        cache.put("a", b"1")
+    with patch("app.services.cache.time.time", return_value=1011.0):
+        assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["expired"] == 2
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Yeni bir önbellek örneğinin diskteki kayıtları bulduğunu doğrular."""
+    make_cache(tmp_path).put("a", b"1")
+    assert make_cache(tmp_path).get("a") == b"1"
+
+def test_preview_serves_repeated_upload_from_cache(tmp_path):
+    """Aynı fotoğrafın ikinci yüklemesinde process_photo'nun tekrar çağrılmadığını doğrular."""
+    valid_image_path = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+    metadata = {"model": "u2net", "timings": {"background_removal": 0.1}, "resize_plan": {}}
+
+    with patch.object(settings, "RESULT_CACHE_ENABLED", True), \
+         patch('app.api.v1.endpoints.photos.result_cache', make_cache(tmp_path, memory_bytes=1 << 20, disk_bytes=1 << 20)), \
+         patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)) as mock_process:
+        responses = []
+        for _ in range(2):
+            with open(valid_image_path, "rb") as f:
+                responses.append(client.post("/api/v1/photos/preview", files={"file": ("test.jpg", f, "image/jpeg")}))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert [r.headers["X-Cache"] for r in responses] == ["MISS", "HIT"]
+    assert responses[0].content == responses[1].content
+    assert mock_process.call_count == 1
+
+def test_preview_reuses_cutout_for_another_format(tmp_path):
+    """Aynı fotoğrafın başka bir formatında matting'in tekrarlanmadığını doğrular."""
+    from app.ai.processing import Cutout
+
+    valid_image_path = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+    cutout = Cutout(Image.new("RGBA", (600, 700), (0, 0, 0, 255)), (0, 0, 600, 700), 1.0,
+                    (250, 250, 100, 120), (600, 700), "face", "u2net")
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+    metadata = {"model": "u2net", "timings": {"background_removal": 0.1}, "resize_plan": {}, "cutout": cutout}
+
+    with patch.object(settings, "RESULT_CACHE_ENABLED", True), \
+         patch('app.api.v1.endpoints.photos.result_cache', make_cache(tmp_path / "results", memory_bytes=1 << 20, disk_bytes=1 << 20)), \
+         patch('app.api.v1.endpoints.photos.cutout_cache', make_cache(tmp_path / "cutouts", memory_bytes=1 << 22, disk_bytes=1 << 22)), \
+         patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)) as mock_process:
+        responses = []
+        for output_format in ("passport_eu", "visa_us"):
+            with open(valid_image_path, "rb") as f:
+                responses.append(client.post(
+                    "/api/v1/photos/preview",
+                    params={"output_format": output_format},
+                    files={"file": ("test.jpg", f, "image/jpeg")}
+                ))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert [r.headers["X-Cache"] for r in responses] == ["MISS", "CUTOUT"]
+    assert Image.open(io.BytesIO(responses[1].content)).size == (600, 600)
+    assert mock_process.call_count == 1
+
+def test_preview_widens_cutout_when_switching_formats(tmp_path):
+    """İlk önizlemenin yalnızca istenen formatı, format değişince ise tüm hazır formatları karşılayan kesit istediğini doğrular."""
+    from app.ai.processing import Cutout, preset_targets
+
+    valid_image_path = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+    # Yalnızca passport_eu'yu karşılayan dar bir kesit
+    narrow = Cutout(Image.new("RGBA", (300, 380), (0, 0, 0, 255)), (100, 50, 400, 430), 1.0,
+                    (200, 150, 100, 120), (600, 700), "face", "u2net")
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+
+    def fake_process_photo(**kwargs):
+        return result, {"model": "u2net", "timings": {"background_removal": 0.1}, "resize_plan": {}, "cutout": narrow}
+
+    with patch.object(settings, "RESULT_CACHE_ENABLED", True), \
+         patch('app.api.v1.endpoints.photos.result_cache', make_cache(tmp_path / "results", memory_bytes=1 << 20, disk_bytes=1 << 20)), \
+         patch('app.api.v1.endpoints.photos.cutout_cache', make_cache(tmp_path / "cutouts", memory_bytes=1 << 22, disk_bytes=1 << 22)), \
+         patch('app.api.v1.endpoints.photos.process_photo', side_effect=fake_process_photo) as mock_process:
+        for output_format in ("passport_eu", "visa_us"):
+            with open(valid_image_path, "rb") as f:
+                response = client.post(
+                    "/api/v1/photos/preview",
+                    params={"output_format": output_format},
+                    files={"file": ("test.jpg", f, "image/jpeg")}
+                )
+            assert response.status_code == 200
+
+    assert not narrow.supports((600, 600), "visa_us")
+    assert [call.kwargs["extra_targets"] for call in mock_process.call_args_list] == [(), preset_targets()]
+
+def test_disk_cap_is_shared_between_workers(tmp_path):
+    """Aynı dizini kullanan önbelleklerin (ör. farklı worker'lar) disk sınırını birlikte aşmadığını doğrular."""
+    workers = [make_cache(tmp_path, memory_items=1, disk_bytes=10) for _ in range(3)]
+    for index, worker in enumerate(workers):
+        worker.put(f"key-{index}", b"1234")
+
+    directory = tmp_path / "cache"
+    files = [name for name in os.listdir(directory) if name.endswith(".bin")]
+    assert files
+    assert sum(os.path.getsize(directory / name) for name in files) <= 10
+    assert workers[-1].stats()["disk_bytes"] <= 10
+
+def test_janitor_deletions_update_disk_index(tmp_path):
+    """Janitor'ın sildiği kayıtların önbellek indeksinden ve disk boyutundan düştüğünü doğrular."""
+    cache = make_cache(tmp_path, memory_items=1, ttl_seconds=600)
+    janitor = FileJanitor(batch_size=100, interval=1)
+    janitor.watch(cache.directory, 60, on_delete=cache.forget)
+    cache.on_write = janitor.track
+    cache.put("a", b"1234")
+    cache.put("b", b"56")
+    assert cache.stats()["disk_bytes"] == 6
+
+    assert janitor.collect(now=time.time() + 61) == 2
+    assert os.listdir(cache.directory) == []
+    stats = cache.stats()
+    assert stats["disk_entries"] == 0
+    assert stats["disk_bytes"] == 0
+    assert cache.get("a") is None
+
+def test_disk_io_runs_outside_the_lock(tmp_path):
+    """Disk okuma, yazma, tarama ve silmenin önbellek kilidi tutulmadan yapıldığını doğrular."""
+    cache = make_cache(tmp_path, memory_items=1, disk_bytes=10)
+    lock_held = []
+
+    def tracking(func):
+        def wrapper(*args, **kwargs):
+            lock_held.append((func.__name__, cache._lock.locked()))
+            return func(*args, **kwargs)
+        return wrapper
+
+    with patch("app.services.cache.open", tracking(open), create=True), \
+         patch("app.services.cache.os.listdir", tracking(os.listdir)), \
+         patch("app.services.cache.os.replace", tracking(os.replace)), \
+         patch("app.services.cache.os.remove", tracking(os.remove)):
+        cache.put("a", b"x" * 6)
+        cache.put("b", b"y" * 6)  # "a" diskten tahliye edilir
+        assert cache.get("a") is None
+        cache.put("c", b"z" * 2)  # "b" bellekten düşer
+        assert cache.get("b") == b"y" * 6
+
+    assert {name for name, _ in lock_held} == {"open", "listdir", "replace", "remove"}
+    assert not any(held for _, held in lock_held)
+
+def test_disk_tier_is_not_publicly_served():
+    """Önbellek dosyalarının /uploads altında dışarı açılan dizinde tutulmadığını doğrular."""
+    uploads = os.path.abspath(settings.UPLOAD_DIR)
+    for cache in (result_cache, cutout_cache):
+        directory = os.path.abspath(cache.directory)
+        assert os.path.commonpath([uploads, directory]) != uploads
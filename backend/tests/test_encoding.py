@@ -0,0 +1,73 @@
+import io
+import os
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.ai.encoding import encode_image, resolve_encode_options
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def preview(**params):
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+    metadata = {"model": "u2net", "timings": {"background_removal": 0.1}, "resize_plan": {}}
+    with patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)):
+        with open(VALID_IMAGE_PATH, "rb") as f:
+            return client.post("/api/v1/photos/preview", params=params, files={"file": ("test.jpg", f, "image/jpeg")})
+
+@pytest.mark.parametrize("image_format, media_type, extension, pillow_format", [
+    ("png", "image/png", "png", "PNG"),
+    ("jpeg", "image/jpeg", "jpg", "JPEG"),
+    ("webp", "image/webp", "webp", "WEBP"),
+])
+def test_preview_returns_selected_format(image_format, media_type, extension, pillow_format):
+    """Sonucun istenen formatta, doğru içerik türü ve dosya uzantısıyla döndüğünü doğrular."""
+    response = preview(image_format=image_format)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+    assert response.headers["content-disposition"].endswith(f'processed_passport_eu.{extension}"')
+    image = Image.open(io.BytesIO(response.content))
+    assert image.format == pillow_format
+    assert image.size == (413, 531)
+
+def test_invalid_encode_options_are_rejected():
+    """Bilinmeyen formatın 400, aralık dışı kalite/sıkıştırma değerlerinin 422 ile reddedildiğini doğrular."""
+    assert preview(image_format="gif").status_code == 400
+    assert preview(image_format="jpeg", quality=0).status_code == 422
+    assert preview(compress_level=10).status_code == 422
+
+def test_compression_settings_are_applied():
+    """PNG sıkıştırma seviyesinin ve JPEG kalitesinin çıktıya uygulandığını doğrular."""
+    image = Image.open(VALID_IMAGE_PATH).convert("RGB").resize((300, 375))
+
+    stored = encode_image(image, resolve_encode_options("png", compress_level=0))
+    compressed = encode_image(image, resolve_encode_options("png", compress_level=9))
+    assert len(compressed) < len(stored)
+    assert Image.open(io.BytesIO(stored)).tobytes() == Image.open(io.BytesIO(compressed)).tobytes()
+
+    low = encode_image(image, resolve_encode_options("jpeg", quality=20))
+    high = encode_image(image, resolve_encode_options("jpeg", quality=95))
+    assert len(low) < len(high)
+
+def test_unused_options_do_not_split_the_cache():
+    """Formatın kullanmadığı ayarın yok sayıldığını (aynı çıktı için aynı seçenekler) doğrular."""
+    assert resolve_encode_options("png", quality=50) == resolve_encode_options("png")
+    assert resolve_encode_options("jpeg", compress_level=9) == resolve_encode_options("jpeg")
+    assert resolve_encode_options("jpg") == resolve_encode_options("jpeg")
+    with pytest.raises(ValueError):
+        resolve_encode_options("bmp")
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.ai import executor
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def test_run_in_executor_uses_worker_thread():
+    """İşin event loop thread'inde değil, worker havuzunda çalıştığını doğrular."""
+    loop_thread = threading.get_ident()
+    worker_thread = asyncio.run(executor.run_in_executor(threading.get_ident))
+    assert worker_thread != loop_thread
+
+def test_unknown_executor_kind_rejected():
+    """Geçersiz PROCESSING_EXECUTOR değerinin reddedildiğini doğrular."""
+    with patch.object(settings, "PROCESSING_EXECUTOR", "gpu"):
+        with pytest.raises(ValueError):
+            executor._create_executor()
+
+def test_preview_dispatches_to_executor():
+    """preview endpoint'inin process_photo'yu executor üzerinden çağırdığını doğrular."""
+    valid_image_path = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+
+    metadata = {
+        "model": "u2net",
+        "timings": {"background_removal": 0.1},
+        "resize_plan": {"source": [3276, 4096], "output": [413, 531]},
+    }
+
+    with patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)) as mock_process, \
+         patch('app.api.v1.endpoints.photos.run_in_executor', wraps=executor.run_in_executor) as mock_run:
+        with open(valid_image_path, "rb") as f:
+            response = client.post("/api/v1/photos/preview", files={"file": ("test.jpg", f, "image/jpeg")})
+
+    assert response.status_code == 200
+    assert response.headers["X-Resize-Plan"] == "source=3276x4096;output=413x531"
+    assert mock_run.called
+    assert mock_process.called
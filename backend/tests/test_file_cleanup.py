@@ -1,7 +1,8 @@
 
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, ANY
+from unittest.mock import patch
+from PIL import Image
 import os
 
 # Test edilecek ana uygulamayı ve ayarları import et
@@ -22,34 +23,26 @@ def override_test_mode():
     yield
     settings.TEST_MODE = original_mode
 
-@patch('app.api.v1.endpoints.photos.uuid.uuid4')
-@patch('app.api.v1.endpoints.photos.cleanup_file')
-def test_cleanup_on_success(mock_cleanup_file, mock_uuid):
-    """Başarılı bir istekten sonra dosyaların temizlendiğini doğrular."""
-    # Mock UUID'yi ayarla
-    mock_uuid.return_value = 'test-uuid'
-    
+def test_no_temp_files_on_success():
+    """Başarılı bir istekte sonucun bellekten döndüğünü, temp klasörüne dosya yazılmadığını doğrular."""
     # Geçerli bir resim dosyası kullan
     valid_image_path = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
-    test_filename = "test_image.jpg"
-
-    # Beklenen dosya yollarını oluştur
-    expected_input_path = os.path.join("uploads", "temp", f"test-uuid_{test_filename}")
-    expected_output_path = os.path.join("uploads", "temp", "test-uuid_processed.png")
-
-    with open(valid_image_path, "rb") as f:
-        response = client.post(
-            "/api/v1/photos/preview", 
-            files={"file": (test_filename, f, "image/jpeg")}
-        )
+    temp_dir = os.path.join(settings.UPLOAD_DIR, "temp")
+    before = set(os.listdir(temp_dir)) if os.path.isdir(temp_dir) else set()
+
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+    metadata = {"model": "u2net", "timings": {"background_removal": 0.1}, "resize_plan": {}}
+    with patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)):
+        with open(valid_image_path, "rb") as f:
+            response = client.post(
+                "/api/v1/photos/preview",
+                files={"file": ("test_image.jpg", f, "image/jpeg")}
+            )
 
     # API'nin başarılı olduğunu doğrula
     assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="processed_passport_eu.png"'
 
-    # cleanup_file fonksiyonunun doğru dosyalar için çağrıldığını doğrula
-    # ANY, BackgroundTasks nesnesini temsil eder, çünkü ona doğrudan erişimimiz yok
-    mock_cleanup_file.assert_any_call(expected_input_path)
-    # Arka plan görevi olarak eklendiği için, doğrudan çağrıyı değil, 
-    # add_task ile eklendiğini kontrol etmek daha doğru olur.
-    # Ancak bu basit test için any_call yeterlidir.
-    mock_cleanup_file.assert_any_call(expected_output_path)
+    # Ne yüklenen dosya ne de sonuç diske yazılmalı
+    after = set(os.listdir(temp_dir)) if os.path.isdir(temp_dir) else set()
+    assert after == before
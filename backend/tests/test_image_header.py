@@ -0,0 +1,80 @@
+import io
+import os
+import struct
+import zlib
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.ai.image_header import read_image_header, sniff_format
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def encode(image: Image.Image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+def png_bomb(width: int, height: int) -> bytes:
+    """Başlığında devasa boyut bildiren, birkaç yüz byte'lık bir PNG."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\0" * 64)) + chunk(b"IEND", b"")
+
+def test_reads_dimensions_from_header():
+    """Başlıktan okunan boyutların Pillow ile aynı olduğunu doğrular."""
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        data = f.read()
+    header = read_image_header(data)
+
+    assert header.format == "jpeg"
+    assert (header.width, header.height) == Image.open(io.BytesIO(data)).size
+
+    png = encode(Image.new("RGB", (123, 45)), "PNG")
+    assert read_image_header(png)[:3] == ("png", 123, 45)
+
+def test_progressive_jpeg_and_exif_orientation():
+    """Progressive JPEG'lerde boyutun, EXIF yönünün ve döndürülmüş boyutun okunduğunu doğrular."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # 90° saat yönünde
+    data = encode(Image.new("RGB", (200, 100)), "JPEG", exif=exif.tobytes(), progressive=True)
+    header = read_image_header(data)
+
+    assert (header.width, header.height) == (200, 100)
+    assert header.orientation == 6
+    assert header.display_size == (100, 200)
+
+def test_rejects_unknown_and_truncated_data():
+    """Tanınmayan veya başlığı eksik verinin None döndürdüğünü doğrular."""
+    jpeg = encode(Image.new("RGB", (10, 10)), "JPEG")
+
+    assert sniff_format(b"this is not an image") is None
+    assert read_image_header(b"this is not an image") is None
+    assert read_image_header(jpeg[:20]) is None
+
+def test_decompression_bomb_is_rejected_before_decode():
+    """Piksel bütçesini aşan görüntünün decode edilmeden 413 ile reddedildiğini doğrular."""
+    with patch('app.api.v1.endpoints.photos.process_photo') as mock_process:
+        response = client.post(
+            "/api/v1/photos/preview",
+            files={"file": ("bomb.png", png_bomb(60000, 60000), "image/png")}
+        )
+
+    assert response.status_code == 413
+    assert "Image dimensions are too large" in response.json()["detail"]
+    assert not mock_process.called
@@ -0,0 +1,101 @@
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.config import settings
+from app.services.janitor import FileJanitor
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def write_file(path, age=0.0):
+    with open(path, "wb") as f:
+        f.write(b"x")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_rebuild_deletes_only_expired_files(tmp_path):
+    """Başlangıçta diskten kurulan indeksin yalnızca süresi dolan dosyaları sildiğini doğrular."""
+    janitor = FileJanitor(batch_size=100, interval=1)
+    janitor.watch(str(tmp_path), ttl_seconds=60)
+    old = write_file(tmp_path / "old.png", age=120)
+    fresh = write_file(tmp_path / "fresh.png", age=10)
+
+    assert janitor.rebuild() == 2
+    assert janitor.backlog() == 1
+    assert janitor.collect() == 1
+
+    assert not old.exists()
+    assert fresh.exists()
+    assert janitor.deleted == 1
+    assert len(janitor) == 1
+
+def test_collect_is_bounded_by_batch(tmp_path):
+    """Birikmiş dosyaların tek seferde değil, max_files'lık parçalar halinde silindiğini doğrular."""
+    janitor = FileJanitor(batch_size=2, interval=1)
+    janitor.watch(str(tmp_path), ttl_seconds=60)
+    for i in range(5):
+        write_file(tmp_path / f"{i}.png", age=120)
+    janitor.rebuild()
+
+    assert janitor.collect(max_files=2) == 2
+    assert janitor.backlog() == 3
+    assert janitor.collect(max_files=2) == 2
+    assert janitor.collect(max_files=2) == 1
+    assert janitor.backlog() == 0
+    assert os.listdir(tmp_path) == []
+
+def test_rewritten_file_is_rescheduled(tmp_path):
+    """Süresi dolmadan yeniden yazılan bir dosyanın silinmeyip yeni süresiyle planlandığını doğrular."""
+    janitor = FileJanitor(batch_size=100, interval=1)
+    janitor.watch(str(tmp_path), ttl_seconds=60)
+    path = write_file(tmp_path / "result.png", age=120)
+    janitor.track(str(path), written_at=time.time() - 120)
+    write_file(path)  # başka bir istek aynı anahtarı yeniden yazdı
+
+    assert janitor.collect() == 1
+    assert path.exists()
+    assert len(janitor) == 1
+    assert janitor.backlog() == 0
+    assert janitor.collect(now=time.time() + 120) == 1
+    assert not path.exists()
+
+def test_deletions_are_reported_to_listener(tmp_path):
+    """on_delete ile izlenen dizinde silinen her dosyanın bildirildiğini doğrular."""
+    deleted = []
+    janitor = FileJanitor(batch_size=100, interval=1)
+    janitor.watch(str(tmp_path), ttl_seconds=60, on_delete=deleted.append)
+    old = write_file(tmp_path / "old.bin", age=120)
+    write_file(tmp_path / "fresh.bin", age=10)
+    janitor.rebuild()
+
+    assert janitor.collect() == 1
+    assert deleted == [str(old)]
+
+def test_untracked_directories_are_ignored(tmp_path):
+    """İzlenmeyen dizinlerdeki dosyaların planlanmadığını doğrular."""
+    janitor = FileJanitor(batch_size=100, interval=1)
+    janitor.watch(str(tmp_path / "watched"), ttl_seconds=60)
+    other = write_file(tmp_path / "other.png", age=120)
+
+    janitor.track(str(other))
+    assert len(janitor) == 0
+    assert janitor.collect() == 0
+    assert other.exists()
+
+def test_janitor_metrics_are_exported():
+    """Janitor birikiminin /metrics'te gauge olarak yayınlandığını doğrular."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE photoid_janitor_backlog_files gauge" in response.text
+    assert "photoid_janitor_deleted_files_total" in response.text
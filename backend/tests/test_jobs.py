@@ -0,0 +1,212 @@
+import asyncio
+import io
+import os
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.ai.exceptions import FaceNotFoundError
+from app.services.jobs import JobStore, JobWorker, process_next_job, QUEUED, RUNNING, SUCCEEDED, FAILED
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+@pytest.fixture
+def store(tmp_path):
+    """Endpoint'lerin kullandığı global kuyruğu geçici bir SQLite dosyasıyla değiştirir."""
+    job_store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=60)
+    with patch("app.api.v1.endpoints.jobs.job_store", job_store):
+        yield job_store
+
+def fake_process_photo(input_image, output_size, model_name=None, return_metadata=False, output_format=None, crop_mode=None):
+    image = Image.new("RGB", output_size, (255, 255, 255))
+    return image, {"model": "u2net", "timings": {"background_removal": 0.1}, "cutout": object()}
+
+def submit(filename="a.jpg"):
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        return client.post(
+            f"{settings.API_V1_STR}/jobs",
+            files={"file": (filename, f, "image/jpeg")},
+            params={"output_format": "passport_tr"}
+        )
+
+def test_jobs_report_queue_position(store):
+    """Kuyruktaki işlerin önlerindeki iş sayısını raporladığını doğrular."""
+    first = submit()
+    second = submit()
+
+    assert first.status_code == 202
+    assert first.json()["status"] == QUEUED
+    assert first.json()["position"] == 0
+    assert second.json()["position"] == 1
+
+    store.claim()
+    status = client.get(f"{settings.API_V1_STR}/jobs/{second.json()['id']}").json()
+    assert status["position"] == 0
+
+def test_job_result_is_served_after_processing(store):
+    """İşçi işi bitirdikten sonra sonucun PNG olarak alınabildiğini doğrular."""
+    job_id = submit().json()["id"]
+    assert client.get(f"{settings.API_V1_STR}/jobs/{job_id}/result").status_code == 409
+
+    with patch("app.ai.processing.process_photo", side_effect=fake_process_photo) as mock_process:
+        assert process_next_job(store) is True
+    assert mock_process.call_args.kwargs["output_size"] == (591, 709)
+
+    status = client.get(f"{settings.API_V1_STR}/jobs/{job_id}").json()
+    assert status["status"] == SUCCEEDED
+    assert "position" not in status
+
+    response = client.get(f"{settings.API_V1_STR}/jobs/{job_id}/result")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert Image.open(io.BytesIO(response.content)).size == (591, 709)
+
+def test_failed_job_uses_preview_error_mapping(store):
+    """Başarısız işin /preview ile aynı durum kodu ve mesajla raporlandığını doğrular."""
+    job_id = submit().json()["id"]
+    with patch("app.ai.processing.process_photo", side_effect=FaceNotFoundError("No face detected")):
+        process_next_job(store)
+
+    status = client.get(f"{settings.API_V1_STR}/jobs/{job_id}").json()
+    assert status["status"] == FAILED
+    assert status["status_code"] == 400
+    assert status["error"] == "FaceNotFoundError"
+
+    response = client.get(f"{settings.API_V1_STR}/jobs/{job_id}/result")
+    assert response.status_code == 400
+    assert "face is clearly visible" in response.json()["detail"]
+
+def test_unknown_job_returns_404(store):
+    """Bilinmeyen iş kimliği için 404 döndüğünü doğrular."""
+    assert client.get(f"{settings.API_V1_STR}/jobs/missing").status_code == 404
+
+def test_results_expire_after_ttl(tmp_path):
+    """TTL dolan sonuçların görünmez olduğunu ve temizlendiğini doğrular."""
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=10)
+    job_id = store.submit(b"photo", {"output_size": [10, 10]})
+    store.claim()
+    with patch("app.services.jobs.time.time", return_value=1000.0):
+        store.complete(job_id, b"png")
+    with patch("app.services.jobs.time.time", return_value=1005.0):
+        assert store.result(job_id) == b"png"
+    with patch("app.services.jobs.time.time", return_value=1011.0):
+        assert store.status(job_id) is None
+        assert store.purge_expired() == 1
+
+def test_stale_running_jobs_are_requeued(tmp_path):
+    """Çöken bir işçide kalan işlerin tekrar kuyruğa alındığını doğrular."""
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=60)
+    job_id = store.submit(b"photo", {"output_size": [10, 10]})
+    with patch("app.services.jobs.time.time", return_value=1000.0):
+        store.claim()
+    assert store.status(job_id)["status"] == RUNNING
+
+    with patch("app.services.jobs.time.time", return_value=2000.0):
+        assert store.requeue_stale(600) == 1
+    assert store.status(job_id)["status"] == QUEUED
+
+def test_in_process_worker_drains_queue(tmp_path):
+    """Lifespan'da başlayan in-process işçinin kuyruğu executor üzerinden işlediğini doğrular."""
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=60)
+    job_ids = [store.submit(b"photo", {"output_size": [20, 30]}) for _ in range(3)]
+
+    async def run_worker():
+        worker = JobWorker(store, concurrency=2, poll_interval=0.05)
+        await worker.start()
+        for _ in range(100):
+            if all(store.status(job_id)["status"] == SUCCEEDED for job_id in job_ids):
+                break
+            await asyncio.sleep(0.05)
+        await worker.stop()
+
+    with patch("app.ai.processing.process_photo", side_effect=fake_process_photo):
+        asyncio.run(run_worker())
+
+    assert all(store.status(job_id)["status"] == SUCCEEDED for job_id in job_ids)
+
+def test_store_closes_its_connections(tmp_path):
+    """Her JobStore çağrısının açtığı bağlantıyı kapattığını doğrular."""
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=60)
+    connections = []
+    sqlite_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        connection = sqlite_connect(*args, **kwargs)
+        connections.append(connection)
+        return connection
+
+    with patch("app.services.jobs.sqlite3.connect", side_effect=connect):
+        job_id = store.submit(b"photo", {"output_size": [10, 10]})
+        store.status(job_id)
+        store.claim()
+        store.complete(job_id, b"png")
+        store.result(job_id)
+
+    assert connections
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+def test_worker_survives_database_errors(tmp_path):
+    """Kilitli veritabanı gibi bir hatanın işçiyi durdurmadığını, kuyruğun işlenmeye devam ettiğini doğrular."""
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=60)
+    job_id = store.submit(b"photo", {"output_size": [20, 30]})
+    claim = store.claim
+    calls = []
+
+    def flaky_claim():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    async def run_worker():
+        worker = JobWorker(store, concurrency=1, poll_interval=0.01)
+        await worker.start()
+        for _ in range(100):
+            if store.status(job_id)["status"] == SUCCEEDED:
+                break
+            await asyncio.sleep(0.05)
+        await worker.stop()
+
+    with patch.object(store, "claim", side_effect=flaky_claim), \
+         patch("app.ai.processing.process_photo", side_effect=fake_process_photo):
+        asyncio.run(run_worker())
+
+    assert store.status(job_id)["status"] == SUCCEEDED
+
+def test_worker_requeues_stale_jobs_while_running(tmp_path):
+    """Çalışma sırasında ölen bir işçinin işinin yeniden başlatmayı beklemeden kuyruğa alındığını doğrular."""
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), result_ttl_seconds=60)
+
+    async def run_worker():
+        worker = JobWorker(store, concurrency=0, poll_interval=0.01, maintenance_interval=0.01)
+        await worker.start()
+        job_id = store.submit(b"photo", {"output_size": [10, 10]})
+        store.claim()  # başka bir işçi işi aldı ve öldü
+        for _ in range(100):
+            if store.status(job_id)["status"] == QUEUED:
+                break
+            await asyncio.sleep(0.02)
+        await worker.stop()
+        return job_id
+
+    with patch.object(settings, "JOB_STALE_SECONDS", 0):
+        job_id = asyncio.run(run_worker())
+
+    assert store.status(job_id)["status"] == QUEUED
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import subprocess
+import sys
+import pytest
+from fastapi.testclient import TestClient
+import queue
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from unittest.mock import patch
+
+from app.main import app
+from app.core.config import settings
+from app.ai import executor, loader
+from app.ai.loader import LazyModule, ModelLoader, model_loader
+
+client = TestClient(app)
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def test_app_import_defers_heavy_modules():
+    """app.main import edilirken OpenCV, MediaPipe ve rembg'nin yüklenmediğini doğrular."""
+    code = "import sys, app.main; print(','.join(m for m in ('cv2', 'mediapipe', 'rembg', 'onnxruntime') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == ""
+
+def test_lazy_module_imports_on_first_access():
+    """Vekilin modülü ilk öznitelik erişiminde import ettiğini ve süresini kaydettiğini doğrular."""
+    module = LazyModule("wave")
+    assert not module.loaded
+    assert module.WAVE_FORMAT_PCM == 1
+    assert module.loaded
+    assert "wave" in loader.import_times
+
+def test_load_warms_up_models():
+    """load()'un modülleri import edip yüz detektörünü ve matting modellerini ısıttığını doğrular."""
+    model_loader_under_test = ModelLoader()
+    with patch("app.ai.models.session_registry.warm_up") as mock_warm_up:
+        status = model_loader_under_test.load()
+        model_loader_under_test.load()
+
+    assert status["state"] == "ready"
+    assert set(status["timings_ms"]) == {"imports", "face_detection", "matting", "total"}
+    assert {"cv2", "mediapipe", "rembg"} <= set(status["import_ms"])
+    mock_warm_up.assert_called_once_with(["u2net"])
+
+def test_load_failure_is_reported_not_raised():
+    """Model yüklenemezse load()'un hata fırlatmadan 'failed' durumunu döndürdüğünü doğrular."""
+    model_loader_under_test = ModelLoader()
+    with patch("app.ai.models.session_registry.warm_up", side_effect=RuntimeError("weights missing")):
+        status = model_loader_under_test.load()
+
+    assert status["state"] == "failed"
+    assert status["error"] == "weights missing"
+
+def test_ready_endpoint_reflects_worker_warm_up():
+    """/ready'nin worker'lar ısınana kadar 503, ısındıktan sonra 200 döndüğünü doğrular."""
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "cold"
+
+    with patch.object(model_loader, "workers", {1: {"pid": 1, "state": "ready"}, 2: {"pid": 2, "state": "ready"}}):
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+    with patch.object(model_loader, "workers", {1: {"pid": 1, "state": "ready"}, 2: {"pid": 2, "state": "failed"}}):
+        assert client.get("/ready").status_code == 503
+
+    # /health modellerden bağımsızdır
+    assert client.get("/health").status_code == 200
+
+def test_load_skips_warm_up_when_disabled():
+    """MODEL_WARM_UP kapalıyken worker'ın modelleri yüklemeden hazır bildirdiğini doğrular (stub'lı yük testi)."""
+    with patch.object(settings, "MODEL_WARM_UP", False), \
+         patch("app.ai.models.session_registry.warm_up") as mock_warm_up:
+        status = ModelLoader().load()
+
+    assert status["state"] == "ready"
+    assert not mock_warm_up.called
+
+def test_worker_applies_thread_budget_without_warm_up():
+    """MODEL_WARM_UP kapalıyken de worker başlangıcında thread bütçesinin uygulanıp bildirildiğini doğrular."""
+    status_queue = queue.Queue()
+    with patch.object(settings, "MODEL_WARM_UP", False), \
+         patch.object(loader, "model_loader", ModelLoader()), \
+         patch("cv2.setNumThreads") as mock_set_threads:
+        executor._init_worker(status_queue)
+
+    status = status_queue.get_nowait()
+    assert status["state"] == "ready"
+    mock_set_threads.assert_called_once_with(status["thread_budget"]["threads"])
+
+def test_pool_crash_resets_readiness():
+    """Çöken havuz bırakılınca /ready'nin ölü worker'ları unutup yeni havuzun ısınmasını beklediğini doğrular."""
+    loader_under_test = ModelLoader()
+    warmed = []
+
+    async def fake_warm_up():
+        warmed.append(True)
+
+    async def scenario():
+        loader_under_test._task = asyncio.create_task(asyncio.sleep(0))
+        loader_under_test.workers = {1: {"pid": 1, "state": "ready"}}
+        broken = ThreadPoolExecutor(max_workers=1)
+        with patch.object(executor, "_executor", broken), \
+             patch("app.ai.loader.model_loader", loader_under_test), \
+             patch.object(loader_under_test, "_warm_up_workers", fake_warm_up):
+            executor._reset_broken_executor(broken)
+            assert executor._executor is None
+            assert loader_under_test.readiness()["status"] == "loading"
+            await loader_under_test._task
+
+    asyncio.run(scenario())
+    assert warmed == [True]
+
+class FakeProcessPool(Executor):
+    """Başlangıçta yalnızca `started` worker'ı ısınan, tüm işleri ilk worker'a veren sahte process havuzu."""
+
+    def __init__(self, status_queue, started):
+        for pid in range(1, started + 1):
+            with patch.object(model_loader, "load", return_value={"pid": pid, "state": "ready"}):
+                executor._init_worker(status_queue)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with patch.object(model_loader, "status", return_value={"pid": 1, "state": "ready"}):
+            future.set_result(fn(*args, **kwargs))
+        return future
+
+@pytest.mark.parametrize("started, expected", [(1, "failed"), (2, "ready")])
+def test_ready_waits_for_every_worker(started, expected):
+    """Tüm durum çağrılarını tek bir sıcak worker yanıtlasa da /ready'nin her worker'ın ısınmasını beklediğini doğrular."""
+    loader_under_test = ModelLoader()
+    with patch.object(executor, "_executor", None), \
+         patch.object(executor, "_status_queue", None), \
+         patch.object(executor, "_worker_count", return_value=2), \
+         patch.object(executor, "WORKER_START_TIMEOUT", 0.1), \
+         patch.object(executor, "_create_status_queue", queue.Queue), \
+         patch.object(executor, "_create_executor", lambda status_queue: FakeProcessPool(status_queue, started)):
+        asyncio.run(loader_under_test._warm_up_workers())
+
+    assert loader_under_test.readiness()["status"] == expected
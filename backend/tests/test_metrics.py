@@ -0,0 +1,114 @@
+import asyncio
+import os
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram, ResponseTimingMiddleware, queue_wait, rejections, stage_latency
+from app.ai import executor
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def test_histogram_renders_cumulative_buckets():
+    """Histogram kovalarının kümülatif, _sum ve _count satırlarının doğru yazıldığını doğrular."""
+    histogram = Histogram("test_seconds", "Test.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage="decode")
+
+    lines = histogram.collect()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="decode",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="decode"} 5.55' in lines
+    assert 'test_seconds_count{stage="decode"} 3' in lines
+
+def test_counter_escapes_label_values():
+    """Etiket değerlerindeki tırnak ve ters eğik çizgilerin kaçırıldığını doğrular."""
+    counter = Counter("test_total", "Test.", ["reason"])
+    counter.inc(reason='a"b\\c')
+    assert 'test_total{reason="a\\"b\\\\c"} 1' in counter.collect()
+
+def test_preview_records_stage_timings():
+    """preview isteğinin doğrulama, pipeline, encode ve yanıt aşamalarını histograma yazdığını doğrular."""
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+    metadata = {
+        "model": "u2net",
+        "timings": {"decode": 0.01, "face_detection": 0.02, "resize": 0.003, "background_removal": 0.1, "compose": 0.004},
+        "resize_plan": {},
+    }
+    stages = ("validation", "decode", "resize", "face_detection", "background_removal", "compose", "encode", "response")
+    before = {stage: stage_latency.count(stage=stage) for stage in stages}
+    with patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)):
+        with open(VALID_IMAGE_PATH, "rb") as f:
+            response = client.post("/api/v1/photos/preview", files={"file": ("test.jpg", f, "image/jpeg")})
+
+    assert response.status_code == 200
+    for stage in stages:
+        assert stage_latency.count(stage=stage) == before[stage] + 1, stage
+
+def test_response_stage_measures_the_send():
+    """"response" aşamasının yanıtın oluşturulmasını değil, sunucuya gönderilmesini ölçtüğünü doğrular."""
+    async def app_under_test(scope, receive, send):
+        await asyncio.sleep(0.2)  # Yanıtın hazırlanması ölçülmemeli
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        await send({"type": "http.response.body", "body": b"b"})
+
+    async def slow_send(message):
+        await asyncio.sleep(0.02)
+
+    async def run(path):
+        await ResponseTimingMiddleware(app_under_test, prefix="/api")({"type": "http", "path": path}, None, slow_send)
+
+    with patch.object(stage_latency, "observe") as mock_observe:
+        asyncio.run(run("/api/v1/photos/preview"))
+        asyncio.run(run("/health"))
+
+    mock_observe.assert_called_once()
+    seconds = mock_observe.call_args.args[0]
+    assert mock_observe.call_args.kwargs == {"stage": "response"}
+    assert 0.06 <= seconds < 0.2
+
+def test_rejections_are_counted_by_reason():
+    """Reddedilen yüklemelerin nedenine göre sayıldığını doğrular."""
+    before = rejections.value(reason="unsupported_type")
+    response = client.post("/api/v1/photos/preview", files={"file": ("a.gif", b"GIF89a", "image/gif")})
+
+    assert response.status_code == 415
+    assert rejections.value(reason="unsupported_type") == before + 1
+
+def test_executor_records_queue_wait():
+    """Executor'a gönderilen işlerin kuyruk bekleme süresinin kaydedildiğini doğrular."""
+    before = queue_wait.count(queue="executor")
+    assert asyncio.run(executor.run_in_executor(sum, [1, 2])) == 3
+    assert queue_wait.count(queue="executor") == before + 1
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    """/metrics'in Prometheus metin formatında aşama, istek, önbellek ve RSS metriklerini döndürdüğünü doğrular."""
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert '# TYPE photoid_stage_duration_seconds histogram' in body
+    assert 'photoid_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert 'photoid_cache_events_total{cache="results",event="misses"}' in body
+    assert 'photoid_in_flight{kind="requests"} 1' in body
+    process_rss = next(line for line in body.splitlines() if line.startswith("process_resident_memory_bytes "))
+    assert int(process_rss.split()[1]) > 0
@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.core.config import settings
+from PIL import Image
+from app.ai.models import SessionRegistry, LatencyStats, MATTING_MODELS, model_variant, predict_masks, session_registry
+
+client = TestClient(app)
+
+def test_registry_creates_each_session_once():
+    """Aynı model için oturumun yalnızca bir kere oluşturulduğunu doğrular."""
+    registry = SessionRegistry()
+    with patch('app.ai.models.model_store.create_session', side_effect=lambda name, **kwargs: object()) as mock_new_session:
+        first = registry.get("u2netp")
+        second = registry.get("u2netp")
+
+    assert first is second
+    mock_new_session.assert_called_once_with("u2netp", quantized=False)
+    assert registry.loaded_models() == ["u2netp"]
+
+def test_registry_loads_quantized_models():
+    """MATTING_QUANTIZED listesindeki modellerin INT8 kopyasıyla yüklendiğini doğrular."""
+    with patch.object(settings, "MATTING_QUANTIZED", "u2netp, silueta"), \
+         patch('app.ai.models.model_store.create_session') as mock_new_session:
+        SessionRegistry().get("u2netp")
+        SessionRegistry().get("u2net")
+        # Önbellek anahtarları INT8 ve float sonuçlarını ayırır
+        assert model_variant("u2netp") == "u2netp:int8"
+        assert model_variant("u2net") == "u2net"
+
+    assert mock_new_session.call_args_list[0].kwargs == {"quantized": True}
+    assert mock_new_session.call_args_list[1].kwargs == {"quantized": False}
+
+def test_registry_uses_configured_default():
+    """Model adı verilmezse config'deki varsayılan modelin seçildiğini doğrular."""
+    with patch.object(settings, "MATTING_MODEL", "silueta"):
+        assert SessionRegistry().resolve() == "silueta"
+
+def test_registry_rejects_unknown_model():
+    """Desteklenmeyen model adının reddedildiğini doğrular."""
+    with pytest.raises(ValueError):
+        SessionRegistry().resolve("sam")
+
+def test_latency_summary():
+    """Gecikme özetinin model başına sayı ve yüzdelikleri içerdiğini doğrular."""
+    stats = LatencyStats()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        stats.record("u2net", seconds)
+
+    summary = stats.summary()["u2net"]
+    assert summary["count"] == 4
+    assert summary["mean_ms"] == 250.0
+    assert summary["p95_ms"] == 400.0
+
+def test_models_endpoint():
+    """/photos/models endpoint'inin tüm desteklenen modelleri listelediğini doğrular."""
+    response = client.get("/api/v1/photos/models")
+
+    assert response.status_code == 200
+    assert set(response.json()["models"]) == set(MATTING_MODELS)
+
+def test_predict_masks_falls_back_for_fixed_batch_models():
+    """Sabit batch boyutlu modellerde görüntü başına çalışmaya geri düşüldüğünü doğrular."""
+    class Input:
+        name = "input.1"
+
+    class FixedBatchInner:
+        def __init__(self):
+            self.calls = 0
+
+        def get_inputs(self):
+            return [Input()]
+
+        def run(self, outputs, feeds):
+            self.calls += 1
+            batch = feeds["input.1"]
+            if batch.shape[0] != 1:
+                raise RuntimeError("Got invalid dimensions for input")
+            return [batch[:, :1, :, :]]
+
+    class Session:
+        inner_session = FixedBatchInner()
+
+    images = [Image.new("RGB", (50, 60), (i * 40, 0, 0)) for i in range(3)]
+    with patch.object(session_registry, "get", return_value=Session()):
+        masks = predict_masks("u2netp", images)
+
+    assert [mask.size for mask in masks] == [(50, 60)] * 3
+    assert Session.inner_session.calls == 4  # bir başarısız batched çağrı + üç tekil çağrı
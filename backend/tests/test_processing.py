@@ -0,0 +1,304 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from PIL import Image
+
+from app.ai import processing
+from app.core.metrics import decode_scales, face_detection_paths, record_pipeline_metadata, stage_latency
+from app.ai.exceptions import ImageReadError
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+
+class FakeInnerSession:
+    """Batched girdiyi kabul eden sahte ONNX oturumu; ilk kanalı maske olarak döndürür."""
+
+    class Input:
+        name = "input.1"
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [self.Input()]
+
+    def run(self, outputs, feeds):
+        batch = feeds["input.1"]
+        self.batch_sizes.append(batch.shape[0])
+        return [batch[:, :1, :, :]]
+
+
+class FakeSession:
+    """Tüm görüntüyü ön plan kabul eden, model indirmeyen sahte rembg oturumu."""
+
+    def __init__(self):
+        self.inner_session = FakeInnerSession()
+
+    def predict(self, img, *args, **kwargs):
+        return [Image.new("L", img.size, 255)]
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_decode_image_from_bytes():
+    """Byte girdisinin dosyadan okumayla aynı sonucu verdiğini doğrular."""
+    decoded = processing.decode_image(read_bytes(VALID_IMAGE_PATH))
+    assert decoded.shape == cv2.imread(VALID_IMAGE_PATH).shape
+
+def test_decode_image_passes_ndarray_through():
+    """Zaten çözülmüş bir ndarray'in kopyalanmadan döndüğünü doğrular."""
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+    assert processing.decode_image(image) is image
+
+def test_decode_image_rejects_corrupt_bytes():
+    """Bozuk byte'ların ImageReadError fırlattığını doğrular."""
+    with pytest.raises(ImageReadError):
+        processing.decode_image(b"not an image")
+
+def test_process_photo_from_bytes_never_decodes_full_resolution():
+    """Byte girdisinin diske yazılmadan, yalnızca DCT ile küçültülmüş decode'larla işlendiğini doğrular."""
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()), \
+         patch("app.ai.processing.cv2.imdecode", wraps=cv2.imdecode) as mock_imdecode, \
+         patch("app.ai.processing.Image.open") as mock_open:
+        image, metadata = processing.process_photo(
+            read_bytes(VALID_IMAGE_PATH), output_size=(413, 531), return_metadata=True
+        )
+
+    assert image.size == (413, 531)
+    assert 1 <= mock_imdecode.call_count <= 2
+    assert all(call.args[1] != cv2.IMREAD_COLOR for call in mock_imdecode.call_args_list)
+    assert not mock_open.called
+    assert "background_removal" in metadata["timings"]
+
+def test_dct_reduction_covers_required_scale():
+    """Seçilen küçültme çarpanının gereken ölçeğin altına inmediğini doğrular."""
+    assert processing.dct_reduction(1.0) == 1
+    assert processing.dct_reduction(0.6) == 1
+    assert processing.dct_reduction(0.5) == 2
+    assert processing.dct_reduction(0.2) == 4
+    assert processing.dct_reduction(0.05) == 8
+
+def test_reduced_decode_matches_full_decode():
+    """Küçültülmüş decode'un ölçeğinin metadata'ya yazıldığını ve sonucun tam decode ile uyumlu olduğunu doğrular."""
+    data = read_bytes(VALID_IMAGE_PATH)
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        reduced, reduced_metadata = processing.process_photo(data, output_size=(413, 531), return_metadata=True)
+        with patch.object(processing.settings, "JPEG_REDUCED_DECODE", False):
+            full, full_metadata = processing.process_photo(data, output_size=(413, 531), return_metadata=True)
+
+    assert reduced_metadata["decode_scale"]["matting"] < 1.0
+    assert full_metadata["decode_scale"] == {"detection": 1.0, "matting": 1.0}
+    assert reduced_metadata["resize_plan"]["source"] == full_metadata["resize_plan"]["source"]
+    assert reduced_metadata["resize_plan"]["decode"][0] < full_metadata["resize_plan"]["decode"][0]
+    difference = np.abs(np.asarray(reduced, dtype=np.float32) - np.asarray(full, dtype=np.float32))
+    assert difference.mean() < 8
+
+def test_decode_scale_is_exported_as_metric():
+    """Kullanılan DCT ölçeklerinin aşama başına photoid_decode_total'a yazıldığını doğrular."""
+    data = read_bytes(VALID_IMAGE_PATH)
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        _, metadata = processing.process_photo(data, output_size=(413, 531), return_metadata=True)
+
+    reduction = round(1 / metadata["decode_scale"]["matting"])
+    assert metadata["decode_reductions"]["matting"] == {reduction: 1}
+    scale = f"1/{reduction}"
+    before = decode_scales.value(stage="matting", scale=scale)
+    record_pipeline_metadata(metadata)
+    assert decode_scales.value(stage="matting", scale=scale) == before + 1
+    assert any(line.startswith(f'photoid_decode_total{{stage="matting",scale="{scale}"}}')
+               for line in decode_scales.collect())
+
+def test_crop_window_matches_output_aspect_and_head_ratio():
+    """Kırpma penceresinin çıktı oranını ve baş/çerçeve oranını koruduğunu doğrular."""
+    face_box = (400, 300, 200, 240)
+    window = processing.compute_crop_window(face_box, (413, 531), head_ratio=0.75)
+
+    x, y, w, h = window
+    assert w / h == pytest.approx(413 / 531)
+    assert 240 * processing.FACE_BOX_TO_HEAD / h == pytest.approx(0.75)
+    # Yüz yatayda ortalanmış olmalı
+    assert x + w / 2 == pytest.approx(500)
+
+def test_matting_region_is_clamped_to_image():
+    """Matting bölgesinin görüntü sınırlarını aşmadığını doğrular."""
+    region = processing.matting_region((-50, -20, 400, 500), (300, 400))
+    assert region == (0, 0, 300, 400)
+
+def test_face_crop_mode_mattes_only_the_face_region():
+    """Yüz modunda matting'in yalnızca kırpma penceresi civarında çalıştığını doğrular."""
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        image, metadata = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(413, 531), return_metadata=True,
+            output_format="passport_eu", crop_mode="face"
+        )
+
+    assert image.size == (413, 531)
+    window = metadata["crop_window"]
+    plan = metadata["resize_plan"]
+    # Matting bölgesi pencere + dolgu ile sınırlı ve kaynağın tamamından küçük
+    assert window[2] * window[3] < plan["source"][0] * plan["source"][1]
+    assert len(window) == 4
+
+def test_working_resolution_follows_output_size():
+    """Aşama çözünürlüklerinin yükleme boyutuna değil çıktı boyutuna göre seçildiğini doğrular."""
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        _, metadata = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(413, 531), return_metadata=True, crop_mode="full"
+        )
+
+    plan = metadata["resize_plan"]
+    assert plan["source"] == [3276, 4096]
+    assert max(plan["detection"]) == processing.DETECTION_MAX_SIDE
+    # Tam kare modunda matting, hazır boyutların en büyüğüne yetecek kadar (model girişinin altına inmeden) çalışır
+    largest_preset_height = max(size[1] for size in processing.PRESET_SIZES.values() if size)
+    assert max(plan["matting"]) <= largest_preset_height + 1
+    assert max(plan["matting"]) >= processing.MATTING_MODELS["u2net"]
+
+def test_cutout_covers_only_the_requested_output_by_default():
+    """Varsayılan kesitin yalnızca istenen çıktının bölgesinde, hazır formatların birleşiminden küçük üretildiğini doğrular."""
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        _, narrow = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(413, 531), return_metadata=True, output_format="passport_eu"
+        )
+        _, wide = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(413, 531), return_metadata=True, output_format="passport_eu",
+            extra_targets=processing.preset_targets()
+        )
+
+    assert narrow["cutout"].supports((413, 531), "passport_eu")
+    assert not narrow["cutout"].supports((600, 600), "visa_us")
+    assert all(wide["cutout"].supports(size, name) for size, name in processing.preset_targets())
+    narrow_pixels, wide_pixels = (metadata["resize_plan"]["matting"] for metadata in (narrow, wide))
+    assert narrow_pixels[0] * narrow_pixels[1] < wide_pixels[0] * wide_pixels[1]
+
+def test_cutout_renders_other_presets_without_matting_again():
+    """Hazır formatlara genişletilmiş kesitten başka bir formatın, doğrudan işlemeyle aynı sonuçla üretildiğini doğrular."""
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        _, metadata = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(413, 531), return_metadata=True, output_format="passport_eu",
+            extra_targets=processing.preset_targets()
+        )
+        direct = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(600, 600), output_format="visa_us", extra_targets=processing.preset_targets()
+        )
+
+    cutout = metadata["cutout"]
+    assert cutout.supports((600, 600), "visa_us")
+    rendered = processing.render_cutout(cutout, (600, 600), "visa_us")
+    assert rendered.tobytes() == direct.tobytes()
+
+def test_cutout_serialization_round_trip():
+    """Kesitin önbellek için serileştirilip geri yüklenebildiğini doğrular."""
+    image = Image.new("RGBA", (40, 50), (10, 20, 30, 255))
+    cutout = processing.Cutout(image, (5, 6, 45, 56), 0.5, (10, 12, 20, 24), (100, 120), "face", "u2netp")
+
+    restored = processing.Cutout.from_bytes(cutout.to_bytes())
+    assert restored.image.tobytes() == image.tobytes()
+    assert restored.region == cutout.region
+    assert restored.face_box == cutout.face_box
+    assert restored.model_name == "u2netp"
+
+def test_cutout_does_not_support_larger_custom_size():
+    """Kesit çözünürlüğünden büyük bir özel boyutun desteklenmediğini doğrular."""
+    with patch.object(processing.session_registry, "get", return_value=FakeSession()):
+        _, metadata = processing.process_photo(
+            VALID_IMAGE_PATH, output_size=(413, 531), return_metadata=True, output_format="passport_eu"
+        )
+
+    assert not metadata["cutout"].supports((2000, 2000), "custom")
+
+def test_process_photo_formats_mattes_once():
+    """Birden çok formatın tek bir matting çağrısıyla üretildiğini doğrular."""
+    session = FakeSession()
+    targets = {"passport_tr": (591, 709), "visa_us": (600, 600), "custom": (300, 400)}
+    with patch.object(processing.session_registry, "get", return_value=session), \
+         patch.object(session, "predict", wraps=session.predict) as mock_predict:
+        images, metadata = processing.process_photo_formats(VALID_IMAGE_PATH, targets)
+
+    assert mock_predict.call_count == 1
+    assert {name: image.size for name, image in images.items()} == targets
+    assert metadata["cutout"].supports((300, 400), "custom")
+
+def test_process_photo_batch_stacks_matting_and_reports_item_errors():
+    """Geçerli fotoğrafların tek bir batched çağrıda işlendiğini, hatalı olanın yalnızca kendi kaydını etkilediğini doğrular."""
+    session = FakeSession()
+    inputs = [VALID_IMAGE_PATH, b"not an image", read_bytes(VALID_IMAGE_PATH)]
+    with patch.object(processing.session_registry, "get", return_value=session):
+        results, metadata = processing.process_photo_batch(inputs, output_size=(413, 531), batch_size=8)
+
+    assert session.inner_session.batch_sizes == [2]
+    assert results[0].size == results[2].size == (413, 531)
+    assert isinstance(results[1], ImageReadError)
+    assert metadata["batches"] == 1
+
+def test_process_photo_batch_respects_batch_size():
+    """Matting'in batch_size'lık gruplara bölündüğünü doğrular."""
+    session = FakeSession()
+    with patch.object(processing.session_registry, "get", return_value=session):
+        results, _ = processing.process_photo_batch([VALID_IMAGE_PATH] * 3, output_size=(300, 300), batch_size=2)
+
+    assert session.inner_session.batch_sizes == [2, 1]
+    assert all(image.size == (300, 300) for image in results)
+
+def test_process_photo_batch_records_timings_per_item():
+    """Batch'te her öğenin aşama süresinin ayrı bir örnek, batched matting'in "batch" aşaması olarak yazıldığını doğrular."""
+    session = FakeSession()
+    with patch.object(processing.session_registry, "get", return_value=session):
+        _, metadata = processing.process_photo_batch([VALID_IMAGE_PATH] * 3, output_size=(300, 300), batch_size=8)
+
+    assert len(metadata["item_timings"]) == 3
+    assert all("decode" in timings and "compose" in timings for timings in metadata["item_timings"])
+    assert set(metadata["timings"]) == {"batch"}
+
+    stages = ("decode", "compose", "batch", "background_removal")
+    before = {stage: stage_latency.count(stage=stage) for stage in stages}
+    record_pipeline_metadata(metadata)
+    assert stage_latency.count(stage="decode") == before["decode"] + 3
+    assert stage_latency.count(stage="compose") == before["compose"] + 3
+    assert stage_latency.count(stage="batch") == before["batch"] + 1
+    assert stage_latency.count(stage="background_removal") == before["background_removal"]
+
+def test_face_cascade_takes_short_range_path_for_portraits():
+    """Vesikalıkta kısa menzilli geçişin yettiğini ve kutusunun tam menzilli kutuyla örtüştüğünü doğrular."""
+    detection_rgb = processing._to_rgb(cv2.imread(VALID_IMAGE_PATH), 0.15)
+    size = (detection_rgb.shape[1], detection_rgb.shape[0])
+    metadata = {"timings": {}}
+    with patch.object(processing.model_loader, "detect_faces", wraps=processing.model_loader.detect_faces) as mock_detect:
+        results = processing.detect_face(detection_rgb, metadata)
+
+    assert metadata["face_detection"] == "short_range"
+    assert metadata["face_detection_paths"] == {"short_range": 1}
+    mock_detect.assert_called_once()
+    assert max(mock_detect.call_args.args[0].shape[:2]) == processing.settings.FACE_CASCADE_MAX_SIDE
+
+    x, y, w, h = processing.face_box_pixels(results.detections[0], size, processing.SHORT_RANGE_BOX_SCALE)
+    full_range = processing.model_loader.detect_faces(detection_rgb, processing.FULL_RANGE)
+    fx, fy, fw, fh = processing.face_box_pixels(full_range.detections[0], size)
+    assert h == pytest.approx(fh, rel=0.1)
+    assert y + h == pytest.approx(fy + fh, abs=0.05 * fh)
+
+def test_face_cascade_falls_back_to_full_range_on_low_confidence():
+    """Kısa menzilli geçiş emin değilse tam menzilli modele düşüldüğünü ve yolun sayıldığını doğrular."""
+    def fake_detect(image_rgb, model_selection):
+        score = 0.5 if model_selection == processing.SHORT_RANGE else 0.9
+        return SimpleNamespace(detections=[SimpleNamespace(score=[score], model_selection=model_selection)])
+
+    metadata = {"timings": {}}
+    with patch.object(processing.model_loader, "detect_faces", side_effect=fake_detect):
+        results = processing.detect_face(np.zeros((640, 512, 3), dtype=np.uint8), metadata)
+        processing.detect_face(np.zeros((640, 512, 3), dtype=np.uint8), metadata)
+        with patch.object(processing.settings, "FACE_CASCADE", False):
+            processing.detect_face(np.zeros((640, 512, 3), dtype=np.uint8), metadata)
+
+    assert results.detections[0].model_selection == processing.FULL_RANGE
+    assert metadata["face_detection_paths"] == {"full_range_fallback": 2, "full_range": 1}
+
+    before = face_detection_paths.value(path="full_range_fallback")
+    record_pipeline_metadata(metadata)
+    assert face_detection_paths.value(path="full_range_fallback") == before + 2
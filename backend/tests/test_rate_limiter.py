@@ -0,0 +1,208 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.core.rate_limiter import RateLimit, RateLimiter, DEFAULT_LIMITS
+from app.core.rate_limit_backends import SQLiteBackend, create_backend
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+HOUR = 3600
+# Pencere sınırına denk gelmeyen sabit bir başlangıç zamanı
+START = 1000 * 24 * HOUR + 10
+
+def test_hourly_limit_is_enforced():
+    """Saatlik limit aşıldığında saatlik mesajın döndüğünü doğrular."""
+    limiter = RateLimiter()
+    for _ in range(3):
+        assert limiter.hit("1.2.3.4", START) is None
+
+    exceeded = limiter.hit("1.2.3.4", START + 1)
+    assert exceeded is DEFAULT_LIMITS[1]
+    # Başka bir IP etkilenmemeli
+    assert limiter.hit("5.6.7.8", START + 1) is None
+
+def test_rejected_requests_are_not_counted():
+    """Reddedilen isteklerin sayaca eklenmediğini doğrular."""
+    limiter = RateLimiter([RateLimit(2, HOUR, "limit")])
+    limiter.hit("ip", START)
+    limiter.hit("ip", START)
+    for _ in range(5):
+        assert limiter.hit("ip", START) is not None
+
+    # Bir sonraki pencerenin yarısında önceki pencereden yalnızca ~1 istek sayılır
+    assert limiter.hit("ip", START - 10 + HOUR + HOUR / 2) is None
+
+def test_window_slides_instead_of_resetting():
+    """Pencere sınırını geçince sayacın sıfırlanmak yerine kademeli azaldığını doğrular."""
+    limiter = RateLimiter([RateLimit(10, HOUR, "limit")])
+    window_end = START - 10 + HOUR
+    for _ in range(10):
+        limiter.hit("ip", window_end - 1)
+
+    # Yeni pencerenin %10'unda önceki pencerenin %90'ı (9 istek) hâlâ sayılır: yalnızca 1 yer açılır
+    assert limiter.hit("ip", window_end + HOUR / 10) is None
+    assert limiter.hit("ip", window_end + HOUR / 10) is not None
+    # Bir pencere sonra önceki pencere tamamen düşer
+    assert limiter.hit("ip", window_end + HOUR) is None
+
+def test_state_per_key_is_fixed_size():
+    """Anahtar başına durumun istek sayısıyla büyümediğini doğrular."""
+    limiter = RateLimiter()
+    limiter.hit("ip", START)
+    size = len(limiter.backend._state["ip"])
+    for offset in range(100):
+        limiter.hit("ip", START + offset * 600)
+
+    assert len(limiter.backend._state["ip"]) == size
+    assert len(limiter) == 1
+
+def test_sweep_evicts_only_idle_keys():
+    """Temizliğin yalnızca uzun süredir istek atmayan anahtarları sildiğini doğrular."""
+    limiter = RateLimiter()
+    for index in range(5):
+        limiter.hit(f"idle-{index}", START)
+    limiter.hit("active", START + limiter.idle_seconds)
+
+    assert limiter.sweep(START + limiter.idle_seconds + 1, max_keys=2) == 2
+    assert limiter.sweep(START + limiter.idle_seconds + 1) == 3
+    assert len(limiter) == 1
+    assert "active" in limiter.backend._state
+
+def test_middleware_returns_429_when_limit_exceeded():
+    """Limit aşıldığında middleware'in işlem yapmadan 429 döndüğünü doğrular."""
+    limiter = RateLimiter([RateLimit(1, HOUR, "Saatlik limit")])
+    result = Image.new("RGB", (413, 531), (255, 255, 255))
+    metadata = {"model": "u2net", "timings": {"background_removal": 0.1}, "resize_plan": {}}
+    with patch.object(settings, "TEST_MODE", False), \
+         patch("app.core.rate_limiter.rate_limiter", limiter), \
+         patch('app.api.v1.endpoints.photos.process_photo', return_value=(result, metadata)) as mock_process:
+        responses = []
+        for _ in range(2):
+            with open(VALID_IMAGE_PATH, "rb") as f:
+                responses.append(client.post("/api/v1/photos/preview", files={"file": ("a.jpg", f, "image/jpeg")}))
+
+    assert responses[0].status_code == 200
+    assert responses[1].status_code == 429
+    assert responses[1].json()["detail"] == "Saatlik limit"
+    assert mock_process.call_count == 1
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    """Aynı dosyayı kullanan limiter'ların (ör. farklı worker'lar) sayaçları paylaştığını doğrular."""
+    path = str(tmp_path / "rate_limits.sqlite3")
+    limits = [RateLimit(3, HOUR, "limit")]
+    workers = [RateLimiter(limits, SQLiteBackend(path)) for _ in range(3)]
+
+    for worker in workers:
+        assert worker.hit("ip", START) is None
+    assert workers[0].hit("ip", START) is not None
+    assert len(workers[1]) == 1
+
+def test_sqlite_backend_increments_atomically(tmp_path):
+    """Eşzamanlı isteklerde limitten fazla isteğin kabul edilmediğini doğrular."""
+    limiter = RateLimiter([RateLimit(100, HOUR, "limit")], SQLiteBackend(str(tmp_path / "rate_limits.sqlite3")))
+    allowed = []
+
+    def worker():
+        for _ in range(50):
+            if limiter.hit("ip", START) is None:
+                allowed.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(allowed) == 100
+
+def test_sqlite_backend_sweeps_idle_keys(tmp_path):
+    """SQLite backend'inde boşta kalan anahtarların silindiğini doğrular."""
+    limiter = RateLimiter(backend=SQLiteBackend(str(tmp_path / "rate_limits.sqlite3")))
+    for index in range(5):
+        limiter.hit(f"idle-{index}", START)
+    limiter.hit("active", START + limiter.idle_seconds)
+
+    # Her anahtarın limit başına bir satırı vardır
+    assert limiter.sweep(START + limiter.idle_seconds + 1) == 5 * len(limiter.limits)
+    assert len(limiter) == 1
+
+def test_unknown_backend_is_rejected():
+    """Bilinmeyen backend'in ve REDIS_URL'siz redis'in reddedildiğini doğrular."""
+    with pytest.raises(ValueError):
+        create_backend("memcached", sqlite_path="unused", redis_url=None)
+    with pytest.raises(ValueError):
+        create_backend("redis", sqlite_path="unused", redis_url=None)
+
+def test_sqlite_backend_fails_open_when_locked(tmp_path):
+    """Veritabanı başka bir yazar tarafından kilitliyken isteğin beklemeden, sayılmadan geçtiğini doğrular."""
+    path = str(tmp_path / "rate_limits.sqlite3")
+    limiter = RateLimiter([RateLimit(1, HOUR, "limit")], SQLiteBackend(path, timeout=0.05))
+    assert limiter.hit("ip", START) is None
+
+    other = SQLiteBackend(path)._connection()
+    assert other.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert limiter.hit("ip", START) is None
+    finally:
+        other.execute("ROLLBACK")
+    assert limiter.hit("ip", START) is not None
+
+class FailingWrites:
+    """Yazma adımında disk hatası veren bağlantı sarmalayıcısı."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def executemany(self, *args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+def test_sqlite_backend_fails_open_inside_transaction(tmp_path):
+    """İşlemin ortasındaki bir veritabanı hatasının isteği sayılmadan geçirdiğini ve işlemi geri aldığını doğrular."""
+    backend = SQLiteBackend(str(tmp_path / "rate_limits.sqlite3"))
+    limiter = RateLimiter([RateLimit(1, HOUR, "limit")], backend)
+    connection = backend._connection()
+    with patch.object(backend, "_connection", return_value=FailingWrites(connection)):
+        assert limiter.hit("ip", START) is None
+
+    assert not connection.in_transaction
+    assert limiter.hit("ip", START) is None
+    assert limiter.hit("ip", START) is not None
+
+def test_sweeper_survives_backend_errors():
+    """Temizlik sırasındaki bir veritabanı hatasının arka plan görevini sonlandırmadığını doğrular."""
+    limiter = RateLimiter()
+    calls = []
+
+    def sweep(now=None, max_keys=None):
+        calls.append(now)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return 0
+
+    async def scenario():
+        with patch.object(limiter, "sweep", side_effect=sweep):
+            limiter.start_sweeper(interval=0)
+            for _ in range(200):
+                if len(calls) >= 3 or limiter._sweeper.done():
+                    break
+                await asyncio.sleep(0.01)
+            assert not limiter._sweeper.done()
+            assert len(calls) >= 3
+            await limiter.stop_sweeper()
+
+    asyncio.run(scenario())
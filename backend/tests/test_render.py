@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from PIL import Image
+
+from app.main import app
+from app.core.config import settings
+from app.ai.exceptions import FaceNotFoundError
+from app.ai.processing import PRESET_SIZES
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def fake_process_photo_formats(input_image, targets, model_name=None, crop_mode=None):
+    images = {name: Image.new("RGB", size, (255, 255, 255)) for name, size in targets.items()}
+    return images, {"model": "u2net", "timings": {"background_removal": 0.1}}
+
+def post_render(params):
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        return client.post("/api/v1/photos/render", params=params, files={"file": ("test.jpg", f, "image/jpeg")})
+
+def test_render_all_formats_in_one_archive():
+    """formats=all için tüm hazır formatların tek bir zip içinde döndüğünü doğrular."""
+    with patch('app.api.v1.endpoints.photos.process_photo_formats', side_effect=fake_process_photo_formats) as mock_process:
+        response = post_render({"formats": "all"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert mock_process.call_count == 1
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    manifest = json.loads(archive.read("manifest.json"))
+    expected = {name: size for name, size in PRESET_SIZES.items() if size}
+    assert set(manifest["formats"]) == set(expected)
+    for name, size in expected.items():
+        image = Image.open(io.BytesIO(archive.read(manifest["formats"][name]["file"])))
+        assert image.size == size
+
+def test_render_selected_and_custom_formats():
+    """Seçilen formatlar ve özel boyutun birlikte üretildiğini doğrular."""
+    with patch('app.api.v1.endpoints.photos.process_photo_formats', side_effect=fake_process_photo_formats):
+        response = post_render({"formats": ["visa_us", "custom"], "custom_width": 300, "custom_height": 400})
+
+    assert response.status_code == 200
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(response.content)).read("manifest.json"))
+    assert manifest["formats"]["custom"]["width"] == 300
+    assert set(manifest["formats"]) == {"visa_us", "custom"}
+
+def test_render_rejects_unknown_format():
+    """Bilinmeyen format adının 400 döndürdüğünü doğrular."""
+    response = post_render({"formats": "passport_xx"})
+    assert response.status_code == 400
+
+def test_render_custom_requires_dimensions():
+    """custom formatın boyut olmadan reddedildiğini doğrular."""
+    response = post_render({"formats": "custom"})
+    assert response.status_code == 400
+
+def test_render_maps_processing_errors():
+    """İşleme hatalarının preview ile aynı HTTP hatalarına çevrildiğini doğrular."""
+    with patch('app.api.v1.endpoints.photos.process_photo_formats', side_effect=FaceNotFoundError):
+        response = post_render({"formats": "all"})
+
+    assert response.status_code == 400
+    assert "Please ensure your face is clearly visible" in response.json()["detail"]
@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import patch
+
+from app.core.config import Settings, settings, thread_budget
+from app.ai.artifacts import model_store
+from app.ai.loader import apply_thread_budget
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+def budget(**values):
+    values.setdefault("PROCESSING_WORKERS", 0)
+    values.setdefault("WORKER_THREADS", 0)
+    return thread_budget(Settings(**values))
+
+def test_cores_are_split_across_server_workers():
+    """Varsayılan bütçede her API process'inin çekirdek payının tek thread'li worker'lara bölündüğünü doğrular."""
+    result = budget(CPU_CORES=8, WEB_CONCURRENCY=2)
+    assert (result.processing_workers, result.threads) == (4, 1)
+    assert result.total_threads == 8
+    assert result.oversubscription == 1
+
+def test_worker_threads_determine_worker_count():
+    """Yalnızca biri verildiğinde diğerinin kalan çekirdeklerden hesaplandığını doğrular."""
+    assert budget(CPU_CORES=8, WEB_CONCURRENCY=2, WORKER_THREADS=2)[2:4] == (2, 2)
+    assert budget(CPU_CORES=8, WEB_CONCURRENCY=1, PROCESSING_WORKERS=2)[2:4] == (2, 4)
+    # Çekirdekten fazla server worker'ı olsa da en az bir worker ve bir thread kalır
+    assert budget(CPU_CORES=2, WEB_CONCURRENCY=4)[2:4] == (1, 1)
+
+def test_explicit_oversubscription_is_reported():
+    """Açıkça verilen ayarların çekirdekleri aşmasının oversubscription olarak raporlandığını doğrular."""
+    result = budget(CPU_CORES=4, WEB_CONCURRENCY=2, PROCESSING_WORKERS=2, WORKER_THREADS=4)
+    assert result.oversubscription == 4
+
+def test_session_and_opencv_follow_budget():
+    """ONNX oturum ayarlarının ve OpenCV thread sayısının bütçeye göre ayarlandığını doğrular."""
+    with patch.multiple(settings, CPU_CORES=8, WEB_CONCURRENCY=2, PROCESSING_WORKERS=0, WORKER_THREADS=2,
+                        ONNX_INTER_OP_THREADS=1, ONNX_ALLOW_SPINNING=False):
+        options = model_store.session_options()
+        with patch("cv2.setNumThreads") as mock_set_threads:
+            status = apply_thread_budget()
+
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+    assert options.get_session_config_entry("session.intra_op.allow_spinning") == "0"
+    mock_set_threads.assert_called_once_with(2)
+    assert status["processing_workers"] == 2 and status["oversubscription"] == 1
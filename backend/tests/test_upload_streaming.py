@@ -0,0 +1,120 @@
+import io
+import os
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers, UploadFile
+from unittest.mock import patch
+
+from app.main import app
+from app.core.config import settings
+from app.api.v1.endpoints import photos
+from app.api.v1.endpoints.photos import validate_image_file
+
+client = TestClient(app)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+VALID_IMAGE_PATH = os.path.join(PROJECT_ROOT, "assets", "test_portrait_face_detected.jpg")
+
+@pytest.fixture(autouse=True)
+def override_test_mode():
+    """Rate limiter'ı devre dışı bırakmak için TEST_MODE'u zorla True yapar."""
+    original_mode = settings.TEST_MODE
+    settings.TEST_MODE = True
+    yield
+    settings.TEST_MODE = original_mode
+
+class CountingFile(io.BytesIO):
+    """Okunan byte sayısını kaydeden dosya nesnesi."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer):
+        read = super().readinto(buffer)
+        self.bytes_read += read
+        return read
+
+def make_upload(data: bytes, content_type="image/jpeg", size=None):
+    return UploadFile(
+        CountingFile(data),
+        size=size,
+        filename="upload.jpg",
+        headers=Headers({"content-type": content_type})
+    )
+
+def test_returns_whole_upload_in_one_buffer():
+    """Boyutu bilinen ve bilinmeyen yüklemelerde içeriğin eksiksiz döndüğünü doğrular."""
+    with open(VALID_IMAGE_PATH, "rb") as f:
+        data = f.read()
+
+    assert validate_image_file(make_upload(data, size=len(data))) == data
+    assert validate_image_file(make_upload(data)) == data
+
+def test_invalid_format_is_rejected_after_first_chunk():
+    """Geçersiz içerik yalnızca ilk parça okunarak reddedilmeli."""
+    upload = make_upload(b"not an image" * 100000, size=1200000)
+    with pytest.raises(HTTPException) as error:
+        validate_image_file(upload)
+
+    assert error.value.status_code == 400
+    assert upload.file.bytes_read <= photos.UPLOAD_CHUNK_SIZE
+
+def test_declared_size_is_rejected_without_reading():
+    """Bildirilen boyut sınırı aşıyorsa dosyadan hiç okunmamalı."""
+    upload = make_upload(b"\xff\xd8\xff\xe0" + b"\0" * 100, size=photos.MAX_FILE_SIZE + 1)
+    with pytest.raises(HTTPException) as error:
+        validate_image_file(upload)
+
+    assert error.value.status_code == 413
+    assert upload.file.bytes_read == 0
+
+def test_undeclared_size_stops_at_limit():
+    """Boyutu bilinmeyen yükleme sınırı aştığı anda okuma durmalı."""
+    data = b"\xff\xd8\xff\xe0\x00\x10JFIF" + b"\0" * (4 * photos.UPLOAD_CHUNK_SIZE)
+    upload = make_upload(data)
+    with patch.object(photos, "MAX_FILE_SIZE", 2 * photos.UPLOAD_CHUNK_SIZE):
+        with pytest.raises(HTTPException) as error:
+            validate_image_file(upload)
+
+    assert error.value.status_code == 413
+    assert upload.file.bytes_read <= 3 * photos.UPLOAD_CHUNK_SIZE
+
+def test_content_length_is_checked_before_body_is_read():
+    """Content-Length sınırı aşan isteğin gövde okunmadan 413 ile reddedildiğini doğrular."""
+    with patch('app.api.v1.endpoints.photos.validate_image_file') as mock_validate:
+        response = client.post(
+            "/api/v1/photos/preview",
+            content=b"x" * 16,
+            headers={
+                "content-type": "multipart/form-data; boundary=x",
+                "content-length": str(settings.MAX_FILE_SIZE * 2)
+            }
+        )
+
+    assert response.status_code == 413
+    assert "File size is too large" in response.json()["detail"]
+    assert not mock_validate.called
+
+def test_chunked_upload_is_stopped_at_limit():
+    """Content-Length göndermeyen isteğin gövdesi sayılmalı, sınır aşılınca okuma durup 413 dönmeli."""
+    def body():
+        for _ in range(8):
+            yield b"x" * (settings.MAX_FILE_SIZE // 2)
+
+    with patch('app.api.v1.endpoints.photos.validate_image_file') as mock_validate:
+        response = client.post(
+            "/api/v1/photos/preview",
+            content=body(),
+            headers={"content-type": "multipart/form-data; boundary=x"}
+        )
+
+    assert response.status_code == 413
+    assert "File size is too large" in response.json()["detail"]
+    assert not mock_validate.called